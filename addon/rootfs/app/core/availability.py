@@ -0,0 +1,329 @@
+"""
+Availability Tracker
+Marks devices offline when they miss their expected telegrams, with the
+deadlines of all devices kept in a hierarchical timer wheel
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel
+
+    Level 0 has one slot per tick; every higher level has slots that are 64
+    times wider. A timer is placed in the lowest level whose range covers
+    it and moved down (cascaded) when the wheel reaches its slot, so
+    scheduling, cancelling and expiring cost O(1) per timer no matter how
+    many are pending. Four levels cover 64^4 ticks (194 days at 1 s).
+    """
+
+    SLOT_BITS = 6
+    SLOTS = 1 << SLOT_BITS
+    LEVELS = 4
+
+    def __init__(self, current: int = 0):
+        """
+        Initialize wheel
+
+        Args:
+            current: Current tick
+        """
+        self.current = current
+        self._slots: List[List[Set[Hashable]]] = [[set() for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        # key -> (deadline tick, level, slot)
+        self._timers: Dict[Hashable, Tuple[int, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def _place(self, key: Hashable, deadline: int, earliest: int):
+        """Put a timer into the slot its deadline falls in, relative to the current tick"""
+        # Past deadlines fire at the earliest tick still to be processed,
+        # deadlines beyond the wheel are re-placed when their slot is reached
+        target = min(max(deadline, earliest), self.current + self.SLOTS ** self.LEVELS - 1)
+        level = 0
+        while level < self.LEVELS - 1 and (target >> (self.SLOT_BITS * (level + 1))) != (self.current >> (self.SLOT_BITS * (level + 1))):
+            level += 1
+        slot = (target >> (self.SLOT_BITS * level)) & (self.SLOTS - 1)
+        self._slots[level][slot].add(key)
+        self._timers[key] = (deadline, level, slot)
+
+    def schedule(self, key: Hashable, deadline: int):
+        """
+        Schedule (or reschedule) a timer
+
+        Args:
+            key: Timer key
+            deadline: Tick at which the timer expires
+        """
+        self.cancel(key)
+        self._place(key, deadline, self.current + 1)
+
+    def cancel(self, key: Hashable):
+        """
+        Cancel a timer (no-op if not scheduled)
+
+        Args:
+            key: Timer key
+        """
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            _, level, slot = timer
+            self._slots[level][slot].discard(key)
+
+    def advance(self, now: int) -> List[Hashable]:
+        """
+        Move the wheel forward
+
+        Args:
+            now: Tick to advance to
+
+        Returns:
+            Keys of the timers that expired
+        """
+        expired = []
+        while self.current < now:
+            if not self._timers:
+                self.current = now
+                break
+            self.current += 1
+
+            # Cascade the higher level slots the wheel just reached, highest first
+            level = 1
+            while level < self.LEVELS and (self.current & ((1 << (self.SLOT_BITS * level)) - 1)) == 0:
+                level += 1
+            for cascade in range(level - 1, 0, -1):
+                bucket = self._slots[cascade][(self.current >> (self.SLOT_BITS * cascade)) & (self.SLOTS - 1)]
+                keys = list(bucket)
+                bucket.clear()
+                for key in keys:
+                    self._place(key, self._timers[key][0], self.current)
+
+            bucket = self._slots[0][self.current & (self.SLOTS - 1)]
+            for key in list(bucket):
+                deadline = self._timers[key][0]
+                if deadline > self.current:  # Beyond the wheel's range when scheduled
+                    bucket.discard(key)
+                    self._place(key, deadline, self.current + 1)
+                    continue
+                bucket.discard(key)
+                del self._timers[key]
+                expired.append(key)
+        return expired
+
+
+class DeviceCadence:
+    """Telegram cadence and availability of one device"""
+
+    __slots__ = ('last_seen', 'intervals', 'online', 'timeout')
+
+    def __init__(self):
+        self.last_seen: Optional[float] = None
+        self.intervals: deque = deque(maxlen=AvailabilityTracker.LEARN_SAMPLES)
+        self.online = False
+        self.timeout: Optional[float] = None
+
+
+class AvailabilityTracker:
+    """
+    Per-device availability
+
+    A device is offline once it has been silent for timeout_factor times
+    its expected telegram interval. The interval is configured per EEP or
+    learned as the longest of the recent intervals between its telegrams.
+    Until enough intervals are known, and for event driven devices
+    (expected interval 0), a device never goes offline. Only transitions
+    are reported: seen() tells when a device comes (back) online and
+    expire() which devices went offline.
+    """
+
+    LEARN_SAMPLES = 8  # Intervals remembered for learning
+    LEARN_MIN_SAMPLES = 3  # Intervals needed before a learned cadence is used
+    MIN_TIMEOUT = 60.0  # Seconds
+
+    def __init__(self, timeout_factor: float = 3.0, tick: float = 1.0):
+        """
+        Initialize tracker
+
+        Args:
+            timeout_factor: Missed expected intervals before a device is offline (0 = never offline)
+            tick: Resolution of the deadlines in seconds
+        """
+        self.timeout_factor = timeout_factor
+        self.tick = tick
+        self.devices: Dict[str, DeviceCadence] = {}
+        self._wheel = TimerWheel(self._tick(time.monotonic()))
+        self._running = False
+
+        # Statistics
+        self.online_transitions = 0
+        self.offline_transitions = 0
+
+    def _tick(self, now: float) -> int:
+        """Tick number of a monotonic timestamp"""
+        return int(now / self.tick)
+
+    def _timeout(self, cadence: DeviceCadence, expected_interval: Optional[float]) -> Optional[float]:
+        """Seconds of silence after which the device is offline (None = never)"""
+        if not self.timeout_factor:
+            return None
+        if expected_interval is None:
+            if len(cadence.intervals) < self.LEARN_MIN_SAMPLES:
+                return None
+            expected_interval = max(cadence.intervals)
+        if not expected_interval:
+            return None
+        return max(expected_interval * self.timeout_factor, self.MIN_TIMEOUT)
+
+    def seen(self, device_id: str, expected_interval: Optional[float] = None, now: Optional[float] = None) -> bool:
+        """
+        Register a telegram of a device
+
+        Args:
+            device_id: Device ID
+            expected_interval: Configured seconds between telegrams (None = learn, 0 = event driven)
+            now: Monotonic timestamp (default: time.monotonic())
+
+        Returns:
+            True if the device was not online before (publish "online")
+        """
+        if now is None:
+            now = time.monotonic()
+        cadence = self.devices.get(device_id)
+        if cadence is None:
+            cadence = self.devices[device_id] = DeviceCadence()
+        elif cadence.last_seen is not None and now - cadence.last_seen >= self.tick:
+            # Shorter gaps are repeats or bursts, not the device's cadence
+            cadence.intervals.append(now - cadence.last_seen)
+        cadence.last_seen = now
+
+        cadence.timeout = self._timeout(cadence, expected_interval)
+        if cadence.timeout is None:
+            self._wheel.cancel(device_id)
+        else:
+            self._wheel.schedule(device_id, self._tick(now + cadence.timeout))
+
+        if cadence.online:
+            return False
+        cadence.online = True
+        self.online_transitions += 1
+        return True
+
+    def restore(self, device_id: str, expected_interval: Optional[float] = None, now: Optional[float] = None) -> bool:
+        """
+        Assume an untracked device is online without a telegram (e.g. after a restart)
+
+        The device gets the deadline of its expected interval, so one that
+        stays silent goes offline. The restore is not a telegram, so it does
+        not count for learning the cadence.
+
+        Args:
+            device_id: Device ID
+            expected_interval: Configured seconds between telegrams (None = learn, 0 = event driven)
+            now: Monotonic timestamp (default: time.monotonic())
+
+        Returns:
+            True if the device is now tracked as online, False if it was already tracked
+        """
+        if device_id in self.devices:
+            return False
+        if now is None:
+            now = time.monotonic()
+        cadence = self.devices[device_id] = DeviceCadence()
+        cadence.timeout = self._timeout(cadence, expected_interval)
+        if cadence.timeout is not None:
+            self._wheel.schedule(device_id, self._tick(now + cadence.timeout))
+        cadence.online = True
+        self.online_transitions += 1
+        return True
+
+    def is_online(self, device_id: str) -> Optional[bool]:
+        """
+        Get the availability of a device
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            True/False, or None if the device is not tracked
+        """
+        cadence = self.devices.get(device_id)
+        return cadence.online if cadence is not None else None
+
+    def forget(self, device_id: str):
+        """
+        Stop tracking a device
+
+        Args:
+            device_id: Device ID
+        """
+        self.devices.pop(device_id, None)
+        self._wheel.cancel(device_id)
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """
+        Mark devices whose deadline passed as offline
+
+        Args:
+            now: Monotonic timestamp (default: time.monotonic())
+
+        Returns:
+            IDs of the devices that went offline
+        """
+        if now is None:
+            now = time.monotonic()
+        offline = []
+        for device_id in self._wheel.advance(self._tick(now)):
+            cadence = self.devices.get(device_id)
+            if cadence is not None and cadence.online:
+                cadence.online = False
+                self.offline_transitions += 1
+                offline.append(device_id)
+        return offline
+
+    async def run(self, callback: Callable[[str, float], Any]):
+        """
+        Expire deadlines until stop() is called
+
+        Args:
+            callback: Function called with (device_id, seconds silent) for each device going offline
+        """
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            for device_id in self.expire(now):
+                cadence = self.devices[device_id]
+                try:
+                    # Restored devices that never sent a telegram were silent for their whole timeout
+                    callback(device_id, now - cadence.last_seen if cadence.last_seen is not None else cadence.timeout)
+                except Exception as e:
+                    logger.error(f"Error marking {device_id} offline: {e}")
+
+    def stop(self):
+        """Stop expiring deadlines"""
+        self._running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get availability statistics
+
+        Returns:
+            Dictionary with tracked/online/offline device counts and transition counters
+        """
+        online = sum(1 for cadence in self.devices.values() if cadence.online)
+        return {
+            'timeout_factor': self.timeout_factor,
+            'tracked': len(self.devices),
+            'online': online,
+            'offline': len(self.devices) - online,
+            'deadlines': len(self._wheel),
+            'online_transitions': self.online_transitions,
+            'offline_transitions': self.offline_transitions
+        }
@@ -0,0 +1,175 @@
+"""
+ESP3 Capture and Replay
+Records raw ESP3 frames with monotonic timestamps and plays them back into the pipeline
+
+File format (little endian):
+    Header:  b'ESP3CAP1' + u64 wall clock time of capture start (ns since epoch)
+    Records: u64 ns since capture start + u16 frame length + raw ESP3 frame
+"""
+import asyncio
+import logging
+import struct
+import threading
+import time
+from typing import Iterator, Tuple, Callable, Awaitable, Dict, Any
+from .esp3_protocol import ESP3Packet
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ESP3CAP1'
+HEADER = struct.Struct('<8sQ')
+RECORD = struct.Struct('<QH')
+
+
+class CaptureWriter:
+    """Append raw ESP3 frames to a capture file (thread safe)"""
+
+    FLUSH_INTERVAL = 1.0  # Seconds between forced flushes
+
+    def __init__(self, path: str):
+        """
+        Open capture file for writing (existing file is replaced)
+
+        Args:
+            path: Capture file path (e.g., /share/enocean_capture.bin)
+        """
+        self.path = path
+        self.frames = 0
+        self._lock = threading.Lock()
+        self._start = time.monotonic_ns()
+        self._last_flush = time.monotonic()
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, time.time_ns()))
+        logger.info(f"Capturing raw ESP3 frames to {path}")
+
+    def record(self, frame: bytes):
+        """
+        Record one raw frame
+
+        Called from serial reader threads, so writes are serialized by a lock.
+
+        Args:
+            frame: Complete raw ESP3 frame including sync byte and CRCs
+        """
+        timestamp = time.monotonic_ns() - self._start
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD.pack(timestamp, len(frame)))
+            self._file.write(frame)
+            self.frames += 1
+            now = time.monotonic()
+            if now - self._last_flush >= self.FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        """Flush and close the capture file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info(f"Capture closed: {self.frames} frames written to {self.path}")
+
+
+def read_capture(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Iterate over a capture file
+
+    Args:
+        path: Capture file path
+
+    Yields:
+        (ns since capture start, raw frame) tuples
+
+    Raises:
+        ValueError: If the file is not an ESP3 capture
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header)[0] != MAGIC:
+            raise ValueError(f"Not an ESP3 capture file: {path}")
+
+        while True:
+            record = f.read(RECORD.size)
+            if len(record) < RECORD.size:
+                break
+            timestamp, length = RECORD.unpack(record)
+            frame = f.read(length)
+            if len(frame) < length:
+                logger.warning(f"Truncated frame at end of capture {path}")
+                break
+            yield timestamp, frame
+
+
+class CaptureReplay:
+    """Feed a capture file back into the telegram pipeline"""
+
+    def __init__(self, path: str, speed: float = 1.0):
+        """
+        Initialize replay
+
+        Args:
+            path: Capture file path
+            speed: 1.0 = real time, N = N times faster, 0 = as fast as possible
+        """
+        self.path = path
+        self.speed = speed
+        self.frames = 0
+        self.telegrams = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    async def run(self, callback: Callable[[ESP3Packet], Awaitable[None]]):
+        """
+        Replay all radio telegrams of the capture
+
+        Args:
+            callback: Pipeline entry point, awaited for every ERP1 packet
+        """
+        logger.info(f"Replaying capture {self.path} (speed: {'max' if self.speed <= 0 else f'{self.speed}x'})")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        for timestamp, frame in read_capture(self.path):
+            self.frames += 1
+            try:
+                packet = ESP3Packet(frame)
+            except ValueError as e:
+                self.errors += 1
+                logger.debug(f"Skipping corrupt captured frame: {e}")
+                continue
+
+            if packet.packet_type != ESP3Packet.PACKET_TYPE_RADIO_ERP1:
+                continue
+
+            if self.speed > 0:
+                delay = started + timestamp / 1e9 / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif self.telegrams % 100 == 0:
+                # Let other tasks (MQTT, web UI) run during max-speed replay
+                await asyncio.sleep(0)
+
+            self.telegrams += 1
+            await callback(packet)
+
+        self.elapsed = loop.time() - started
+        stats = self.get_stats()
+        logger.info(f"Replay finished: {stats['telegrams']} telegrams in {stats['elapsed']:.2f}s "
+                    f"({stats['telegrams_per_second']:.1f} telegrams/s, {stats['errors']} corrupt frames)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get replay statistics
+
+        Returns:
+            Dictionary with frame counts and throughput
+        """
+        return {
+            'frames': self.frames,
+            'telegrams': self.telegrams,
+            'errors': self.errors,
+            'elapsed': self.elapsed,
+            'telegrams_per_second': self.telegrams / self.elapsed if self.elapsed > 0 else 0.0
+        }
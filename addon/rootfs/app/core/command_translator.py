@@ -3,10 +3,70 @@ Command Translator
 Translates MQTT commands to EnOcean telegrams based on EEP profiles
 """
 import logging
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple, Dict, Any, Callable, List
 
 logger = logging.getLogger(__name__)
 
+# Profile family (rorg, func) -> command kind -> alternatives, each building
+# (send case command number, field values) from the command argument. The
+# first alternative the profile's send cases support is used. Field values
+# are given in the units the profile publishes and packed into the payload
+# by the encoder compiled from the profile's "send" cases.
+CommandBuilder = Callable[[Any], Tuple[int, Dict[str, Any]]]
+COMMAND_ACTIONS: Dict[Tuple[int, int], Dict[str, List[CommandBuilder]]] = {
+    # A5-38-08 Central Command: 1 = switching, 2 = dimming (absolute range).
+    # Dimmers (e.g. Eltako FUD) ignore switching telegrams, so profiles with a
+    # dimming send case are switched with dimming telegrams as well
+    (0xA5, 0x38): {
+        'state': [lambda on: (2, {'dimming.EDIM': 100 if on else 0, 'dimming.SW': on}),
+                  lambda on: (1, {'switching.SW': on})],
+        'brightness': [lambda brightness: (2, {'dimming.EDIM': brightness * 100 / 255, 'dimming.SW': brightness > 0})],
+    },
+    # D2-01-xx electronic switches and dimmers: 1 = actuator set output (0-100 %),
+    # switches without output value field have fixed send cases 0 = off, 1 = on
+    (0xD2, 0x01): {
+        'state': [lambda on: (1, {'OV': 100 if on else 0}), lambda on: (1 if on else 0, {})],
+        'brightness': [lambda brightness: (1, {'OV': brightness * 100 / 255})],
+    },
+    # D2-05-xx blinds: 1 = go to position (angle 127 = unchanged), 2 = stop
+    (0xD2, 0x05): {
+        'position': [lambda position: (1, {'POS': position, 'ANG': 127})],
+        'open': [lambda _: (1, {'POS': 100, 'ANG': 127})],
+        'close': [lambda _: (1, {'POS': 0, 'ANG': 127})],
+        'stop': [lambda _: (2, {})],
+    },
+}
+
+# Arguments used to check which commands a profile supports
+PROBE_ARGUMENTS = {
+    'state': (True, False),
+    'brightness': (255,),
+    'position': (50,),
+    'open': (None,),
+    'close': (None,),
+    'stop': (None,),
+}
+
+# Families switched with RPS rocker telegrams (F6-02-xx, incl. Eltako actuators)
+RPS_FAMILIES = frozenset([(0xF6, 0x02)])
+
+# Switch states sent as rocker presses (Eltako convention: A0 = ON, A1 = OFF)
+RPS_STATES = {
+    'ON': 0x10,
+    'OFF': 0x30,
+}
+
+RPS_BUTTONS = {
+    'A0': 0x10,
+    'AI': 0x10,  # Alternative naming
+    'A1': 0x30,
+    'AO': 0x30,  # Alternative naming
+    'B0': 0x50,
+    'BI': 0x50,  # Alternative naming
+    'B1': 0x70,
+    'BO': 0x70,  # Alternative naming
+}
+
 
 class CommandTranslator:
     """Translate MQTT commands to EnOcean telegrams"""
@@ -19,58 +79,100 @@ class CommandTranslator:
             eep_loader: EEP profile loader instance
         """
         self.eep_loader = eep_loader
+        # Last brightness set per device, restored when a dimmer is switched on
+        self.last_brightness: Dict[str, int] = {}
+    
+    def _family(self, eep: str) -> Optional[Tuple[int, int]]:
+        """Get (rorg, func) of an EEP from the profile index"""
+        info = self.eep_loader.index.get(eep)
+        return (info.rorg, info.func) if info else None
+    
+    def _resolve(self, eep: str, kind: str, argument: Any) -> Optional[Tuple[Any, int, Dict[str, Any]]]:
+        """
+        Find the send case a profile supports for a command
+        
+        Args:
+            eep: EEP code
+            kind: Command kind ('state', 'brightness', 'position', 'open', ...)
+            argument: Command argument passed to the builders
+            
+        Returns:
+            Tuple of (profile, command number, field values) or None if not supported
+        """
+        builders = COMMAND_ACTIONS.get(self._family(eep), {}).get(kind)
+        if not builders:
+            return None
+        profile = self.eep_loader.get_profile(eep)
+        if profile is None:
+            return None
+        for build in builders:
+            command, values = build(argument)
+            if profile.encoder.supports(command, values):
+                return (profile, command, values)
+        return None
+    
+    def _supports(self, eep: str, kind: str) -> bool:
+        """Check if a profile supports a command kind for all probe arguments"""
+        return all(self._resolve(eep, kind, argument) for argument in PROBE_ARGUMENTS[kind])
+    
+    def _encode(self, eep: str, kind: str, argument: Any) -> Optional[Tuple[int, bytes]]:
+        """
+        Encode a command with the profile's send case encoder
+        
+        Args:
+            eep: EEP code
+            kind: Command kind ('state', 'brightness', 'position', 'open', ...)
+            argument: Command argument passed to the field value builders
+            
+        Returns:
+            Tuple of (rorg, data_bytes) or None if the profile does not support the command
+        """
+        resolved = self._resolve(eep, kind, argument)
+        if resolved is None:
+            if kind in COMMAND_ACTIONS.get(self._family(eep), {}):
+                logger.warning(f"EEP {eep} has no send case for {kind} commands")
+            return None
+        profile, command, values = resolved
+        data_bytes = profile.encoder.encode(command, values)
+        if data_bytes is None:
+            return None
+        return (profile.rorg, data_bytes)
     
     def translate_switch_command(self, device: Dict[str, Any], state: str) -> Optional[Tuple[int, bytes]]:
         """
-        Translate switch ON/OFF command to EnOcean telegram
+        Translate switch ON/OFF (or cover OPEN/CLOSE/STOP) command to EnOcean telegram
         
         Args:
             device: Device dictionary with 'eep' key
-            state: "ON" or "OFF"
+            state: "ON" or "OFF" ("OPEN", "CLOSE" or "STOP" for covers)
             
         Returns:
             Tuple of (rorg, data_bytes) or None if not supported
         """
         eep = device.get('eep', '')
+        state = state.upper()
         
-        # A5-38-08: Central Command (Gateway)
-        if eep == 'A5-38-08':
-            # DB3: Command ID (0x02 = Switching)
-            # DB2: Not used (0x00)
-            # DB1: Dimming value (0x00 = OFF, 0x64 = 100% = ON)
-            # DB0: Switching command (0x09 = ON, 0x08 = OFF)
-            if state.upper() == 'ON':
-                data_bytes = bytes([0x02, 0x00, 0x64, 0x09])
-            else:
-                data_bytes = bytes([0x02, 0x00, 0x00, 0x08])
-            return (0xA5, data_bytes)
-        
-        # D2-01-xx: Electronic switches and dimmers
-        elif eep.startswith('D2-01'):
-            # VLD telegram for D2-01 actuators
-            # CMD 0x01 = Actuator Set Output
-            # DB_0 bits 7-1: Output value (0-100, 0=OFF, 100=ON)
-            # DB_0 bit 0: I/O channel (0)
-            if state.upper() == 'ON':
-                data_bytes = bytes([0x01, 0x01, 0x64, 0x00])  # CMD, Channel, Value 100%, reserved
-            else:
-                data_bytes = bytes([0x01, 0x01, 0x00, 0x00])  # CMD, Channel, Value 0%, reserved
-            return (0xD2, data_bytes)
-        
-        # Eltako actuator control (F6-02-01-actuator)
-        elif eep == 'F6-02-01-actuator':
-            # Return None to use RPS command instead
-            logger.info(f"F6-02-01-actuator: using RPS command for {state}")
+        if self._family(eep) in RPS_FAMILIES:
+            # Rocker switches and Eltako actuators are switched with RPS button presses
             return None
         
-        # Virtual rocker switch (F6-02-01) - sensors, not actuators
-        elif eep == 'F6-02-01' or eep.startswith('F6-02'):
-            # Use RPS button press to toggle
-            # This will be handled separately by send_rps_command
+        if state in ('OPEN', 'CLOSE', 'STOP'):
+            kind = state.lower()
+        elif state in ('ON', 'OFF'):
+            kind = 'state'
+        else:
+            logger.warning(f"Unknown switch state {state} for EEP {eep}")
             return None
         
-        logger.warning(f"Switch command not supported for EEP {eep}")
-        return None
+        brightness = self.last_brightness.get(device.get('id'))
+        if state == 'ON' and brightness and self._resolve(eep, 'brightness', brightness):
+            # Dimmers come back on at the last brightness instead of full
+            return self._encode(eep, 'brightness', brightness)
+        
+        result = self._encode(eep, kind, state == 'ON')
+        if result is None:
+            logger.warning(f"Switch command {state} not supported for EEP {eep}")
+        return result
     
     def translate_dim_command(self, device: Dict[str, Any], brightness: int) -> Optional[Tuple[int, bytes]]:
         """
@@ -84,19 +186,13 @@ class CommandTranslator:
             Tuple of (rorg, data_bytes) or None if not supported
         """
         eep = device.get('eep', '')
-        
-        # A5-38-08: Central Command (Gateway)
-        if eep == 'A5-38-08':
-            # DB3: Command ID (0x02 = Dimming)
-            # DB2: Dimming range (0x00 = absolute)
-            # DB1: Dimming value (0-100, scaled from 0-255)
-            # DB0: Dimming command (0x09 = execute)
-            dim_value = int((brightness / 255.0) * 100)
-            data_bytes = bytes([0x02, 0x00, dim_value, 0x09])
-            return (0xA5, data_bytes)
-        
-        logger.warning(f"Dim command not supported for EEP {eep}")
-        return None
+        brightness = max(0, min(255, int(brightness)))
+        result = self._encode(eep, 'brightness', brightness)
+        if result is None:
+            logger.warning(f"Dim command not supported for EEP {eep}")
+        elif brightness > 0:
+            self.last_brightness[device.get('id')] = brightness
+        return result
     
     def translate_rgb_command(self, device: Dict[str, Any], red: int, green: int, blue: int) -> Optional[Tuple[int, bytes]]:
         """
@@ -145,16 +241,10 @@ class CommandTranslator:
             Tuple of (rorg, data_bytes) or None if not supported
         """
         eep = device.get('eep', '')
-        
-        # D2-05-xx: Blinds/shutters control
-        if eep.startswith('D2-05'):
-            # VLD telegram for blind control
-            # This is complex and device-specific
-            logger.warning(f"Cover command for {eep} not yet implemented")
-            return None
-        
-        logger.warning(f"Cover command not supported for EEP {eep}")
-        return None
+        result = self._encode(eep, 'position', max(0, min(100, int(position))))
+        if result is None:
+            logger.warning(f"Cover command not supported for EEP {eep}")
+        return result
     
     def translate_rps_button(self, button: str) -> Optional[int]:
         """
@@ -166,17 +256,7 @@ class CommandTranslator:
         Returns:
             Button code or None if invalid
         """
-        button_map = {
-            'A0': 0x10,
-            'AI': 0x10,  # Alternative naming
-            'A1': 0x30,
-            'AO': 0x30,  # Alternative naming
-            'B0': 0x50,
-            'BI': 0x50,  # Alternative naming
-            'B1': 0x70,
-            'BO': 0x70,  # Alternative naming
-        }
-        return button_map.get(button.upper())
+        return RPS_BUTTONS.get(button.upper())
     
     def translate_command(self, device: Dict[str, Any], entity: str, command: Dict[str, Any]) -> Optional[Tuple[str, int, bytes]]:
         """
@@ -192,9 +272,14 @@ class CommandTranslator:
             command_type can be "telegram" or "rps"
         """
         eep = device.get('eep', '')
+        family = self._family(eep)
         
         logger.info(f"Translating command for {device['id']} ({eep}): entity={entity}, command={command}")
         
+        # Bare numbers from MQTT are positions for covers and brightness otherwise
+        if 'value' in command and not any(key in command for key in ('state', 'brightness', 'position')):
+            command = {('position' if self._supports(eep, 'position') else 'brightness'): command['value']}
+        
         # Handle switch commands
         if 'state' in command:
             state = command['state']
@@ -204,12 +289,11 @@ class CommandTranslator:
                 return ('telegram', rorg, data_bytes)
             
             # Fallback to RPS for actuators and switches
-            if eep == 'F6-02-01-actuator' or eep.startswith('F6-02'):
-                # Use rocker A0 for ON, A1 for OFF (Eltako convention)
-                if state.upper() == 'ON':
-                    button_code = 0x10  # A0 (rocker up) = ON
-                else:
-                    button_code = 0x30  # A1 (rocker down) = OFF
+            if family in RPS_FAMILIES:
+                button_code = RPS_STATES.get(state.upper())
+                if button_code is None:
+                    logger.warning(f"Unknown switch state {state} for EEP {eep}")
+                    return None
                 logger.info(f"RPS command: state={state} -> button_code={hex(button_code)}")
                 return ('rps', button_code, bytes())
         
@@ -251,22 +335,13 @@ class CommandTranslator:
         """
         commands = {}
         
-        # A5-38-08: Central Command
-        if eep == 'A5-38-08':
-            commands['switch'] = ['state']
-            commands['light'] = ['state', 'brightness']
-        
-        # F6-02-xx: Rocker switches
-        elif eep.startswith('F6-02'):
+        if self._family(eep) in RPS_FAMILIES:
             commands['button'] = ['button']
-        
-        # D2-01-xx: Electronic switches
-        elif eep.startswith('D2-01'):
+        if self._supports(eep, 'state'):
             commands['switch'] = ['state']
-            commands['light'] = ['state', 'brightness']
-        
-        # D2-05-xx: Blinds/shutters
-        elif eep.startswith('D2-05'):
+            if self._supports(eep, 'brightness'):
+                commands['light'] = ['state', 'brightness']
+        if self._supports(eep, 'position'):
             commands['cover'] = ['position']
         
         return commands
@@ -281,15 +356,6 @@ class CommandTranslator:
         Returns:
             True if controllable, False otherwise
         """
-        controllable_profiles = [
-            'A5-38-08',  # Central Command
-            'D2-01',     # Electronic switches (prefix)
-            'D2-05',     # Blinds/shutters (prefix)
-            'F6-02',     # Virtual rocker (prefix)
-        ]
-        
-        for profile in controllable_profiles:
-            if eep == profile or eep.startswith(profile):
-                return True
-        
-        return False
+        if self._family(eep) in RPS_FAMILIES:
+            return True
+        return any(self._supports(eep, kind) for kind in COMMAND_ACTIONS.get(self._family(eep), {}))
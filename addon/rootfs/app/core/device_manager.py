@@ -76,7 +76,8 @@ class DeviceManager:
         except Exception as e:
             logger.error(f"Error saving devices: {e}")
     
-    def add_device(self, device_id: str, name: str, eep: str, manufacturer: str = "EnOcean") -> bool:
+    def add_device(self, device_id: str, name: str, eep: str, manufacturer: str = "EnOcean",
+                   gateway: Optional[str] = None) -> bool:
         """
         Add a new device
         
@@ -85,6 +86,7 @@ class DeviceManager:
             name: Device name
             eep: EEP profile code
             manufacturer: Manufacturer name
+            gateway: Base ID of the gateway the device was taught with (None = primary gateway)
             
         Returns:
             True if successful, False otherwise
@@ -102,6 +104,8 @@ class DeviceManager:
                 'last_seen': None,
                 'rssi': None
             }
+            if gateway:
+                self.devices[device_id]['gateway'] = gateway
             self.save_devices()
             logger.info(f"Added device: {device_id} ({name})")
             return True
@@ -0,0 +1,156 @@
+"""
+Discovery Cache
+Remembers a content hash of the discovery configs last sent per device, so
+unchanged configs are not republished on every start
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def discovery_digest(messages: List[Tuple[str, str]]) -> str:
+    """
+    Hash rendered discovery messages
+
+    Args:
+        messages: List of (topic, payload) of a device
+
+    Returns:
+        Hex digest of topics and payloads
+    """
+    digest = hashlib.sha256()
+    for topic, payload in sorted(messages):
+        digest.update(topic.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(payload.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class DiscoveryCache:
+    """
+    Hash and topics of the retained discovery configs per device
+
+    Entries are tied to the broker they were sent to: a different broker
+    (or a lost cache file) means everything is published again, as does
+    invalidate() when the broker or Home Assistant may have lost them.
+    """
+
+    def __init__(self, broker: str, cache_file: str = "/data/discovery_cache.json"):
+        """
+        Initialize discovery cache
+
+        Args:
+            broker: Broker identity (host:port) the configs are published to
+            cache_file: Path to cache file
+        """
+        self.broker = broker
+        self.cache_file = cache_file
+        self.devices: Dict[str, Dict[str, Any]] = {}
+        self.skipped = 0
+        self.published = 0
+        self._load()
+
+    def _load(self):
+        """Load cache from file (ignored if it belongs to another broker)"""
+        try:
+            if not os.path.exists(self.cache_file):
+                return
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('broker') != self.broker:
+                logger.info(f"Discovery cache belongs to broker {data.get('broker')}, republishing all discovery")
+                return
+            self.devices = data.get('devices', {})
+            logger.info(f"Loaded discovery hashes of {len(self.devices)} devices from {self.cache_file}")
+        except Exception as e:
+            logger.error(f"Error loading discovery cache: {e}")
+            self.devices = {}
+
+    def _save(self):
+        """Save cache to file"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({'broker': self.broker, 'devices': self.devices}, f)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"Error saving discovery cache: {e}")
+
+    def is_current(self, device_id: str, digest: str) -> bool:
+        """
+        Check if the configs with this hash were the last ones sent for a device
+
+        Args:
+            device_id: Device ID
+            digest: Hash from discovery_digest()
+
+        Returns:
+            True if nothing needs to be published
+        """
+        entry = self.devices.get(device_id)
+        return entry is not None and entry.get('hash') == digest
+
+    def skip(self):
+        """Count a device whose unchanged configs were not published again"""
+        self.skipped += 1
+
+    def get_topics(self, device_id: str) -> List[str]:
+        """
+        Get the config topics last sent for a device
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            List of config topics (empty if unknown)
+        """
+        entry = self.devices.get(device_id)
+        return list(entry.get('topics', [])) if entry else []
+
+    def store(self, device_id: str, digest: str, topics: List[str]):
+        """
+        Remember the configs sent for a device
+
+        Args:
+            device_id: Device ID
+            digest: Hash from discovery_digest()
+            topics: Config topics that were published
+        """
+        self.devices[device_id] = {'hash': digest, 'topics': sorted(topics)}
+        self.published += 1
+        self._save()
+
+    def invalidate(self):
+        """Forget all hashes (everything is published again), keeping the topics to clean up"""
+        for entry in self.devices.values():
+            entry['hash'] = None
+        self._save()
+
+    def remove(self, device_id: str):
+        """
+        Forget a device (its configs are published again next time)
+
+        Args:
+            device_id: Device ID
+        """
+        if self.devices.pop(device_id, None) is not None:
+            self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dictionary with cached devices and skipped/published counters
+        """
+        return {
+            'devices': len(self.devices),
+            'skipped': self.skipped,
+            'published': self.published
+        }
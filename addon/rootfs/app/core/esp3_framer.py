@@ -0,0 +1,160 @@
+"""
+ESP3 Stream Framer
+Incrementally splits a raw serial byte stream into ESP3 packets
+"""
+import logging
+import time
+from typing import List, Dict, Any
+from .esp3_protocol import ESP3Packet
+
+logger = logging.getLogger(__name__)
+
+
+class ESP3Framer:
+    """Incremental ESP3 framer fed with arbitrary chunks of serial data"""
+
+    HEADER_LENGTH = 6  # Sync + data length (2) + optional length + packet type + header CRC
+    # Longest data field of any packet the gateway sends (ESP3 radio message limit,
+    # TCM310 frames are far shorter). Longer lengths come from corrupt headers that
+    # passed the CRC8 by chance and would otherwise stall the framer for up to 64 KiB.
+    MAX_DATA_LENGTH = 512
+
+    def __init__(self, capture=None):
+        """
+        Initialize framer with an empty receive buffer
+
+        Args:
+            capture: Optional CaptureWriter receiving every valid raw frame
+        """
+        self.capture = capture
+        # Reused receive buffer: consumed bytes are trimmed from the front,
+        # partial frames stay in place until the rest of the frame arrives
+        self._buffer = bytearray()
+
+        # Statistics
+        self.frames = 0
+        self.resyncs = 0
+        self.crc_errors = 0
+        self.bytes_received = 0
+        self.bytes_discarded = 0
+        self._started_at = time.monotonic()
+        self._last_report_at = self._started_at
+        self._last_report_frames = 0
+
+    def reset(self):
+        """Drop any buffered partial frame"""
+        self._buffer.clear()
+
+    def feed(self, chunk: bytes) -> List[ESP3Packet]:
+        """
+        Feed received bytes and return all packets completed by them
+
+        Args:
+            chunk: Raw bytes as read from the serial port (any length)
+
+        Returns:
+            List of complete, CRC-valid ESP3Packets (may be empty)
+        """
+        buffer = self._buffer
+        if chunk:
+            buffer += chunk
+            self.bytes_received += len(chunk)
+
+        packets = []
+        pos = 0
+        end = len(buffer)
+
+        while pos < end:
+            # Find next sync byte
+            sync = buffer.find(ESP3Packet.SYNC_BYTE, pos)
+            if sync < 0:
+                self.bytes_discarded += end - pos
+                pos = end
+                break
+            if sync > pos:
+                self.bytes_discarded += sync - pos
+                pos = sync
+
+            # Wait for complete header
+            if end - pos < self.HEADER_LENGTH:
+                break
+
+            # Validate header CRC - a mismatch means this 0x55 was payload, not a sync byte
+            if ESP3Packet.calculate_crc8(buffer[pos + 1:pos + 5]) != buffer[pos + 5]:
+                self.resyncs += 1
+                self.bytes_discarded += 1
+                pos += 1
+                continue
+
+            data_length = (buffer[pos + 1] << 8) | buffer[pos + 2]
+            if data_length > self.MAX_DATA_LENGTH:
+                self.resyncs += 1
+                self.bytes_discarded += 1
+                pos += 1
+                continue
+            optional_length = buffer[pos + 3]
+            frame_length = self.HEADER_LENGTH + data_length + optional_length + 1
+
+            # Wait for complete frame
+            if end - pos < frame_length:
+                break
+
+            frame = bytes(buffer[pos:pos + frame_length])
+            try:
+                packet = ESP3Packet(frame)
+            except ValueError as e:
+                # Data CRC failed - resync on the byte after this sync byte
+                logger.debug(f"Dropping corrupt ESP3 frame: {e}")
+                self.crc_errors += 1
+                self.resyncs += 1
+                self.bytes_discarded += 1
+                pos += 1
+                continue
+
+            if self.capture is not None:
+                self.capture.record(frame)
+            packets.append(packet)
+            self.frames += 1
+            pos += frame_length
+
+        if pos:
+            del buffer[:pos]
+
+        return packets
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get framer statistics
+
+        Returns:
+            Dictionary with frame, resync and throughput counters
+        """
+        elapsed = time.monotonic() - self._started_at
+        return {
+            'frames': self.frames,
+            'resyncs': self.resyncs,
+            'crc_errors': self.crc_errors,
+            'bytes_received': self.bytes_received,
+            'bytes_discarded': self.bytes_discarded,
+            'buffered_bytes': len(self._buffer),
+            'frames_per_second': round(self.frames / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+    def report(self) -> str:
+        """
+        Build a one-line summary covering the interval since the last report
+
+        Returns:
+            Human readable summary with frames/s and resync counts
+        """
+        now = time.monotonic()
+        interval = now - self._last_report_at
+        interval_frames = self.frames - self._last_report_frames
+        rate = interval_frames / interval if interval > 0 else 0.0
+
+        self._last_report_at = now
+        self._last_report_frames = self.frames
+
+        return (f"{interval_frames} frames in {interval:.0f}s ({rate:.2f} frames/s), "
+                f"total {self.frames} frames, {self.resyncs} resyncs, "
+                f"{self.crc_errors} CRC errors, {self.bytes_discarded} bytes discarded")
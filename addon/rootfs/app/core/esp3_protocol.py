@@ -8,9 +8,58 @@ from typing import Optional, Tuple
 logger = logging.getLogger(__name__)
 
 
+def _build_crc8_table() -> Tuple[int, ...]:
+    """Precompute CRC8 (polynomial 0x07) for every byte value"""
+    table = []
+    for value in range(256):
+        crc = value
+        for _ in range(8):
+            if crc & 0x80:
+                crc = ((crc << 1) ^ 0x07) & 0xFF
+            else:
+                crc = (crc << 1) & 0xFF
+        table.append(crc)
+    return tuple(table)
+
+
+CRC8_TABLE = _build_crc8_table()
+
+
+# Payload length by RORG for fixed-length telegrams (RPS, 1BS, 4BS); VLD and
+# other RORGs carry everything between RORG and sender ID
+RADIO_PAYLOAD_LENGTHS = {0xF6: 1, 0xD5: 1, 0xA5: 4}
+
+
+def radio_payload(data: bytes) -> memoryview:
+    """
+    Get the payload of ERP1 radio data as a view (no copy)
+
+    Args:
+        data: ERP1 data: [RORG] [Payload...] [Sender ID - 4 bytes] [Status - 1 byte]
+
+    Returns:
+        View of the payload bytes (empty if the data is too short)
+    """
+    view = memoryview(data)
+    if len(data) < 6:  # Minimum: RORG + 1 data + 4 sender + 1 status
+        return view[0:0]
+    end = len(data) - 5
+    length = RADIO_PAYLOAD_LENGTHS.get(data[0])
+    if length is not None:
+        end = min(end, 1 + length)
+    return view[1:end]
+
+
 class ESP3Packet:
     """ESP3 packet structure parser and builder"""
     
+    __slots__ = (
+        'sync', 'data_length', 'optional_length', 'packet_type',
+        'data', 'optional_data',
+        # Decoded once at parse/build time
+        'sender_id', 'rorg', 'status', 'rssi', 'payload'
+    )
+    
     SYNC_BYTE = 0x55
     
     # Packet types
@@ -47,24 +96,27 @@ class ESP3Packet:
             self.packet_type = 0
             self.data = b''
             self.optional_data = b''
+            self._decode_fields()
     
     def parse(self, raw_data: bytes):
         """Parse raw ESP3 packet data"""
         if len(raw_data) < 6:
             raise ValueError("Packet too short")
         
+        view = memoryview(raw_data)
+        
         # Parse header
         self.sync = raw_data[0]
         if self.sync != self.SYNC_BYTE:
             raise ValueError(f"Invalid sync byte: {hex(self.sync)}")
         
-        self.data_length = int.from_bytes(raw_data[1:3], 'big')
+        self.data_length = (raw_data[1] << 8) | raw_data[2]
         self.optional_length = raw_data[3]
         self.packet_type = raw_data[4]
         header_crc = raw_data[5]
         
         # Validate header CRC
-        calculated_header_crc = self.calculate_crc8(raw_data[1:5])
+        calculated_header_crc = self.calculate_crc8(view[1:5])
         if header_crc != calculated_header_crc:
             raise ValueError(f"Header CRC mismatch: {hex(header_crc)} != {hex(calculated_header_crc)}")
         
@@ -76,29 +128,49 @@ class ESP3Packet:
         if len(raw_data) < optional_end + 1:
             raise ValueError("Packet data incomplete")
         
-        self.data = raw_data[data_start:data_end]
-        self.optional_data = raw_data[data_end:optional_end]
+        # Validate data CRC over data + optional data without concatenating them
         data_crc = raw_data[optional_end]
-        
-        # Validate data CRC
-        calculated_data_crc = self.calculate_crc8(self.data + self.optional_data)
+        calculated_data_crc = self.calculate_crc8(view[data_start:optional_end])
         if data_crc != calculated_data_crc:
             raise ValueError(f"Data CRC mismatch: {hex(data_crc)} != {hex(calculated_data_crc)}")
         
-        logger.debug(f"Parsed ESP3 packet: type={hex(self.packet_type)}, data_len={self.data_length}, opt_len={self.optional_length}")
+        self.data = bytes(view[data_start:data_end])
+        self.optional_data = bytes(view[data_end:optional_end])
+        self._decode_fields()
+    
+    def _decode_fields(self):
+        """Decode sender ID, RORG, status and RSSI once so getters are plain attribute reads"""
+        data = self.data
+        self.sender_id = None
+        self.rorg = None
+        self.status = None
+        self.rssi = None
+        self.payload = memoryview(b'')
+        
+        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1 and data:
+            # Structure: [RORG] [Data...] [Sender ID - 4 bytes] [Status - 1 byte]
+            self.rorg = data[0]
+            self.status = data[-1]
+            self.payload = radio_payload(data)
+            if len(data) >= 6:  # Minimum: RORG + 1 data + 4 sender + 1 status
+                self.sender_id = memoryview(data)[-5:-1].hex()
+        
+        # RSSI is at byte 5 of optional data, converted to dBm (negative value)
+        if len(self.optional_data) >= 6:
+            self.rssi = -self.optional_data[5]
     
     @staticmethod
-    def calculate_crc8(data: bytes) -> int:
-        """Calculate CRC8 checksum using EnOcean polynomial"""
-        crc = 0
+    def calculate_crc8(data: bytes, crc: int = 0) -> int:
+        """
+        Calculate CRC8 checksum using EnOcean polynomial (table driven)
+        
+        Args:
+            data: Bytes-like object (bytes, bytearray or memoryview)
+            crc: Initial CRC value, to continue a CRC over several blocks
+        """
+        table = CRC8_TABLE
         for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = (crc << 1) ^ 0x07
-                else:
-                    crc = crc << 1
-                crc &= 0xFF
+            crc = table[crc ^ byte]
         return crc
     
     def build(self) -> bytes:
@@ -113,7 +185,7 @@ class ESP3Packet:
         header_crc = self.calculate_crc8(header)
         
         # Build data CRC
-        data_crc = self.calculate_crc8(self.data + self.optional_data)
+        data_crc = self.calculate_crc8(self.optional_data, self.calculate_crc8(self.data))
         
         # Assemble packet
         packet = bytes([self.SYNC_BYTE]) + header + bytes([header_crc]) + self.data + self.optional_data + bytes([data_crc])
@@ -121,45 +193,29 @@ class ESP3Packet:
     
     def get_sender_id(self) -> Optional[str]:
         """Extract sender ID from radio telegram"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            # Sender ID is always the last 4 bytes before status byte
-            # Structure: [RORG] [Data...] [Sender ID - 4 bytes] [Status - 1 byte]
-            if len(self.data) >= 6:  # Minimum: RORG + 1 data + 4 sender + 1 status
-                sender_bytes = self.data[-5:-1]  # Last 4 bytes before status
-                return sender_bytes.hex()
-        return None
+        return self.sender_id
     
     def get_rorg(self) -> Optional[int]:
         """Extract RORG (R-ORG) from radio telegram"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            if len(self.data) >= 1:
-                return self.data[0]
-        return None
+        return self.rorg
     
     def get_rssi(self) -> Optional[int]:
         """Extract RSSI from optional data"""
-        if len(self.optional_data) >= 6:
-            # RSSI is at byte 5 of optional data
-            rssi_raw = self.optional_data[5]
-            # Convert to dBm (negative value)
-            return -rssi_raw
-        return None
+        return self.rssi
     
-    def get_data_bytes(self) -> bytes:
-        """Get data bytes (without RORG, sender ID, and status)"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            if len(self.data) >= 6:
-                # Data is between RORG and sender ID
-                # Structure: [RORG] [Data...] [Sender ID - 4 bytes] [Status - 1 byte]
-                return self.data[1:-5]  # Skip RORG, skip last 5 bytes (4 ID + 1 status)
-        return b''
+    def get_data_bytes(self) -> memoryview:
+        """
+        Get data bytes (without RORG, sender ID, and status)
+        
+        The payload is sliced once when the packet is parsed (1 byte for
+        RPS/1BS, 4 bytes for 4BS, variable for VLD) and returned as a
+        read-only view into the packet data.
+        """
+        return self.payload
     
     def get_status_byte(self) -> Optional[int]:
         """Get status byte from telegram"""
-        if self.packet_type == self.PACKET_TYPE_RADIO_ERP1:
-            if len(self.data) >= 1:
-                return self.data[-1]
-        return None
+        return self.status
     
     def is_teach_in(self) -> bool:
         """Check if this is a teach-in telegram"""
@@ -182,16 +238,32 @@ class ESP3Packet:
         return False
     
     @classmethod
-    def create_common_command(cls, command: int, data: bytes = b'') -> 'ESP3Packet':
-        """Create a common command packet"""
+    def create_packet(cls, packet_type: int, data: bytes, optional_data: bytes = b'') -> 'ESP3Packet':
+        """
+        Create a packet of any type from its data and optional data
+        
+        Args:
+            packet_type: ESP3 packet type (e.g. PACKET_TYPE_RESPONSE)
+            data: Data bytes
+            optional_data: Optional data bytes
+        
+        Returns:
+            ESP3Packet with lengths and decoded fields set
+        """
         packet = cls()
-        packet.packet_type = cls.PACKET_TYPE_COMMON_COMMAND
-        packet.data = bytes([command]) + data
-        packet.data_length = len(packet.data)
-        packet.optional_length = 0
-        packet.optional_data = b''
+        packet.packet_type = packet_type
+        packet.data = data
+        packet.data_length = len(data)
+        packet.optional_data = optional_data
+        packet.optional_length = len(optional_data)
+        packet._decode_fields()
         return packet
     
+    @classmethod
+    def create_common_command(cls, command: int, data: bytes = b'') -> 'ESP3Packet':
+        """Create a common command packet"""
+        return cls.create_packet(cls.PACKET_TYPE_COMMON_COMMAND, bytes([command]) + data)
+    
     @classmethod
     def create_read_base_id(cls) -> 'ESP3Packet':
         """Create packet to read base ID"""
@@ -249,6 +321,7 @@ class ESP3Packet:
         # Optional data (empty for now)
         packet.optional_length = 0
         packet.optional_data = b''
+        packet._decode_fields()
         
         return packet
     
@@ -285,6 +358,7 @@ class ESP3Packet:
         # Security Level: 0 (no encryption)
         packet.optional_data = bytes([0x03]) + destination_id_bytes + bytes([0xFF, 0x00])
         packet.optional_length = len(packet.optional_data)
+        packet._decode_fields()
         
         logger.debug(f"Created radio packet: RORG={hex(rorg)}, sender={sender_id}, dest={destination_id}, data={data_bytes.hex()}")
         
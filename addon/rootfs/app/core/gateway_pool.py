@@ -0,0 +1,169 @@
+"""
+Gateway Pool
+Manages several EnOcean USB gateways feeding one telegram pipeline
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Tuple, Any
+from .serial_handler import SerialHandler
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayPool:
+    """Track gateways and the link quality of each device per gateway"""
+
+    LINK_MAX_AGE = 900.0  # Seconds after which a received RSSI no longer counts for routing
+
+    def __init__(self):
+        """Initialize empty gateway pool"""
+        self.gateways: List[SerialHandler] = []
+        # device_id -> gateway port -> (rssi, monotonic timestamp)
+        self._links: Dict[str, Dict[str, Tuple[Optional[int], float]]] = {}
+        self._by_port: Dict[str, SerialHandler] = {}
+
+    def add(self, gateway: SerialHandler):
+        """
+        Add an opened gateway
+
+        Args:
+            gateway: SerialHandler of the gateway (first added is the primary)
+        """
+        self.gateways.append(gateway)
+        self._by_port[gateway.port] = gateway
+
+    @property
+    def primary(self) -> Optional[SerialHandler]:
+        """Primary gateway (first configured port that opened successfully)"""
+        return self.gateways[0] if self.gateways else None
+
+    def __len__(self) -> int:
+        return len(self.gateways)
+
+    def record_link(self, device_id: str, gateway: SerialHandler, rssi: Optional[int], now: Optional[float] = None):
+        """
+        Record that a gateway heard a device
+
+        Called for every received copy, including duplicates suppressed by dedup,
+        so the route table sees all gateways that can reach the device.
+
+        Args:
+            device_id: Sender ID of the telegram
+            gateway: Gateway that received it
+            rssi: Received signal strength in dBm
+            now: Monotonic timestamp (default: time.monotonic())
+        """
+        if now is None:
+            now = time.monotonic()
+        links = self._links.get(device_id)
+        if links is None:
+            links = self._links[device_id] = {}
+        links[gateway.port] = (rssi, now)
+
+    def select(self, device_id: str, base_id: Optional[str] = None) -> Optional[SerialHandler]:
+        """
+        Select the gateway to send to a device
+
+        Actuators only accept telegrams from the base ID they were taught
+        with, so only gateways sending with that base ID are candidates;
+        among them the one with the best recent link to the device wins.
+
+        Args:
+            device_id: Destination device ID
+            base_id: Base ID the device was taught with (None = primary gateway's)
+
+        Returns:
+            Candidate gateway with the strongest recent RSSI, the first open
+            candidate if the device has not been heard recently, or None if
+            no gateway sends with the base ID
+        """
+        gateway = self._select(device_id, base_id)
+        if gateway is None and self.primary is not None:
+            logger.warning(f"No gateway sends with base ID {base_id} that device {device_id} was taught with")
+        return gateway
+
+    def _select(self, device_id: str, base_id: Optional[str]) -> Optional[SerialHandler]:
+        """Select the gateway to send to a device without logging (see select)"""
+        primary = self.primary
+        if primary is None:
+            return None
+        if base_id is None:
+            base_id = primary.base_id
+        if base_id is None:
+            candidates = [primary]
+        else:
+            base_id = base_id.lower()
+            candidates = [gateway for gateway in self.gateways if gateway.base_id == base_id]
+            if not candidates:
+                return None
+        if len(candidates) == 1:
+            return candidates[0]
+
+        links = self._links.get(device_id, {})
+        horizon = time.monotonic() - self.LINK_MAX_AGE
+        best = None
+        best_rssi = None
+        for gateway in candidates:
+            link = links.get(gateway.port)
+            if link is None or link[1] < horizon or not gateway.is_open():
+                continue
+            rssi = link[0]
+            if best is None or (rssi is not None and (best_rssi is None or rssi > best_rssi)):
+                best = gateway
+                best_rssi = rssi
+        if best is not None:
+            return best
+        return next((gateway for gateway in candidates if gateway.is_open()), candidates[0])
+
+    def start_reading(self, callback):
+        """
+        Build reader coroutines for all gateways
+
+        Args:
+            callback: async function(packet, gateway)
+
+        Returns:
+            List of coroutines, one per gateway
+        """
+        coroutines = []
+        for gateway in self.gateways:
+            async def on_packet(packet, gateway=gateway):
+                await callback(packet, gateway)
+            coroutines.append(gateway.start_reading(on_packet))
+        return coroutines
+
+    def close(self):
+        """Stop and close all gateways"""
+        for gateway in self.gateways:
+            gateway.stop_reading()
+            gateway.close()
+
+    def get_stats(self, taught_base_ids: Optional[Dict[str, Optional[str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Get per-gateway statistics
+
+        Args:
+            taught_base_ids: Device ID -> base ID the device was taught with,
+                so routes match the gateway commands are sent through
+
+        Returns:
+            List of dictionaries with port, base ID and receive statistics
+        """
+        if taught_base_ids is None:
+            taught_base_ids = {}
+        routed = {}
+        for device_id in self._links:
+            gateway = self._select(device_id, taught_base_ids.get(device_id))
+            if gateway is not None:
+                routed[gateway.port] = routed.get(gateway.port, 0) + 1
+
+        return [
+            {
+                'port': gateway.port,
+                'base_id': gateway.base_id,
+                'connected': gateway.is_open(),
+                'routed_devices': routed.get(gateway.port, 0),
+                'stats': gateway.get_stats()
+            }
+            for gateway in self.gateways
+        ]
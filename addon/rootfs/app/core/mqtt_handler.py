@@ -4,15 +4,20 @@ Manages MQTT communication and Home Assistant discovery
 """
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import paho.mqtt.client as mqtt
 
 logger = logging.getLogger(__name__)
 
+# Options given once at device level in device discovery (inherited by all components)
+SHARED_DEVICE_KEYS = ('state_topic', 'availability_topic', 'payload_available', 'payload_not_available')
+
 
 class MQTTHandler:
     """Handle MQTT communication and Home Assistant discovery"""
     
+    HA_STATUS_TOPIC = "homeassistant/status"
+    
     def __init__(self, host: str, port: int, username: str = None, password: str = None):
         """
         Initialize MQTT handler
@@ -30,7 +35,9 @@ class MQTTHandler:
         self.client = None
         self.connected = False
         self.command_callback = None
+        self.discovery_lost_callback = None
         self.event_loop = None
+        self._was_connected = False
         
     def connect(self) -> bool:
         """Connect to MQTT broker"""
@@ -42,6 +49,7 @@ class MQTTHandler:
             
             self.client.on_connect = self._on_connect
             self.client.on_disconnect = self._on_disconnect
+            self.client.message_callback_add(self.HA_STATUS_TOPIC, self._on_ha_status)
             
             self.client.connect(self.host, self.port, 60)
             self.client.loop_start()
@@ -65,9 +73,29 @@ class MQTTHandler:
         if rc == 0:
             self.connected = True
             logger.info("✓ Connected to MQTT broker")
+            # Home Assistant announces its (re)start here and then needs all discovery again
+            client.subscribe(self.HA_STATUS_TOPIC, qos=1)
+            # A broker that did not keep our session may not have kept the retained configs either
+            if self._was_connected and not flags.get('session present'):
+                self._discovery_lost("Reconnected to MQTT broker without session")
+            self._was_connected = True
         else:
             logger.error(f"Failed to connect to MQTT broker: {rc}")
     
+    def _on_ha_status(self, client, userdata, msg):
+        """Callback when Home Assistant publishes its status (birth/will message)"""
+        # A retained "online" is left over from an earlier start, not a new one
+        if msg.retain or msg.payload.decode('utf-8', 'replace').strip().lower() != 'online':
+            return
+        self._discovery_lost("Home Assistant came online")
+    
+    def _discovery_lost(self, reason: str):
+        """Hand the republishing of all discovery configs to the event loop"""
+        if not (self.discovery_lost_callback and self.event_loop):
+            return
+        import asyncio
+        asyncio.run_coroutine_threadsafe(self.discovery_lost_callback(reason), self.event_loop)
+    
     def _on_disconnect(self, client, userdata, rc):
         """Callback when disconnected from MQTT broker"""
         self.connected = False
@@ -76,6 +104,168 @@ class MQTTHandler:
         else:
             logger.info("Disconnected from MQTT broker")
     
+    def build_entity_config(self, device: Dict[str, Any], entity: Dict[str, Any],
+                            is_controllable: bool = False) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Build Home Assistant discovery config of one entity
+        
+        Args:
+            device: Device information dict
+            entity: Entity information dict
+            is_controllable: Whether this entity supports commands
+            
+        Returns:
+            Tuple of (component, unique ID, config dict)
+        """
+        component = entity.get('component', 'sensor')
+        device_id = device['id']
+        entity_shortcut = entity['shortcut']
+        
+        # Create unique ID
+        unique_id = f"enocean_{device_id}_{entity_shortcut}"
+        
+        # Build discovery payload
+        payload = {
+            "name": f"{device['name']} {entity['name']}",
+            "unique_id": unique_id,
+            "state_topic": f"enocean/{device_id}/state",
+            "availability_topic": f"enocean/{device_id}/availability",
+            "payload_available": "online",
+            "payload_not_available": "offline",
+            "device": {
+                "identifiers": [f"enocean_{device_id}"],
+                "name": device['name'],
+                "manufacturer": device.get('manufacturer', 'EnOcean'),
+                "model": device.get('eep', 'Unknown'),
+                "via_device": "enocean_gateway"
+            }
+        }
+        
+        # Set value_template based on component type
+        if component == 'binary_sensor':
+            # For binary sensors, convert 0/1 to OFF/ON
+            payload['value_template'] = f"{{% if value_json.{entity_shortcut} == 1 %}}ON{{% else %}}OFF{{% endif %}}"
+        elif component == 'switch':
+            # For switches, convert 0/1 to OFF/ON to match state_on/state_off
+            payload['value_template'] = f"{{% if value_json.{entity_shortcut} == 1 %}}ON{{% else %}}OFF{{% endif %}}"
+        else:
+            # For regular sensors, use value directly
+            payload['value_template'] = f"{{{{ value_json.{entity_shortcut} }}}}"
+        
+        # Add command topic for controllable entities
+        if is_controllable:
+            command_topic = f"enocean/{device_id}/set/{entity_shortcut}"
+            payload['command_topic'] = command_topic
+            
+            # Add component-specific command fields
+            if component == 'switch':
+                payload['payload_on'] = '{"state": "ON"}'
+                payload['payload_off'] = '{"state": "OFF"}'
+                payload['state_on'] = "ON"
+                payload['state_off'] = "OFF"
+                payload['optimistic'] = False
+            elif component == 'light':
+                payload['payload_on'] = '{"state": "ON"}'
+                payload['payload_off'] = '{"state": "OFF"}'
+                payload['state_on'] = 1
+                payload['state_off'] = 0
+                payload['optimistic'] = False
+                # Add brightness support if entity supports it
+                if 'brightness' in entity.get('name', '').lower() or 'dim' in entity.get('name', '').lower():
+                    payload['brightness_command_topic'] = command_topic
+                    payload['brightness_scale'] = 255
+                    payload['brightness_state_topic'] = f"enocean/{device_id}/state"
+                    payload['brightness_value_template'] = f"{{{{ value_json.{entity_shortcut} }}}}"
+                # Add RGB support for RGB lights
+                if 'rgb' in entity.get('name', '').lower() or 'color' in entity.get('name', '').lower():
+                    payload['rgb_command_topic'] = command_topic
+                    payload['rgb_state_topic'] = f"enocean/{device_id}/state"
+                    payload['rgb_value_template'] = f"{{{{ value_json.rgb }}}}"
+                    payload['color_mode'] = True
+                    payload['supported_color_modes'] = ['rgb']
+            elif component == 'cover':
+                payload['position_topic'] = f"enocean/{device_id}/state"
+                payload['set_position_topic'] = command_topic
+                payload['position_template'] = f"{{{{ value_json.{entity_shortcut} }}}}"
+                payload['optimistic'] = False
+            
+            logger.debug(f"Added command topic for controllable entity: {command_topic}")
+        
+        # Add optional fields
+        if entity.get('device_class'):
+            payload['device_class'] = entity['device_class']
+        if entity.get('icon'):
+            payload['icon'] = entity['icon']
+        if entity.get('unit'):
+            payload['unit_of_measurement'] = entity['unit']
+        
+        return component, unique_id, payload
+    
+    def build_discovery(self, device: Dict[str, Any], entity: Dict[str, Any], is_controllable: bool = False) -> Tuple[str, str]:
+        """
+        Render Home Assistant MQTT discovery message (one per entity)
+        
+        Args:
+            device: Device information dict
+            entity: Entity information dict
+            is_controllable: Whether this entity supports commands
+            
+        Returns:
+            Tuple of (config topic, JSON payload)
+        """
+        component, unique_id, payload = self.build_entity_config(device, entity, is_controllable)
+        return f"homeassistant/{component}/{unique_id}/config", json.dumps(payload)
+    
+    def build_device_discovery(self, device: Dict[str, Any], entities: List[Tuple[Dict[str, Any], bool]]) -> Tuple[str, str]:
+        """
+        Render Home Assistant device discovery message (all entities of a device in one config, HA 2024.11+)
+        
+        Args:
+            device: Device information dict
+            entities: List of (entity information dict, is_controllable)
+            
+        Returns:
+            Tuple of (config topic, JSON payload)
+        """
+        device_id = device['id']
+        payload = {
+            "device": None,
+            "origin": {
+                "name": "EnOcean MQTT Slim",
+                "support_url": "https://github.com/ESDN83/ha-enocean-mqtt-slim"
+            },
+            "components": {}
+        }
+        for entity, is_controllable in entities:
+            component, unique_id, config = self.build_entity_config(device, entity, is_controllable)
+            payload['device'] = config.pop('device')
+            # Topics shared by all entities are given once for the whole device
+            for key in SHARED_DEVICE_KEYS:
+                payload[key] = config.pop(key)
+            config['platform'] = component
+            payload['components'][unique_id] = config
+        return f"homeassistant/device/enocean_{device_id}/config", json.dumps(payload)
+    
+    @staticmethod
+    def discovery_topics(device: Dict[str, Any], entities: List[Dict[str, Any]]) -> List[str]:
+        """
+        Get the config topics of a device in both discovery modes
+        
+        Args:
+            device: Device information dict
+            entities: List of entity information dicts
+            
+        Returns:
+            List of per-entity config topics and the device config topic
+        """
+        device_id = device['id']
+        topics = [
+            f"homeassistant/{entity.get('component', 'sensor')}/enocean_{device_id}_{entity['shortcut']}/config"
+            for entity in entities
+        ]
+        topics.append(f"homeassistant/device/enocean_{device_id}/config")
+        return topics
+    
     def publish_discovery(self, device: Dict[str, Any], entity: Dict[str, Any], is_controllable: bool = False) -> bool:
         """
         Publish Home Assistant MQTT discovery message
@@ -85,6 +275,24 @@ class MQTTHandler:
             entity: Entity information dict
             is_controllable: Whether this entity supports commands
             
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            topic, payload = self.build_discovery(device, entity, is_controllable)
+        except Exception as e:
+            logger.error(f"Error building discovery: {e}")
+            return False
+        return self.publish_config(topic, payload)
+    
+    def publish_config(self, topic: str, payload: str) -> bool:
+        """
+        Publish a retained discovery config (empty payload removes it)
+        
+        Args:
+            topic: Config topic
+            payload: Rendered JSON payload
+            
         Returns:
             True if successful, False otherwise
         """
@@ -93,99 +301,13 @@ class MQTTHandler:
             return False
         
         try:
-            component = entity.get('component', 'sensor')
-            device_id = device['id']
-            entity_shortcut = entity['shortcut']
-            
-            # Create unique ID
-            unique_id = f"enocean_{device_id}_{entity_shortcut}"
-            
-            # Discovery topic
-            topic = f"homeassistant/{component}/{unique_id}/config"
-            
-            # Build discovery payload
-            payload = {
-                "name": f"{device['name']} {entity['name']}",
-                "unique_id": unique_id,
-                "state_topic": f"enocean/{device_id}/state",
-                "availability_topic": f"enocean/{device_id}/availability",
-                "payload_available": "online",
-                "payload_not_available": "offline",
-                "device": {
-                    "identifiers": [f"enocean_{device_id}"],
-                    "name": device['name'],
-                    "manufacturer": device.get('manufacturer', 'EnOcean'),
-                    "model": device.get('eep', 'Unknown'),
-                    "via_device": "enocean_gateway"
-                }
-            }
-            
-            # Set value_template based on component type
-            if component == 'binary_sensor':
-                # For binary sensors, convert 0/1 to OFF/ON
-                payload['value_template'] = f"{{% if value_json.{entity_shortcut} == 1 %}}ON{{% else %}}OFF{{% endif %}}"
-            elif component == 'switch':
-                # For switches, convert 0/1 to OFF/ON to match state_on/state_off
-                payload['value_template'] = f"{{% if value_json.{entity_shortcut} == 1 %}}ON{{% else %}}OFF{{% endif %}}"
-            else:
-                # For regular sensors, use value directly
-                payload['value_template'] = f"{{{{ value_json.{entity_shortcut} }}}}"
-            
-            # Add command topic for controllable entities
-            if is_controllable:
-                command_topic = f"enocean/{device_id}/set/{entity_shortcut}"
-                payload['command_topic'] = command_topic
-                
-                # Add component-specific command fields
-                if component == 'switch':
-                    payload['payload_on'] = '{"state": "ON"}'
-                    payload['payload_off'] = '{"state": "OFF"}'
-                    payload['state_on'] = "ON"
-                    payload['state_off'] = "OFF"
-                    payload['optimistic'] = False
-                elif component == 'light':
-                    payload['payload_on'] = '{"state": "ON"}'
-                    payload['payload_off'] = '{"state": "OFF"}'
-                    payload['state_on'] = 1
-                    payload['state_off'] = 0
-                    payload['optimistic'] = False
-                    # Add brightness support if entity supports it
-                    if 'brightness' in entity.get('name', '').lower() or 'dim' in entity.get('name', '').lower():
-                        payload['brightness_command_topic'] = command_topic
-                        payload['brightness_scale'] = 255
-                        payload['brightness_state_topic'] = f"enocean/{device_id}/state"
-                        payload['brightness_value_template'] = f"{{{{ value_json.{entity_shortcut} }}}}"
-                    # Add RGB support for RGB lights
-                    if 'rgb' in entity.get('name', '').lower() or 'color' in entity.get('name', '').lower():
-                        payload['rgb_command_topic'] = command_topic
-                        payload['rgb_state_topic'] = f"enocean/{device_id}/state"
-                        payload['rgb_value_template'] = f"{{{{ value_json.rgb }}}}"
-                        payload['color_mode'] = True
-                        payload['supported_color_modes'] = ['rgb']
-                elif component == 'cover':
-                    payload['position_topic'] = f"enocean/{device_id}/state"
-                    payload['set_position_topic'] = command_topic
-                    payload['position_template'] = f"{{{{ value_json.{entity_shortcut} }}}}"
-                    payload['optimistic'] = False
-                
-                logger.debug(f"Added command topic for controllable entity: {command_topic}")
-            
-            # Add optional fields
-            if entity.get('device_class'):
-                payload['device_class'] = entity['device_class']
-            if entity.get('icon'):
-                payload['icon'] = entity['icon']
-            if entity.get('unit'):
-                payload['unit_of_measurement'] = entity['unit']
-            
-            # Publish discovery message
-            result = self.client.publish(topic, json.dumps(payload), qos=1, retain=True)
+            result = self.client.publish(topic, payload, qos=1, retain=True)
             
             if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                logger.info(f"Published discovery for {unique_id} (controllable={is_controllable})")
+                logger.info(f"Published discovery {topic}" if payload else f"Removed discovery {topic}")
                 return True
             else:
-                logger.error(f"Failed to publish discovery for {unique_id}: {result.rc}")
+                logger.error(f"Failed to publish discovery {topic}: {result.rc}")
                 return False
                 
         except Exception as e:
@@ -283,6 +405,9 @@ class MQTTHandler:
                 self.client.publish(topic, "", qos=1, retain=True)
                 logger.info(f"Removed discovery for {unique_id}")
             
+            # Device discovery config (device discovery mode)
+            self.client.publish(f"homeassistant/device/enocean_{device_id}/config", "", qos=1, retain=True)
+            
             return True
             
         except Exception as e:
@@ -345,6 +470,11 @@ class MQTTHandler:
                 # Try simple string payload (ON/OFF)
                 payload_str = msg.payload.decode('utf-8')
                 command = {'state': payload_str}
+            if isinstance(command, str):
+                command = {'state': command}
+            elif not isinstance(command, dict):
+                # Bare number from a brightness or set_position topic
+                command = {'value': command}
             
             logger.info(f"📥 Command received: device={device_id}, entity={entity}, command={command}")
             
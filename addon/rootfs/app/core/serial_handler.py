@@ -1,12 +1,15 @@
 """
 Serial Port Handler for EnOcean USB Gateway
-Manages communication with EnOcean USB stick via serial port
+Manages communication with EnOcean USB stick via serial port or network gateway
 """
 import asyncio
 import logging
-import serial
-from typing import Optional, Callable
+import time
+from collections import deque
+from typing import Optional, Callable, List
 from .esp3_protocol import ESP3Packet
+from .esp3_framer import ESP3Framer
+from .transport import create_transport
 
 logger = logging.getLogger(__name__)
 
@@ -14,165 +17,264 @@ logger = logging.getLogger(__name__)
 class SerialHandler:
     """Handle serial communication with EnOcean USB gateway"""
     
-    def __init__(self, port: str, baudrate: int = 57600):
+    STATS_INTERVAL = 60.0  # Seconds between framer statistics log lines
+    READ_TIMEOUT = 1.0  # read_packet timeout in seconds
+    RESPONSE_TIMEOUT = 2.0  # Seconds a response slot stays valid for fire-and-forget writes
+    LATE_RESPONSE_GRACE = 1.0  # Seconds after its timeout a response still belongs to a slot
+    
+    # Packet types delivered to the telegram pipeline (responses go to pending commands)
+    TELEGRAM_PACKET_TYPES = (ESP3Packet.PACKET_TYPE_RADIO_ERP1, ESP3Packet.PACKET_TYPE_EVENT)
+    
+    def __init__(self, port: str, baudrate: int = 57600, writer_thread: bool = False, capture=None):
         """
         Initialize serial handler
         
         Args:
-            port: Serial port path (e.g., /dev/ttyUSB0)
+            port: Serial port path (e.g., /dev/ttyUSB0) or network gateway URL
+                  (e.g., socket://192.168.1.50:3333 for ser2net/esp-link)
             baudrate: Baud rate (default: 57600 for EnOcean)
+            writer_thread: Send packets through a dedicated writer thread
+                           instead of the default asyncio executor (serial only)
+            capture: Optional CaptureWriter that records every received raw frame
         """
         self.port = port
         self.baudrate = baudrate
-        self.serial = None
+        self.transport = create_transport(port, baudrate, writer_thread)
         self.running = False
         self.base_id = None
         self.version_info = None
+        self.framer = ESP3Framer(capture)
+        self._last_stats_report = time.monotonic()
         
-    def open(self):
-        """Open serial port connection"""
-        try:
-            self.serial = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=1.0
-            )
-            logger.info(f"Opened serial port {self.port} at {self.baudrate} baud")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to open serial port {self.port}: {e}")
+        # Packets are handed over by the transport in batches on the event loop
+        self._loop = None
+        self._packet_queue: Optional[asyncio.Queue] = None
+        
+        # Pending command responses in send order: (deadline, future)
+        self._pending_responses = deque()
+        self._write_lock: Optional[asyncio.Lock] = None
+        self.late_responses = 0
+        self.lost_responses = 0
+        self._base_id_query: Optional[asyncio.Task] = None
+        
+    async def open(self) -> bool:
+        """
+        Open gateway connection
+        
+        Returns:
+            True if connected. Network gateways keep connecting in the
+            background once reading starts (see retries_connect).
+        """
+        if not await self.transport.open():
             return False
+        self.framer.reset()
+        return True
+    
+    @property
+    def retries_connect(self) -> bool:
+        """Check if the gateway keeps trying to connect after a failed open()"""
+        return self.transport.RECONNECTS
     
     def close(self):
-        """Close serial port connection"""
-        if self.serial and self.serial.is_open:
-            self.serial.close()
-            logger.info(f"Closed serial port {self.port}")
+        """Close gateway connection"""
+        self.transport.close()
     
     def is_open(self) -> bool:
-        """Check if serial port is open"""
-        return self.serial is not None and self.serial.is_open
+        """Check if gateway connection is open"""
+        return self.transport.is_open()
+    
+    def _start_receiving(self):
+        """Start the transport receive path bound to the running event loop"""
+        if self.transport.is_started():
+            return
+        
+        self._loop = asyncio.get_running_loop()
+        self._packet_queue = asyncio.Queue()
+        self._write_lock = asyncio.Lock()
+        self._pending_responses.clear()
+        self.transport.on_connected = self._on_connected
+        self.transport.start(self.framer, self._dispatch_packets)
+    
+    def _on_connected(self):
+        """Query the base ID once a gateway that was unreachable at start connects"""
+        if self.base_id is None and (self._base_id_query is None or self._base_id_query.done()):
+            self._base_id_query = asyncio.ensure_future(self.get_base_id())
+    
+    def _dispatch_packets(self, packets: List[ESP3Packet]):
+        """
+        Event loop side of the reader handoff - demultiplex received packets
+        
+        RESPONSE packets complete the oldest pending command future (the gateway
+        answers every packet in the order it was sent), radio telegrams and
+        events go to the telegram queue consumed by start_reading.
+        """
+        for packet in packets:
+            if packet.packet_type == ESP3Packet.PACKET_TYPE_RESPONSE:
+                self._dispatch_response(packet)
+            elif packet.packet_type in self.TELEGRAM_PACKET_TYPES:
+                self._packet_queue.put_nowait(packet)
+            else:
+                logger.debug(f"Ignoring packet type {hex(packet.packet_type)}")
+    
+    def _dispatch_response(self, packet: ESP3Packet):
+        """
+        Resolve the oldest pending response future
+        
+        The gateway answers in send order, so a response arriving shortly
+        after the oldest slot timed out is that command's late answer and is
+        dropped - handing it to the next slot would shift every following
+        response onto the wrong command. Only a slot silent for longer than
+        the grace period is considered lost and skipped.
+        """
+        now = self._loop.time()
+        while self._pending_responses:
+            deadline, future = self._pending_responses.popleft()
+            if deadline + self.LATE_RESPONSE_GRACE < now:
+                # Gateway never answered this one - the response belongs to a later slot
+                self.lost_responses += 1
+                continue
+            if deadline < now or future.done():
+                self.late_responses += 1
+                logger.debug(f"Dropping late response packet: {packet.data.hex()}")
+                return
+            future.set_result(packet)
+            return
+        logger.debug(f"Unsolicited response packet: {packet.data.hex()}")
+    
+    async def _wait_for_late_responses(self):
+        """
+        Hold back new commands while a timed out command may still be answered
+        
+        Otherwise the late answer would be dropped in place of the new
+        command's response, which would then time out in turn.
+        """
+        while self._pending_responses:
+            deadline, _ = self._pending_responses[0]
+            now = self._loop.time()
+            if deadline >= now:
+                return
+            if deadline + self.LATE_RESPONSE_GRACE < now:
+                self._pending_responses.popleft()
+                self.lost_responses += 1
+                continue
+            await asyncio.sleep(deadline + self.LATE_RESPONSE_GRACE - now)
+    
+    def _expect_response(self, timeout: float) -> asyncio.Future:
+        """Reserve the next response slot in the FIFO"""
+        future = self._loop.create_future()
+        self._pending_responses.append((self._loop.time() + timeout, future))
+        return future
+    
+    def _discard_response_slot(self, future: asyncio.Future):
+        """Remove a response slot whose packet was never sent"""
+        for entry in self._pending_responses:
+            if entry[1] is future:
+                self._pending_responses.remove(entry)
+                break
+        future.cancel()
     
     async def read_packet(self) -> Optional[ESP3Packet]:
         """
-        Read and parse one ESP3 packet from serial port
+        Read one ESP3 radio telegram or event packet received by the transport
         
         Returns:
-            ESP3Packet if successful, None otherwise
+            ESP3Packet if successful, None if no complete packet arrived within the port timeout
         """
-        if not self.is_open():
+        if self.is_open() or self.retries_connect:
+            self._start_receiving()
+        
+        if self._packet_queue is None:
+            # Never connected - wait instead of returning immediately so callers don't spin
+            await asyncio.sleep(self.READ_TIMEOUT)
             return None
         
         try:
-            # Wait for sync byte
-            bytes_read = 0
-            timeout_count = 0
-            logger.info("🔍 Waiting for sync byte (0x55)... Listening for EnOcean devices...")
-            
-            while True:
-                byte = await asyncio.get_event_loop().run_in_executor(
-                    None, self.serial.read, 1
-                )
-                
-                # If no byte received (timeout)
-                if not byte:
-                    timeout_count += 1
-                    if timeout_count % 10 == 0:  # Every 10 seconds
-                        logger.info(f"   Still waiting... ({timeout_count} seconds elapsed, 0 bytes received)")
-                    await asyncio.sleep(0.01)
-                    continue
-                
-                # We got a byte!
-                bytes_read += 1
-                
-                # Log every 100 non-sync bytes
-                if bytes_read % 100 == 0:
-                    logger.info(f"   Read {bytes_read} bytes so far, still looking for sync...")
-                
-                # Log ALL bytes received (not just debug)
-                logger.debug(f"Read byte: 0x{byte[0]:02x}")
-                
-                # Log non-sync bytes to help diagnose issues
-                if byte[0] != ESP3Packet.SYNC_BYTE:
-                    logger.info(f"   Received non-sync byte: 0x{byte[0]:02x} (looking for 0x55)")
-                
-                # Check if it's the sync byte
-                if byte[0] == ESP3Packet.SYNC_BYTE:
-                    logger.info(f"✅ Found sync byte (0x55) after reading {bytes_read} bytes!")
-                    break
-            
-            # Read header (4 bytes)
-            header = await asyncio.get_event_loop().run_in_executor(
-                None, self.serial.read, 4
-            )
-            if len(header) != 4:
-                logger.warning("Incomplete header received")
-                return None
-            
-            # Parse header to get lengths
-            data_length = int.from_bytes(header[0:2], 'big')
-            optional_length = header[2]
-            
-            # Read header CRC
-            header_crc = await asyncio.get_event_loop().run_in_executor(
-                None, self.serial.read, 1
-            )
-            if len(header_crc) != 1:
-                logger.warning("Incomplete header CRC received")
-                return None
-            
-            # Read data, optional data, and data CRC
-            total_data_length = data_length + optional_length + 1
-            data_block = await asyncio.get_event_loop().run_in_executor(
-                None, self.serial.read, total_data_length
-            )
-            if len(data_block) != total_data_length:
-                logger.warning(f"Incomplete data block received: {len(data_block)}/{total_data_length}")
-                return None
-            
-            # Reconstruct full packet
-            raw_packet = bytes([ESP3Packet.SYNC_BYTE]) + header + header_crc + data_block
-            
-            # Parse packet
-            packet = ESP3Packet(raw_packet)
+            # Keeps waiting while a network transport reconnects
+            packet = await asyncio.wait_for(self._packet_queue.get(), timeout=self.READ_TIMEOUT)
             logger.debug(f"Received packet: {packet}")
             return packet
-            
+        except asyncio.TimeoutError:
+            return None
         except Exception as e:
             logger.error(f"Error reading packet: {e}")
             return None
     
-    async def write_packet(self, packet: ESP3Packet) -> bool:
+    def get_stats(self) -> dict:
         """
-        Write ESP3 packet to serial port
+        Get serial receive statistics
+        
+        Returns:
+            Dictionary with framer statistics
+        """
+        stats = self.framer.get_stats()
+        stats['queued_packets'] = self._packet_queue.qsize() if self._packet_queue else 0
+        stats.update(self.transport.get_stats())
+        stats['pending_responses'] = len(self._pending_responses)
+        stats['late_responses'] = self.late_responses
+        stats['lost_responses'] = self.lost_responses
+        return stats
+    
+    def _report_stats_if_due(self):
+        """Log a periodic framer summary (frames/s, resyncs)"""
+        now = time.monotonic()
+        if now - self._last_stats_report >= self.STATS_INTERVAL:
+            self._last_stats_report = now
+            logger.info(f"📈 Serial: {self.framer.report()}")
+    
+    async def _write_packet(self, packet: ESP3Packet, response_timeout: float) -> Optional[asyncio.Future]:
+        """
+        Write ESP3 packet and reserve its response slot
         
         Args:
             packet: ESP3Packet to send
+            response_timeout: How long the response slot stays valid
             
         Returns:
-            True if successful, False otherwise
+            Future resolved with the gateway response, or None if the write failed
         """
         if not self.is_open():
-            return False
+            return None
+        
+        self._start_receiving()
         
         try:
             raw_data = packet.build()
-            await asyncio.get_event_loop().run_in_executor(
-                None, self.serial.write, raw_data
-            )
+            
+            # Slot order must match write order, so reserve and write under the lock
+            async with self._write_lock:
+                await self._wait_for_late_responses()
+                response = self._expect_response(response_timeout)
+                written = await self.transport.write(raw_data)
+            
+            if not written:
+                self._discard_response_slot(response)
+                return None
+            
             logger.debug(f"Sent packet: {packet}")
-            return True
+            return response
         except Exception as e:
             logger.error(f"Error writing packet: {e}")
-            return False
+            return None
+    
+    async def write_packet(self, packet: ESP3Packet) -> bool:
+        """
+        Write ESP3 packet to serial port
+        
+        Args:
+            packet: ESP3Packet to send
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        return await self._write_packet(packet, self.RESPONSE_TIMEOUT) is not None
     
     async def send_command_and_wait_response(self, command_packet: ESP3Packet, timeout: float = 2.0) -> Optional[ESP3Packet]:
         """
         Send command and wait for response
         
+        The response is routed by the packet dispatcher, so this can be called
+        while start_reading is running without stealing radio telegrams.
+        
         Args:
             command_packet: Command packet to send
             timeout: Timeout in seconds
@@ -180,19 +282,15 @@ class SerialHandler:
         Returns:
             Response packet if received, None otherwise
         """
-        if not await self.write_packet(command_packet):
+        response = await self._write_packet(command_packet, timeout)
+        if response is None:
             return None
         
-        # Wait for response
-        start_time = asyncio.get_event_loop().time()
-        while asyncio.get_event_loop().time() - start_time < timeout:
-            packet = await self.read_packet()
-            if packet and packet.packet_type == ESP3Packet.PACKET_TYPE_RESPONSE:
-                return packet
-            await asyncio.sleep(0.01)
-        
-        logger.warning("Timeout waiting for response")
-        return None
+        try:
+            return await asyncio.wait_for(response, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timeout waiting for response")
+            return None
     
     async def get_base_id(self) -> Optional[str]:
         """
@@ -272,23 +370,16 @@ class SerialHandler:
         logger.info("   Trigger your EnOcean devices now to see telegrams here")
         logger.info("=" * 80)
         
-        packet_count = 0
         while self.running:
             try:
                 packet = await self.read_packet()
+                self._report_stats_if_due()
                 if packet:
-                    packet_count += 1
-                    logger.info(f"📦 RAW PACKET #{packet_count} RECEIVED")
-                    logger.info(f"   Type: {hex(packet.packet_type)}")
-                    logger.info(f"   Data length: {len(packet.data)}")
-                    logger.info(f"   Raw data: {packet.data.hex()}")
-                    
-                    # Only process radio telegrams, not responses
+                    # Only process radio telegrams, not events
                     if packet.packet_type == ESP3Packet.PACKET_TYPE_RADIO_ERP1:
-                        logger.info(f"   ✅ This is a RADIO TELEGRAM - processing...")
                         await callback(packet)
-                    else:
-                        logger.info(f"   ⏭️  Not a radio telegram - skipping")
+                    elif logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Skipping non-radio packet type {hex(packet.packet_type)}: {packet.data.hex()}")
             except Exception as e:
                 logger.error(f"Error in read loop: {e}")
                 await asyncio.sleep(1)
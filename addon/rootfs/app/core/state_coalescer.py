@@ -0,0 +1,145 @@
+"""
+State Coalescer
+Merges bursts of state updates per device into one MQTT publish
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PendingState:
+    """Merged state of a device waiting for its flush"""
+
+    __slots__ = ('state', 'updates', 'handle')
+
+    def __init__(self):
+        self.state: Dict[str, Any] = {}
+        self.updates = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class StateCoalescer:
+    """
+    Per-device publish coalescing
+
+    The first update of a device schedules a flush after the delay; updates
+    arriving until then are merged into the pending state (later values win),
+    so a burst of telegrams costs one publish. A device is never published
+    more often than the minimum interval - updates inside the interval wait
+    for its end.
+    """
+
+    def __init__(self, publish: Callable[[str, Dict[str, Any]], Any], delay: float = 0.1, min_interval: float = 0.0):
+        """
+        Initialize coalescer
+
+        Args:
+            publish: Function called with (device_id, state) to publish a merged state
+            delay: Seconds to wait for further updates after the first one
+            min_interval: Minimum seconds between two publishes of the same device
+        """
+        self.publish = publish
+        self.delay = delay
+        self.min_interval = min_interval
+        self._pending: Dict[str, PendingState] = {}
+        self._last_publish: Dict[str, float] = {}
+
+        # Statistics
+        self.submitted = 0
+        self.published = 0
+        self.saved = 0
+
+    def submit(self, device_id: str, state: Dict[str, Any]):
+        """
+        Queue a state update (must be called from the event loop)
+
+        Args:
+            device_id: Device ID
+            state: State values to merge into the pending state
+        """
+        self.submitted += 1
+        pending = self._pending.get(device_id)
+        if pending is None:
+            pending = self._pending[device_id] = PendingState()
+        pending.state.update(state)
+        pending.updates += 1
+
+        if pending.handle is None:
+            now = time.monotonic()
+            due = max(now + self.delay, self._last_publish.get(device_id, float('-inf')) + self.min_interval)
+            pending.handle = asyncio.get_running_loop().call_later(due - now, self.flush, device_id)
+
+    def amend(self, device_id: str, state: Dict[str, Any]) -> bool:
+        """
+        Merge values into the pending state of a device without scheduling a publish
+
+        Args:
+            device_id: Device ID
+            state: State values to merge
+
+        Returns:
+            True if a state was pending and the values will be published with it
+        """
+        pending = self._pending.get(device_id)
+        if pending is None:
+            return False
+        pending.state.update(state)
+        return True
+
+    def flush(self, device_id: str):
+        """
+        Publish the pending state of a device now
+
+        Args:
+            device_id: Device ID
+        """
+        pending = self._pending.pop(device_id, None)
+        if pending is None:
+            return
+        if pending.handle is not None:
+            pending.handle.cancel()
+        self._last_publish[device_id] = time.monotonic()
+        self.published += 1
+        self.saved += pending.updates - 1
+        if pending.updates > 1:
+            logger.debug(f"Coalesced {pending.updates} state updates for {device_id}")
+        try:
+            self.publish(device_id, pending.state)
+        except Exception as e:
+            logger.error(f"Error publishing coalesced state for {device_id}: {e}")
+
+    def flush_all(self):
+        """Publish all pending states now (e.g. on shutdown)"""
+        for device_id in list(self._pending):
+            self.flush(device_id)
+
+    def discard(self, device_id: str):
+        """
+        Drop the pending state of a device (e.g. when it is deleted)
+
+        Args:
+            device_id: Device ID
+        """
+        pending = self._pending.pop(device_id, None)
+        if pending is not None and pending.handle is not None:
+            pending.handle.cancel()
+        self._last_publish.pop(device_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing statistics
+
+        Returns:
+            Dictionary with submitted/published counters and publishes saved
+        """
+        return {
+            'delay_ms': int(self.delay * 1000),
+            'min_interval_ms': int(self.min_interval * 1000),
+            'submitted': self.submitted,
+            'published': self.published,
+            'saved': self.saved,
+            'pending': len(self._pending)
+        }
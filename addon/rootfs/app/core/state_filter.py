@@ -0,0 +1,163 @@
+"""
+State Filter
+Skips state publishes that carry no change, with per-field deadbands for
+noisy numeric values and a heartbeat that republishes unchanged states
+"""
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Metadata added to every telegram's state, not compared
+IGNORED_KEYS = frozenset(('rssi', 'last_seen'))
+
+
+def parse_deadband(spec: Any) -> Tuple[float, float]:
+    """
+    Parse a deadband specification
+
+    Args:
+        spec: Absolute deadband as number (e.g. 0.2) or relative one as
+              percentage string (e.g. "2%")
+
+    Returns:
+        Tuple of (absolute, relative) deadband
+
+    Raises:
+        ValueError: If the specification is not a number or percentage
+    """
+    if isinstance(spec, str) and spec.strip().endswith('%'):
+        return (0.0, abs(float(spec.strip()[:-1])) / 100.0)
+    if isinstance(spec, bool):
+        raise ValueError(f"Invalid deadband: {spec!r}")
+    return (abs(float(spec)), 0.0)
+
+
+class PublishedState:
+    """State values last published for a device"""
+
+    __slots__ = ('values', 'timestamp')
+
+    def __init__(self, values: Dict[str, Any], timestamp: float):
+        self.values = values
+        self.timestamp = timestamp
+
+
+class StateFilter:
+    """
+    Change-only publishing
+
+    A state is published when a value differs from the last published one
+    by at least its deadband (numbers without deadband and all other values
+    must be equal to be skipped), when fields appear or disappear, or when
+    the heartbeat interval has passed since the last publish. Deadbands are
+    compared against the last published value, so slow drifts are published
+    once they add up.
+    """
+
+    def __init__(self, heartbeat: float = 0.0):
+        """
+        Initialize filter
+
+        Args:
+            heartbeat: Seconds after which an unchanged state is published anyway (0 = never)
+        """
+        self.heartbeat = heartbeat
+        self._published: Dict[str, PublishedState] = {}
+        self._deadbands: Dict[Any, Optional[Tuple[float, float]]] = {}
+
+        # Statistics
+        self.published = 0
+        self.skipped = 0
+        self.heartbeats = 0
+
+    def _deadband(self, spec: Any) -> Optional[Tuple[float, float]]:
+        """Parsed deadband of a specification (invalid ones are logged once and ignored)"""
+        try:
+            return self._deadbands[spec]
+        except KeyError:
+            pass
+        except TypeError:  # Unhashable specification
+            return None
+        try:
+            deadband = parse_deadband(spec)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid deadband {spec!r}")
+            deadband = None
+        self._deadbands[spec] = deadband
+        return deadband
+
+    def _changed(self, last: Dict[str, Any], values: Dict[str, Any], deadbands: Dict[str, Any]) -> bool:
+        """Check if values differ from the last published ones beyond their deadbands"""
+        if last.keys() != values.keys():
+            return True
+        for key, value in values.items():
+            previous = last[key]
+            if value == previous:
+                continue
+            spec = deadbands.get(key)
+            if (spec is None or isinstance(value, bool) or isinstance(previous, bool)
+                    or not isinstance(value, (int, float)) or not isinstance(previous, (int, float))):
+                return True
+            deadband = self._deadband(spec)
+            if deadband is None:
+                return True
+            absolute, relative = deadband
+            if abs(value - previous) >= max(absolute, relative * abs(previous)):
+                return True
+        return False
+
+    def should_publish(self, device_id: str, state: Dict[str, Any], deadbands: Optional[Dict[str, Any]] = None,
+                       now: Optional[float] = None) -> bool:
+        """
+        Decide whether to publish a state and remember it if so
+
+        Args:
+            device_id: Device ID
+            state: State to publish
+            deadbands: Deadband specification per field (see parse_deadband)
+            now: Monotonic timestamp (default: time.monotonic())
+
+        Returns:
+            True if the state should be published, False if it can be skipped
+        """
+        if now is None:
+            now = time.monotonic()
+        values = {key: value for key, value in state.items() if key not in IGNORED_KEYS}
+        last = self._published.get(device_id)
+
+        if last is not None and not self._changed(last.values, values, deadbands or {}):
+            if not self.heartbeat or now - last.timestamp < self.heartbeat:
+                self.skipped += 1
+                return False
+            self.heartbeats += 1
+
+        self._published[device_id] = PublishedState(values, now)
+        self.published += 1
+        return True
+
+    def forget(self, device_id: str):
+        """
+        Forget the last published state of a device (next state is always published)
+
+        Args:
+            device_id: Device ID
+        """
+        self._published.pop(device_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get filter statistics
+
+        Returns:
+            Dictionary with published/skipped counters
+        """
+        total = self.published + self.skipped
+        return {
+            'heartbeat_s': int(self.heartbeat),
+            'published': self.published,
+            'skipped': self.skipped,
+            'skipped_ratio': round(self.skipped / total, 3) if total else 0.0,
+            'heartbeats': self.heartbeats
+        }
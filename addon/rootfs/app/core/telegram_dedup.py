@@ -0,0 +1,151 @@
+"""
+Telegram Deduplication
+Suppresses repeated sub-telegrams and repeater copies of the same radio telegram
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Hashable
+from .esp3_protocol import ESP3Packet
+
+logger = logging.getLogger(__name__)
+
+
+class DedupEntry:
+    """First copy of a telegram seen inside the dedup window"""
+
+    __slots__ = ('first_seen', 'best_rssi', 'best_gateway', 'duplicates', 'record')
+
+    def __init__(self, first_seen: float, rssi: Optional[int], gateway: Optional[Hashable], record: Any = None):
+        self.first_seen = first_seen
+        self.best_rssi = rssi
+        self.best_gateway = gateway
+        self.duplicates = 0
+        self.record = record
+
+
+class TelegramDeduplicator:
+    """Time-windowed duplicate suppression backed by a bounded LRU"""
+
+    def __init__(self, window: float = 0.1, max_entries: int = 1024):
+        """
+        Initialize deduplicator
+
+        Args:
+            window: Seconds after the first copy during which identical telegrams are duplicates
+            max_entries: Maximum number of tracked telegrams
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, DedupEntry]" = OrderedDict()
+
+        # Statistics
+        self.forwarded = 0
+        self.suppressed = 0
+
+    @staticmethod
+    def make_key(packet: ESP3Packet) -> memoryview:
+        """
+        Build dedup key from RORG, payload and sender ID
+
+        The status byte is excluded because repeaters increment its repeater count.
+        The key is a view into the (immutable) packet data, which hashes and
+        compares like the bytes it covers.
+        """
+        return memoryview(packet.data)[:-1]
+
+    def check(self, packet: ESP3Packet, now: Optional[float] = None, gateway: Optional[Hashable] = None,
+              record: Any = None) -> bool:
+        """
+        Register a received telegram
+
+        Copies received by different gateways share one entry, so the same
+        telegram heard by several sticks is processed once.
+
+        Args:
+            packet: Received ERP1 packet
+            now: Monotonic timestamp (default: time.monotonic())
+            gateway: Identifier of the receiving gateway (optional)
+            record: Trace record of the telegram, its rssi and gateway are
+                    updated when a stronger copy arrives (optional)
+
+        Returns:
+            True if the telegram is new and should be processed, False if it is a duplicate
+        """
+        if now is None:
+            now = time.monotonic()
+
+        entries = self._entries
+        key = self.make_key(packet)
+        entry = entries.get(key)
+
+        if entry is not None and now - entry.first_seen <= self.window:
+            entry.duplicates += 1
+            rssi = packet.rssi
+            if rssi is not None and (entry.best_rssi is None or rssi > entry.best_rssi):
+                entry.best_rssi = rssi
+                entry.best_gateway = gateway
+                if entry.record is not None:
+                    entry.record.rssi = rssi
+                    entry.record.gateway = gateway
+            self.suppressed += 1
+            return False
+
+        # New telegram (or same payload sent again after the window)
+        entries[key] = DedupEntry(now, packet.rssi, gateway, record)
+        entries.move_to_end(key)
+        self.forwarded += 1
+
+        # Entries are ordered by first_seen, so expired ones sit at the front
+        horizon = now - self.window
+        while entries:
+            oldest_key, oldest = next(iter(entries.items()))
+            if oldest.first_seen >= horizon and len(entries) <= self.max_entries:
+                break
+            del entries[oldest_key]
+
+        return True
+
+    def best_rssi(self, packet: ESP3Packet) -> Optional[int]:
+        """
+        Get the strongest RSSI seen for this telegram inside the current window
+
+        Args:
+            packet: Any copy of the telegram
+
+        Returns:
+            Best RSSI in dBm, or the packet's own RSSI if the telegram is not tracked
+        """
+        entry = self._entries.get(self.make_key(packet))
+        if entry is None:
+            return packet.rssi
+        return entry.best_rssi
+
+    def best_gateway(self, packet: ESP3Packet) -> Optional[Hashable]:
+        """
+        Get the gateway that received the strongest copy of this telegram
+
+        Args:
+            packet: Any copy of the telegram
+
+        Returns:
+            Gateway identifier passed to check(), or None if the telegram is not tracked
+        """
+        entry = self._entries.get(self.make_key(packet))
+        return entry.best_gateway if entry is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get dedup statistics
+
+        Returns:
+            Dictionary with forwarded/suppressed counters
+        """
+        total = self.forwarded + self.suppressed
+        return {
+            'window_ms': int(self.window * 1000),
+            'forwarded': self.forwarded,
+            'suppressed': self.suppressed,
+            'suppressed_ratio': round(self.suppressed / total, 3) if total else 0.0,
+            'tracked': len(self._entries)
+        }
@@ -0,0 +1,144 @@
+"""
+Telegram Trace
+Fixed-size in-memory ring buffer of per-telegram records with summary counters
+"""
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TraceRecord:
+    """One received telegram and what the pipeline did with it"""
+
+    __slots__ = ('timestamp', 'sender_id', 'rorg', 'rssi', 'gateway', 'raw',
+                 'outcome', 'eep', 'decoded', 'decode_ms', 'total_ms')
+
+    def __init__(self, timestamp: float, sender_id: Optional[str], rorg: Optional[int],
+                 rssi: Optional[int], gateway: Optional[str], raw: bytes):
+        self.timestamp = timestamp
+        self.sender_id = sender_id
+        self.rorg = rorg
+        self.rssi = rssi
+        self.gateway = gateway
+        self.raw = raw
+        self.outcome = 'received'
+        self.eep = None
+        self.decoded = None
+        self.decode_ms = None
+        self.total_ms = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to JSON-serializable dictionary (hex formatting happens only here)"""
+        return {
+            'timestamp': self.timestamp,
+            'sender_id': self.sender_id,
+            'rorg': f"{self.rorg:02X}" if self.rorg is not None else None,
+            'rssi': self.rssi,
+            'gateway': self.gateway,
+            'raw': self.raw.hex(),
+            'outcome': self.outcome,
+            'eep': self.eep,
+            'decoded': dict(self.decoded) if self.decoded is not None else None,
+            'decode_ms': self.decode_ms,
+            'total_ms': self.total_ms
+        }
+
+
+class TelegramTrace:
+    """Ring buffer of the most recent telegrams plus per-outcome counters"""
+
+    SUMMARY_INTERVAL = 60.0  # Seconds between summary log lines
+
+    def __init__(self, size: int = 500):
+        """
+        Initialize trace
+
+        Args:
+            size: Number of records kept (oldest are overwritten)
+        """
+        self._records: "deque[TraceRecord]" = deque(maxlen=size)
+        self.counters: Dict[str, int] = {}
+        self.received = 0
+        self._last_summary_at = time.monotonic()
+        self._last_summary_received = 0
+
+    def start(self, packet, gateway: Optional[str] = None) -> TraceRecord:
+        """
+        Create the record for a received telegram and append it to the buffer
+
+        Args:
+            packet: Received ESP3Packet
+            gateway: Port of the receiving gateway
+
+        Returns:
+            Record to be completed by finish()
+        """
+        record = TraceRecord(time.time(), packet.sender_id, packet.rorg, packet.rssi, gateway, packet.data)
+        self._records.append(record)
+        self.received += 1
+        return record
+
+    def finish(self, record: TraceRecord, started: float):
+        """
+        Complete a record once the telegram has been handled
+
+        The pipeline fills in outcome, eep, decoded and decode_ms on the record
+        while processing; this stamps the total time and counts the outcome.
+
+        Args:
+            record: Record returned by start()
+            started: time.perf_counter() value taken when the telegram entered the pipeline
+        """
+        record.total_ms = round((time.perf_counter() - started) * 1000, 3)
+        outcome = record.outcome
+        self.counters[outcome] = self.counters.get(outcome, 0) + 1
+
+    def get_records(self, limit: int = 100, sender_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get most recent records, newest first
+
+        Args:
+            limit: Maximum number of records
+            sender_id: Only return records of this sender (optional)
+
+        Returns:
+            List of record dictionaries
+        """
+        result = []
+        for record in reversed(self._records):
+            if sender_id and record.sender_id != sender_id:
+                continue
+            result.append(record.to_dict())
+            if len(result) >= limit:
+                break
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get trace counters
+
+        Returns:
+            Dictionary with total and per-outcome counts
+        """
+        return {
+            'received': self.received,
+            'buffered': len(self._records),
+            'capacity': self._records.maxlen,
+            'outcomes': dict(self.counters)
+        }
+
+    def log_summary_if_due(self):
+        """Log one summary line per SUMMARY_INTERVAL instead of per-telegram lines"""
+        now = time.monotonic()
+        interval = now - self._last_summary_at
+        if interval < self.SUMMARY_INTERVAL:
+            return
+        count = self.received - self._last_summary_received
+        self._last_summary_at = now
+        self._last_summary_received = self.received
+        if count:
+            outcomes = ', '.join(f"{name}: {value}" for name, value in sorted(self.counters.items()))
+            logger.info(f"📊 {count} telegrams in {interval:.0f}s ({count / interval:.2f}/s) - totals {outcomes}")
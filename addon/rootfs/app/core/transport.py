@@ -0,0 +1,450 @@
+"""
+Gateway Transports
+Byte transports between SerialHandler and an ESP3 gateway: local serial port or TCP (ser2net/esp-link)
+"""
+import asyncio
+import logging
+import queue
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Optional, Callable, List, Tuple
+from urllib.parse import urlparse
+import serial
+from .esp3_protocol import ESP3Packet
+from .esp3_framer import ESP3Framer
+
+logger = logging.getLogger(__name__)
+
+# Called on the event loop with every batch of framed packets
+PacketCallback = Callable[[List[ESP3Packet]], None]
+
+
+class Transport(ABC):
+    """Base class for gateway transports"""
+
+    # Transport keeps connecting in the background once started, even if open() failed
+    RECONNECTS = False
+
+    def __init__(self, port: str):
+        """
+        Initialize transport
+
+        Args:
+            port: Port path or URL as configured
+        """
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._framer: Optional[ESP3Framer] = None
+        self._on_packets: Optional[PacketCallback] = None
+        # Called on the event loop after every successful (re)connect
+        self.on_connected: Optional[Callable[[], None]] = None
+
+    @abstractmethod
+    async def open(self) -> bool:
+        """Open the connection, returns True on success"""
+
+    @abstractmethod
+    def close(self):
+        """Close the connection and stop receiving"""
+
+    @abstractmethod
+    def is_open(self) -> bool:
+        """Check if the connection is usable"""
+
+    @abstractmethod
+    def start(self, framer: ESP3Framer, on_packets: PacketCallback):
+        """
+        Start receiving - must be called from the event loop
+
+        Args:
+            framer: Framer fed with all received bytes
+            on_packets: Called on the event loop with each batch of complete packets
+        """
+
+    @abstractmethod
+    def is_started(self) -> bool:
+        """Check if receiving has been started"""
+
+    @abstractmethod
+    async def write(self, data: bytes) -> bool:
+        """Write raw bytes, returns True on success"""
+
+    def get_stats(self) -> dict:
+        """Transport specific statistics"""
+        return {}
+
+
+class SerialTransport(Transport):
+    """Local serial port served by a dedicated reader thread (and optional writer thread)"""
+
+    READ_TIMEOUT = 1.0  # Serial port read timeout in seconds
+    WRITE_QUEUE_SIZE = 64  # Maximum queued outgoing packets for the writer thread
+
+    def __init__(self, port: str, baudrate: int = 57600, writer_thread: bool = False):
+        """
+        Initialize serial transport
+
+        Args:
+            port: Serial port path (e.g., /dev/ttyUSB0)
+            baudrate: Baud rate
+            writer_thread: Send packets through a dedicated writer thread
+                           instead of the default asyncio executor
+        """
+        super().__init__(port)
+        self.baudrate = baudrate
+        self.use_writer_thread = writer_thread
+        self.serial = None
+
+        # Reader thread owns all reads from the pyserial handle and hands
+        # complete packets to the event loop in batches
+        self._reader_thread: Optional[threading.Thread] = None
+        self._writer_thread: Optional[threading.Thread] = None
+        self._write_queue: Optional[queue.Queue] = None
+        self._threads_stop = threading.Event()
+
+    async def open(self) -> bool:
+        """Open serial port connection"""
+        try:
+            self.serial = serial.Serial(
+                port=self.port,
+                baudrate=self.baudrate,
+                bytesize=serial.EIGHTBITS,
+                parity=serial.PARITY_NONE,
+                stopbits=serial.STOPBITS_ONE,
+                timeout=self.READ_TIMEOUT
+            )
+            logger.info(f"Opened serial port {self.port} at {self.baudrate} baud")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to open serial port {self.port}: {e}")
+            return False
+
+    def close(self):
+        """Stop threads and close serial port"""
+        self._stop_threads()
+        if self.serial and self.serial.is_open:
+            self.serial.close()
+            logger.info(f"Closed serial port {self.port}")
+
+    def is_open(self) -> bool:
+        """Check if serial port is open"""
+        return self.serial is not None and self.serial.is_open
+
+    def is_started(self) -> bool:
+        """Check if the reader thread is running"""
+        return self._reader_thread is not None and self._reader_thread.is_alive()
+
+    def start(self, framer: ESP3Framer, on_packets: PacketCallback):
+        """Start reader (and optional writer) thread bound to the running event loop"""
+        if self.is_started():
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._framer = framer
+        self._on_packets = on_packets
+        self._threads_stop.clear()
+
+        self._reader_thread = threading.Thread(
+            target=self._reader_loop,
+            name=f"enocean-reader-{self.port}",
+            daemon=True
+        )
+        self._reader_thread.start()
+        logger.info(f"Started serial reader thread for {self.port}")
+
+        if self.use_writer_thread:
+            self._write_queue = queue.Queue(maxsize=self.WRITE_QUEUE_SIZE)
+            self._writer_thread = threading.Thread(
+                target=self._writer_loop,
+                name=f"enocean-writer-{self.port}",
+                daemon=True
+            )
+            self._writer_thread.start()
+            logger.info(f"Started serial writer thread for {self.port}")
+
+    def _stop_threads(self):
+        """Signal reader/writer threads to exit and wait for them"""
+        self._threads_stop.set()
+        if self._write_queue is not None:
+            try:
+                self._write_queue.put_nowait(None)  # Wake up writer
+            except queue.Full:
+                pass
+        for thread in (self._reader_thread, self._writer_thread):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=self.READ_TIMEOUT * 2)
+        self._reader_thread = None
+        self._writer_thread = None
+        self._write_queue = None
+
+    def _read_available(self) -> bytes:
+        """
+        Blocking read of everything currently waiting on the port
+
+        Blocks for up to the port timeout until at least one byte arrives,
+        then drains whatever else is already buffered by the driver.
+        """
+        data = self.serial.read(1)
+        if data:
+            waiting = self.serial.in_waiting
+            if waiting:
+                data += self.serial.read(waiting)
+        return data
+
+    def _reader_loop(self):
+        """Reader thread: block on serial reads and hand packet batches to the event loop"""
+        while not self._threads_stop.is_set():
+            try:
+                chunk = self._read_available()
+                if not chunk:
+                    continue
+
+                packets = self._framer.feed(chunk)
+                if packets:
+                    # One loop wake-up per burst, not per packet
+                    self._loop.call_soon_threadsafe(self._on_packets, packets)
+
+            except RuntimeError:
+                # Event loop closed - nothing left to deliver to
+                break
+            except Exception as e:
+                if self._threads_stop.is_set():
+                    break
+                logger.error(f"Error in serial reader thread: {e}")
+                time.sleep(1)
+
+        logger.debug(f"Serial reader thread for {self.port} exited")
+
+    def _writer_loop(self):
+        """Writer thread: drain the bounded write queue onto the serial port"""
+        while not self._threads_stop.is_set():
+            item = self._write_queue.get()
+            if item is None:
+                break
+
+            raw_data, future = item
+            try:
+                self.serial.write(raw_data)
+                result = True
+            except Exception as e:
+                logger.error(f"Error in serial writer thread: {e}")
+                result = False
+
+            try:
+                self._loop.call_soon_threadsafe(self._resolve_write, future, result)
+            except RuntimeError:
+                break
+
+        logger.debug(f"Serial writer thread for {self.port} exited")
+
+    @staticmethod
+    def _resolve_write(future: asyncio.Future, result: bool):
+        """Event loop side of the writer handoff"""
+        if not future.done():
+            future.set_result(result)
+
+    async def write(self, data: bytes) -> bool:
+        """Write raw bytes through the writer thread or the default executor"""
+        if self.use_writer_thread and self._write_queue is not None:
+            done = self._loop.create_future()
+            try:
+                self._write_queue.put_nowait((data, done))
+            except queue.Full:
+                logger.error(f"Write queue full ({self.WRITE_QUEUE_SIZE} packets), dropping packet")
+                return False
+            return await done
+
+        await asyncio.get_running_loop().run_in_executor(None, self.serial.write, data)
+        return True
+
+    def get_stats(self) -> dict:
+        """Serial transport statistics"""
+        return {'queued_writes': self._write_queue.qsize() if self._write_queue else 0}
+
+
+class TcpTransport(Transport):
+    """Remote gateway over TCP (ser2net, esp-link) using asyncio streams with reconnect"""
+
+    RECONNECTS = True
+
+    CONNECT_TIMEOUT = 5.0  # Seconds per connection attempt
+    RECONNECT_MIN_DELAY = 1.0  # First reconnect backoff in seconds
+    RECONNECT_MAX_DELAY = 60.0  # Backoff ceiling in seconds
+    KEEPALIVE_IDLE = 30  # Seconds of silence before TCP keepalive probes start
+    KEEPALIVE_INTERVAL = 10  # Seconds between keepalive probes
+    KEEPALIVE_COUNT = 3  # Failed probes before the connection is considered dead
+    READ_SIZE = 4096
+
+    def __init__(self, port: str):
+        """
+        Initialize TCP transport
+
+        Args:
+            port: URL like socket://192.168.1.50:3333 or tcp://host:port
+        """
+        super().__init__(port)
+        self.host, self.tcp_port = self.parse_url(port)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._connected_once = False
+        self.reconnects = 0
+
+    @staticmethod
+    def parse_url(url: str) -> Tuple[str, int]:
+        """
+        Parse socket://host:port into host and port
+
+        Raises:
+            ValueError: If host or port is missing
+        """
+        parsed = urlparse(url)
+        if not parsed.hostname or not parsed.port:
+            raise ValueError(f"Invalid network gateway URL: {url} (expected socket://host:port)")
+        return parsed.hostname, parsed.port
+
+    async def _connect(self) -> bool:
+        """Single connection attempt"""
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.tcp_port),
+                timeout=self.CONNECT_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Could not connect to gateway {self.host}:{self.tcp_port}: {e}")
+            self._reader = self._writer = None
+            return False
+
+        self._enable_keepalive(self._writer.get_extra_info('socket'))
+        if self._framer:
+            self._framer.reset()
+        logger.info(f"Connected to network gateway {self.host}:{self.tcp_port}")
+        return True
+
+    def _enable_keepalive(self, sock: Optional[socket.socket]):
+        """Enable TCP keepalive so a silently dropped link is detected"""
+        if sock is None:
+            return
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Fine-grained options are platform specific
+        for option, value in (('TCP_KEEPIDLE', self.KEEPALIVE_IDLE),
+                              ('TCP_KEEPINTVL', self.KEEPALIVE_INTERVAL),
+                              ('TCP_KEEPCNT', self.KEEPALIVE_COUNT)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    async def open(self) -> bool:
+        """Connect to the network gateway (start() keeps trying if this attempt fails)"""
+        self._closing = False
+        if not await self._connect():
+            return False
+        self._connected_once = True
+        return True
+
+    def close(self):
+        """Stop reconnecting and close the connection"""
+        self._closing = True
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+            logger.info(f"Closed network gateway {self.host}:{self.tcp_port}")
+
+    def is_open(self) -> bool:
+        """Check if the TCP connection is up"""
+        return self._writer is not None and not self._writer.is_closing()
+
+    def is_started(self) -> bool:
+        """Check if the receive task is running"""
+        return self._task is not None and not self._task.done()
+
+    def start(self, framer: ESP3Framer, on_packets: PacketCallback):
+        """Start the receive task (reconnects with exponential backoff on failure)"""
+        if self.is_started():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._framer = framer
+        self._on_packets = on_packets
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Receive loop: read chunks, frame them, (re)connect with backoff while the link is down"""
+        delay = self.RECONNECT_MIN_DELAY
+        if self.is_open() and self.on_connected:
+            self.on_connected()
+        while not self._closing:
+            if not self.is_open():
+                if not await self._connect():
+                    logger.info(f"Reconnecting to {self.host}:{self.tcp_port} in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+                    continue
+                if self._connected_once:
+                    self.reconnects += 1
+                self._connected_once = True
+                delay = self.RECONNECT_MIN_DELAY
+                if self.on_connected:
+                    self.on_connected()
+
+            try:
+                chunk = await self._reader.read(self.READ_SIZE)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                logger.warning(f"Network gateway {self.host}:{self.tcp_port} read error: {e}")
+                chunk = b''
+
+            if not chunk:
+                # EOF or error - drop connection and reconnect
+                if not self._closing:
+                    logger.warning(f"Lost connection to network gateway {self.host}:{self.tcp_port}")
+                if self._writer:
+                    self._writer.close()
+                    self._writer = None
+                continue
+
+            # Data arrives on the event loop already, so packets are delivered directly
+            try:
+                packets = self._framer.feed(chunk)
+                if packets:
+                    self._on_packets(packets)
+            except Exception:
+                # Keep receiving - one bad batch must not end the task
+                logger.exception(f"Error handling data from network gateway {self.host}:{self.tcp_port}")
+
+    async def write(self, data: bytes) -> bool:
+        """Write raw bytes to the TCP connection"""
+        if not self.is_open():
+            return False
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+            return True
+        except OSError as e:
+            logger.error(f"Error writing to network gateway {self.host}:{self.tcp_port}: {e}")
+            return False
+
+    def get_stats(self) -> dict:
+        """TCP transport statistics"""
+        return {'connected': self.is_open(), 'reconnects': self.reconnects}
+
+
+def create_transport(port: str, baudrate: int = 57600, writer_thread: bool = False) -> Transport:
+    """
+    Create the transport matching a configured port
+
+    Args:
+        port: Serial device path, or socket://host:port / tcp://host:port for network gateways
+        baudrate: Serial baud rate (ignored for network gateways)
+        writer_thread: Use a dedicated serial writer thread (ignored for network gateways)
+
+    Returns:
+        Transport instance (not yet opened)
+    """
+    if port.startswith(('socket://', 'tcp://')):
+        return TcpTransport(port)
+    return SerialTransport(port, baudrate, writer_thread)
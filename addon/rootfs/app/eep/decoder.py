@@ -0,0 +1,385 @@
+"""
+EEP Decoder
+Compiles EEP profile cases into integer shift/mask extraction plans and a
+decision table that selects the matching receive cases of a telegram
+"""
+import logging
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Tuple
+from .formula import compile_formula, specialize, CompiledFormula, FormulaError
+
+logger = logging.getLogger(__name__)
+
+STATUS_BITS = 8  # Status byte conditions ("statusfield") count bit offsets from its MSB
+
+
+def _locate(total_bits: int, bitoffs: int, bitsize: int) -> Tuple[int, int]:
+    """
+    Resolve shift and mask of a bit range (bit offset 0 = MSB of first byte)
+
+    Ranges reaching past the end keep only the bits that exist,
+    ranges starting past the end always extract 0.
+    """
+    size = max(0, min(bitsize, total_bits - bitoffs))
+    shift = total_bits - bitoffs - size if size else 0
+    return shift, (1 << size) - 1
+
+
+class CompiledField:
+    """One datafield with bit position and transform resolved at load time"""
+
+    __slots__ = ('shortcut', 'bitoffs', 'bitsize', 'invert', 'transform', 'decimals', 'second', 'condition')
+
+    def __init__(self, shortcut: str, bitoffs: int, bitsize: int, invert: bool,
+                 transform: Optional[CompiledFormula], decimals: Optional[int],
+                 second: Optional[Tuple[int, int]] = None, condition: Optional[CompiledFormula] = None):
+        self.shortcut = shortcut
+        self.bitoffs = bitoffs
+        self.bitsize = bitsize
+        self.invert = invert
+        self.transform = transform
+        self.decimals = decimals
+        self.second = second  # (bitoffs, bitsize) of the "value2" argument
+        self.condition = condition  # Field is only decoded if this formula is true
+
+
+class CaseDecoder:
+    """Decoder for the datafields of one EEP case"""
+
+    def __init__(self, datafields: List[dict], eep: str = ''):
+        """
+        Compile datafields
+
+        Args:
+            datafields: Datafield definitions of the case
+            eep: EEP code (for log messages)
+        """
+        self.eep = eep
+        self.fields: List[CompiledField] = []
+        # (shortcut, error) for formulas that could not be compiled - these fields decode to the raw value
+        self.formula_errors: List[Tuple[str, str]] = []
+        # Payload length in bytes -> [(shortcut, shift, mask, invert, transform, decimals, second, condition)]
+        self._plans: Dict[int, List[Tuple]] = {}
+
+        for datafield in datafields:
+            shortcut = datafield.get('shortcut')
+            bitoffs = datafield.get('bitoffs')
+            bitsize = datafield.get('bitsize')
+
+            if shortcut is None or bitoffs is None or bitsize is None:
+                continue
+
+            try:
+                bitoffs = int(bitoffs)
+                bitsize = int(bitsize)
+            except (ValueError, TypeError):
+                logger.error(f"Invalid bitoffs/bitsize for {shortcut} in {eep}: bitoffs={bitoffs}, bitsize={bitsize}")
+                continue
+
+            transform = None
+            if 'value' in datafield:
+                try:
+                    transform = compile_formula(datafield['value'])
+                    if transform is not None and not datafield.get('invert'):
+                        transform = specialize(transform, bitsize, datafield.get('decimals'))
+                except FormulaError as e:
+                    self.formula_errors.append((shortcut, str(e)))
+
+            condition = None
+            if isinstance(datafield.get('condition'), dict):
+                try:
+                    condition = compile_formula(datafield['condition'])
+                except FormulaError as e:
+                    self.formula_errors.append((shortcut, f"condition: {e}"))
+
+            second = None
+            second_argument = datafield.get('secondArgument')
+            if isinstance(second_argument, dict):
+                try:
+                    second = (int(second_argument['bitoffs']), int(second_argument['bitsize']))
+                except (KeyError, ValueError, TypeError):
+                    logger.error(f"Invalid secondArgument for {shortcut} in {eep}: {second_argument}")
+
+            self.fields.append(CompiledField(shortcut, bitoffs, bitsize, bool(datafield.get('invert')),
+                                             transform, datafield.get('decimals'), second, condition))
+
+    def _build_plan(self, length: int) -> List[Tuple]:
+        """Resolve shift/mask for every field for a payload of the given length"""
+        total_bits = length * 8
+        plan = []
+        for field in self.fields:
+            shift, mask = _locate(total_bits, field.bitoffs, field.bitsize)
+            second = _locate(total_bits, *field.second) if field.second else None
+            transform = field.transform.func if field.transform is not None else None
+            condition = field.condition.func if field.condition is not None else None
+            plan.append((field.shortcut, shift, mask, field.invert, transform, field.decimals, second, condition))
+        self._plans[length] = plan
+        return plan
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Plans reference formula functions; they are rebuilt on first decode after unpickling
+        state = self.__dict__.copy()
+        state['_plans'] = {}
+        return state
+
+    def decode(self, payload: bytes, result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Decode payload
+
+        Args:
+            payload: Data bytes from telegram (without RORG, sender ID and status)
+            result: Dictionary to add the values to (optional)
+
+        Returns:
+            Dictionary with decoded values
+        """
+        plan = self._plans.get(len(payload))
+        if plan is None:
+            plan = self._build_plan(len(payload))
+
+        bits = int.from_bytes(payload, 'big')
+        if result is None:
+            result = {}
+
+        try:
+            for shortcut, shift, mask, invert, transform, decimals, second, condition in plan:
+                value = (bits >> shift) & mask
+                value2 = (bits >> second[0]) & second[1] if second is not None else None
+
+                if condition is not None and not condition(value, value2):
+                    continue
+
+                if invert:
+                    value = 1 - value
+
+                if transform is not None:
+                    value = transform(value, value2)
+
+                if decimals is not None and isinstance(value, (int, float)):
+                    value = round(value, decimals)
+
+                result[shortcut] = value
+        except Exception as e:
+            logger.error(f"Error parsing telegram with profile {self.eep}: {e}")
+
+        return result
+
+
+def _parse_tests(condition: Any) -> Optional[List[Tuple[bool, int, int, Any]]]:
+    """
+    Normalize a case condition into bit tests
+
+    Supported forms: a single {bitoffs, bitsize, value} test, a list of tests,
+    or a dict of named groups of tests. The "statusfield" group tests the
+    status byte instead of the payload.
+
+    Returns:
+        List of (is_status, bitoffs, bitsize, expected) tests, or None if the
+        condition cannot be evaluated on a received telegram (e.g. command
+        selectors without bit position, which only apply to sending)
+    """
+    if isinstance(condition, dict) and 'bitoffs' in condition:
+        groups = [('', [condition])]
+    elif isinstance(condition, list):
+        groups = [('', condition)]
+    elif isinstance(condition, dict):
+        groups = [(name, tests if isinstance(tests, list) else [tests]) for name, tests in condition.items()]
+    else:
+        return None
+
+    result = []
+    for name, tests in groups:
+        for test in tests:
+            if not isinstance(test, dict) or 'bitoffs' not in test or 'bitsize' not in test:
+                return None
+            expected = test.get('value')
+            if isinstance(expected, str):
+                expected = int(expected, 0)
+            result.append((name == 'statusfield', int(test['bitoffs']), int(test['bitsize']), expected))
+    return result
+
+
+class _Matcher:
+    """Test of one discriminator value against a constant or a formula (picklable)"""
+
+    __slots__ = ('expected', 'formula')
+
+    def __init__(self, expected: Any, formula: Optional[CompiledFormula] = None):
+        self.expected = expected
+        self.formula = formula
+
+    def __call__(self, value: Any) -> bool:
+        if self.formula is None:
+            return value == self.expected
+        try:
+            return bool(self.formula.func(value))
+        except TypeError:
+            return False  # No status byte available
+
+
+class ProfileDecoder:
+    """
+    Decoder for all receive cases of a profile
+
+    Case conditions are reduced to a set of discriminating bit ranges. The
+    values of these ranges form the key of a decision table whose entries
+    (filled on first sight of a key) list the matching cases, so selecting
+    the cases of a telegram is a single dict lookup. All matching cases are
+    decoded in profile order; profiles like A5-09-04 combine an
+    unconditional case with conditional ones.
+
+    Sensors repeat identical payloads a lot, so decode_cached() keeps the
+    results of the most recent distinct payloads in a small LRU.
+    """
+
+    MAX_TABLE_SIZE = 4096  # Keys remembered per payload length
+    MEMO_SIZE = 32  # Distinct payloads remembered by decode_cached()
+
+    def __init__(self, cases: List[dict], eep: str = ''):
+        """
+        Compile cases
+
+        Args:
+            cases: Case definitions of the EEP profile
+            eep: EEP code (for log messages)
+        """
+        self.eep = eep
+        self.cases: List[CaseDecoder] = []
+        self.formula_errors: List[Tuple[str, str]] = []
+
+        # Discriminating bit ranges: (is_status, bitoffs, bitsize)
+        self.discriminators: List[Tuple[bool, int, int]] = []
+        # Per case: [(discriminator index, matcher)]
+        self._case_tests: List[List[Tuple[int, _Matcher]]] = []
+        # Payload length -> (discriminator locations, {key: matching cases})
+        self._tables: Dict[int, Tuple[List[Tuple[bool, int, int]], Dict[Tuple, Tuple[CaseDecoder, ...]]]] = {}
+        # (payload, status) -> read-only decoded result, most recently used last
+        self._memo: "OrderedDict[Tuple[bytes, Optional[int]], Mapping[str, Any]]" = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+        index = {}
+        for case in cases:
+            if case.get('send'):
+                continue
+
+            condition = case.get('condition')
+            tests = [] if condition is None else _parse_tests(condition)
+            if tests is None:
+                logger.debug(f"{eep}: skipping receive case with non-payload condition {condition}")
+                continue
+
+            case_tests = []
+            for is_status, bitoffs, bitsize, expected in tests:
+                key = (is_status, bitoffs, bitsize)
+                if key not in index:
+                    index[key] = len(self.discriminators)
+                    self.discriminators.append(key)
+                case_tests.append((index[key], self._matcher(expected)))
+
+            decoder = CaseDecoder(case.get('datafield', []), eep)
+            self.formula_errors.extend(decoder.formula_errors)
+            self.cases.append(decoder)
+            self._case_tests.append(case_tests)
+
+        # The status byte only needs to be part of the memo key if a case tests it
+        self._uses_status = any(is_status for is_status, _, _ in self.discriminators)
+
+    def _matcher(self, expected: Any) -> _Matcher:
+        """Build a test for one discriminator value (constant or formula)"""
+        if isinstance(expected, dict):
+            try:
+                return _Matcher(expected, compile_formula(expected))
+            except FormulaError as e:
+                self.formula_errors.append(('condition', str(e)))
+                return _Matcher(object())  # Never matches
+        return _Matcher(expected)
+
+    def _table(self, length: int):
+        """Get (or build) the discriminator locations and decision table for a payload length"""
+        table = self._tables.get(length)
+        if table is None:
+            total_bits = length * 8
+            locations = [
+                (is_status,) + _locate(STATUS_BITS if is_status else total_bits, bitoffs, bitsize)
+                for is_status, bitoffs, bitsize in self.discriminators
+            ]
+            table = self._tables[length] = (locations, {})
+        return table
+
+    def select(self, payload: bytes, status: Optional[int] = None) -> Tuple[CaseDecoder, ...]:
+        """
+        Select the receive cases matching a telegram
+
+        Args:
+            payload: Data bytes from telegram
+            status: Status byte of the telegram (needed for "statusfield" conditions)
+
+        Returns:
+            Matching cases in profile order
+        """
+        locations, table = self._table(len(payload))
+        bits = int.from_bytes(payload, 'big')
+        key = tuple(
+            ((status >> shift) & mask if status is not None else None) if is_status else (bits >> shift) & mask
+            for is_status, shift, mask in locations
+        )
+
+        cases = table.get(key)
+        if cases is None:
+            cases = tuple(
+                case for case, tests in zip(self.cases, self._case_tests)
+                if all(matcher(key[position]) for position, matcher in tests)
+            )
+            if len(table) < self.MAX_TABLE_SIZE:
+                table[key] = cases
+        return cases
+
+    def decode(self, payload: bytes, status: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Decode payload with all matching receive cases
+
+        Args:
+            payload: Data bytes from telegram (without RORG, sender ID and status)
+            status: Status byte of the telegram (optional)
+
+        Returns:
+            Dictionary with decoded values (empty if no case matches)
+        """
+        result = {}
+        for case in self.select(payload, status):
+            case.decode(payload, result)
+        return result
+
+    def decode_cached(self, payload: bytes, status: Optional[int] = None) -> Mapping[str, Any]:
+        """
+        Decode payload, reusing the result of an identical recent payload
+
+        Args:
+            payload: Data bytes from telegram (without RORG, sender ID and status)
+            status: Status byte of the telegram (optional)
+
+        Returns:
+            Read-only mapping with decoded values - copy it before adding keys
+        """
+        key = (bytes(payload), status if self._uses_status else None)
+        result = self._memo.get(key)
+        if result is not None:
+            self.memo_hits += 1
+            self._memo.move_to_end(key)
+            return result
+
+        self.memo_misses += 1
+        result = MappingProxyType(self.decode(payload, status))
+        self._memo[key] = result
+        if len(self._memo) > self.MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return result
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Memoized results are read-only proxies (not picklable) and only useful at runtime
+        state = self.__dict__.copy()
+        state['_memo'] = OrderedDict()
+        state['memo_hits'] = state['memo_misses'] = 0
+        return state
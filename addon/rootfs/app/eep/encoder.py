@@ -0,0 +1,205 @@
+"""
+EEP Encoder
+Compiles the "send" cases of EEP profiles into bit-packing encoders that
+build telegram payloads from field values
+"""
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from .formula import compile_formula, CompiledFormula, FormulaError
+
+logger = logging.getLogger(__name__)
+
+
+def _bool_raw(formula: Any) -> Optional[int]:
+    """Raw value meaning "true" for formulas of the form value == N, else None"""
+    if not isinstance(formula, dict) or list(formula) != ['==']:
+        return None
+    args = formula['==']
+    if not isinstance(args, list) or len(args) != 2:
+        return None
+    for variable, constant in (args, args[::-1]):
+        if variable == {'var': 'value'} and isinstance(constant, int) and not isinstance(constant, bool):
+            return constant
+    return None
+
+
+class FieldEncoder:
+    """
+    One datafield of a send case
+
+    Values are given in the units of the profile (what the decoder
+    publishes) and converted to raw bits with, in this order of preference:
+    the field's "value_out" formula, the inverse of a linear "value"
+    formula, or the raw value of a boolean "value == N" formula.
+    """
+
+    __slots__ = ('shortcut', 'shift', 'mask', 'out', 'linear', 'true_raw')
+
+    def __init__(self, shortcut: str, shift: int, mask: int, out: Optional[CompiledFormula] = None,
+                 linear: Optional[Tuple[float, float]] = None, true_raw: Optional[int] = None):
+        self.shortcut = shortcut
+        self.shift = shift
+        self.mask = mask
+        self.out = out
+        self.linear = linear
+        self.true_raw = true_raw
+
+    def to_raw(self, value: Any) -> int:
+        """Convert a value to the raw bits of the field (clamped to the field size)"""
+        if self.out is not None:
+            value = self.out(value)
+        elif self.true_raw is not None:
+            value = self.true_raw if value else int(not self.true_raw)
+        elif self.linear is not None:
+            scale, offset = self.linear
+            value = (value - offset) / scale
+        raw = int(round(value))
+        return min(max(raw, 0), self.mask)
+
+
+class CaseEncoder:
+    """Encoder for one send case: fixed bits are packed at load time, fields are OR-ed in per telegram"""
+
+    def __init__(self, case: dict, eep: str = ''):
+        """
+        Compile send case
+
+        Args:
+            case: Case definition with "send": true
+            eep: EEP code (for log messages)
+        """
+        self.eep = eep
+        self.fields: Dict[str, FieldEncoder] = {}
+        self.formula_errors: List[Tuple[str, str]] = []
+
+        datafields = [field for field in case.get('datafield', [])
+                      if field.get('bitoffs') is not None and field.get('bitsize') is not None]
+        tests = [test for test in (case.get('condition') or {}).get('command', [])
+                 if isinstance(test, dict) and 'bitoffs' in test and 'bitsize' in test]
+
+        end = max([int(f['bitoffs']) + int(f['bitsize']) for f in datafields + tests] or [0])
+        self.length = (end + 7) // 8
+        total_bits = self.length * 8
+
+        # Command identifier from the condition first - "fixed parameter" fields may override it
+        self.base = 0
+        for test in tests:
+            self.base = self._pack(self.base, total_bits, int(test['bitoffs']), int(test['bitsize']), test.get('value', 0))
+
+        for datafield in datafields:
+            bitoffs, bitsize = int(datafield['bitoffs']), int(datafield['bitsize'])
+            shortcut = datafield.get('shortcut')
+            out = datafield.get('value_out')
+            value = datafield.get('value')
+
+            # Constant values ("fixed parameter" fields, command numbers) are packed into the base payload
+            fixed = out if out is not None else value
+            if not isinstance(fixed, dict) and isinstance(fixed, (int, float)):
+                self.base = self._pack(self.base, total_bits, bitoffs, bitsize, fixed)
+            if shortcut is None:
+                continue
+
+            shift = total_bits - bitoffs - bitsize
+            try:
+                compiled_out = compile_formula(out)
+                compiled_value = compile_formula(value) if compiled_out is None else None
+            except FormulaError as e:
+                self.formula_errors.append((shortcut, str(e)))
+                compiled_out = compiled_value = None
+            self.fields[shortcut] = FieldEncoder(
+                shortcut, shift, (1 << bitsize) - 1, compiled_out,
+                compiled_value.linear if compiled_value is not None else None,
+                _bool_raw(value) if compiled_out is None else None
+            )
+
+    @staticmethod
+    def _pack(bits: int, total_bits: int, bitoffs: int, bitsize: int, value: Any) -> int:
+        """Set a bit range of an integer payload to a constant"""
+        shift = total_bits - bitoffs - bitsize
+        mask = (1 << bitsize) - 1
+        return (bits & ~(mask << shift)) | ((int(value) & mask) << shift)
+
+    def encode(self, values: Dict[str, Any]) -> bytes:
+        """
+        Build the payload
+
+        Args:
+            values: Field values by shortcut (fields not given keep their fixed value or 0)
+
+        Returns:
+            Payload bytes
+
+        Raises:
+            KeyError: If a shortcut is not a field of this case
+        """
+        bits = self.base
+        for shortcut, value in values.items():
+            field = self.fields[shortcut]
+            bits = (bits & ~(field.mask << field.shift)) | (field.to_raw(value) << field.shift)
+        return bits.to_bytes(self.length, 'big')
+
+
+class ProfileEncoder:
+    """Encoders for all send cases of a profile, selected by their command number"""
+
+    def __init__(self, cases: List[dict], eep: str = ''):
+        """
+        Compile send cases
+
+        Args:
+            cases: Case definitions of the EEP profile
+            eep: EEP code (for log messages)
+        """
+        self.eep = eep
+        self.commands: Dict[int, CaseEncoder] = {}
+        self.formula_errors: List[Tuple[str, str]] = []
+
+        for case in cases:
+            if not case.get('send'):
+                continue
+            condition = case.get('condition') or {}
+            tests = condition.get('command') if isinstance(condition, dict) else None
+            if not tests or not isinstance(tests[0], dict) or 'value' not in tests[0]:
+                logger.debug(f"{eep}: skipping send case without command number: {condition}")
+                continue
+            try:
+                encoder = CaseEncoder(case, eep)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid send case {condition} in {eep}: {e}")
+                continue
+            self.commands[int(tests[0]['value'])] = encoder
+            self.formula_errors.extend(encoder.formula_errors)
+
+    def supports(self, command: int, fields) -> bool:
+        """
+        Check if the profile has a send case for a command with all given fields
+
+        Args:
+            command: Command number of the send case
+            fields: Field shortcuts the command is built with
+
+        Returns:
+            True if encode() can build the payload
+        """
+        encoder = self.commands.get(command)
+        return encoder is not None and all(field in encoder.fields for field in fields)
+
+    def encode(self, command: int, values: Dict[str, Any]) -> Optional[bytes]:
+        """
+        Build the payload of a command
+
+        Args:
+            command: Command number of the send case
+            values: Field values by shortcut
+
+        Returns:
+            Payload bytes, or None if the profile has no such command or field
+        """
+        encoder = self.commands.get(command)
+        if encoder is None:
+            return None
+        try:
+            return encoder.encode(values)
+        except KeyError as e:
+            logger.error(f"{self.eep} command {command} has no field {e}")
+            return None
@@ -0,0 +1,439 @@
+"""
+EEP Formula Evaluation
+Evaluates and compiles the JSON-logic "value" expressions of EEP datafields
+
+Formulas see two variables: "value" (the extracted datafield bits) and
+"value2" (the bits of the datafield's "secondArgument", e.g. a divisor
+selector). Comparisons return 1/0 so binary fields publish as integers.
+An "if" without else branch returns the raw value when no condition
+matches, like formulas that cannot be evaluated.
+"""
+import json
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Variable name -> parameter name of the compiled function
+VARIABLES = {'value': 'v', 'value2': 'v2'}
+
+
+class FormulaError(ValueError):
+    """Formula uses an operator or variable that is not supported"""
+
+
+def _args(formula: dict) -> Tuple[str, List[Any]]:
+    """Split a JSON-logic node into operator and argument list"""
+    if len(formula) != 1:
+        raise FormulaError(f"Expected exactly one operator, got {sorted(formula)}")
+    op, args = next(iter(formula.items()))
+    if not isinstance(args, list):
+        args = [args]
+    return op, args
+
+
+def _var_name(args: List[Any]) -> str:
+    """Resolve a "var" node to a parameter name"""
+    name = args[0] if args else ''
+    if name not in VARIABLES:
+        raise FormulaError(f"Unknown variable '{name}'")
+    return VARIABLES[name]
+
+
+def _compare(op: str, values: List[Any]) -> int:
+    """Evaluate a (possibly chained "between") comparison"""
+    if op in ('<', '<=') and len(values) == 3:
+        if op == '<':
+            return 1 if values[0] < values[1] < values[2] else 0
+        return 1 if values[0] <= values[1] <= values[2] else 0
+    left, right = values[0], values[1]
+    return 1 if COMPARISONS[op](left, right) else 0
+
+
+COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    '==': lambda a, b: a == b,
+    '===': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '!==': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+# Python operator used in generated source
+COMPARISON_SOURCE = {'==': '==', '===': '==', '!=': '!=', '!==': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+OPERATORS = frozenset(['var', '+', '-', '*', '/', 'if', 'or', 'and', '!']) | frozenset(COMPARISONS)
+
+
+def _evaluate_node(node: Any, variables: Dict[str, Any]) -> Any:
+    """Interpret one JSON-logic node"""
+    if isinstance(node, list):
+        return [_evaluate_node(item, variables) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    op, args = _args(node)
+    if op == 'var':
+        return variables[_var_name(args)]
+    if op not in OPERATORS:
+        raise FormulaError(f"Unsupported operator '{op}'")
+
+    if op == 'if':
+        for index in range(0, len(args) - 1, 2):
+            if _evaluate_node(args[index], variables):
+                return _evaluate_node(args[index + 1], variables)
+        # No else branch: fall back to the raw value
+        return _evaluate_node(args[-1], variables) if len(args) % 2 else variables['v']
+    if op == 'or':
+        result = None
+        for arg in args:
+            result = _evaluate_node(arg, variables)
+            if result:
+                break
+        return result
+    if op == 'and':
+        result = None
+        for arg in args:
+            result = _evaluate_node(arg, variables)
+            if not result:
+                break
+        return result
+
+    values = [_evaluate_node(arg, variables) for arg in args]
+    if op == '+':
+        result = 0
+        for value in values:
+            result += value
+        return result
+    if op == '*':
+        result = 1
+        for value in values:
+            result *= value
+        return result
+    if op == '-':
+        return -values[0] if len(values) == 1 else values[0] - values[1]
+    if op == '/':
+        return values[0] / values[1]
+    if op == '!':
+        return 0 if values[0] else 1
+    return _compare(op, values)
+
+
+def evaluate(value: int, formula: Any, value2: Optional[int] = None) -> Any:
+    """
+    Apply formula/transformation to value (reference interpreter)
+
+    Args:
+        value: Input value
+        formula: Formula definition (can be dict with operations or direct value)
+        value2: Value of the datafield's second argument (optional)
+
+    Returns:
+        Transformed value (non-dict formulas return the value unchanged)
+
+    Raises:
+        FormulaError: If the formula uses an unsupported operator
+    """
+    if not isinstance(formula, dict):
+        return value
+    return _evaluate_node(formula, {'v': value, 'v2': value2})
+
+
+class CompiledFormula:
+    """Formula compiled to a Python function"""
+
+    __slots__ = ('source', 'func', 'linear', 'uses_value2')
+
+    def __init__(self, source: str, linear: Optional[Tuple[float, float]], uses_value2: bool,
+                 func: Optional[Callable] = None):
+        """
+        Args:
+            source: Python expression over v (value) and v2 (value2)
+            linear: (scale, offset) if the formula is scale * value + offset, else None
+            uses_value2: Whether the formula reads value2
+            func: Already built function (built from source if omitted)
+        """
+        self.source = source
+        self.linear = linear
+        self.uses_value2 = uses_value2
+        self.func = func or eval(compile(f"lambda v, v2=None: {source}", '<eep formula>', 'eval'))
+
+    def __call__(self, value: int, value2: Optional[int] = None) -> Any:
+        return self.func(value, value2)
+
+    def __getstate__(self) -> Tuple[str, Optional[Tuple[float, float]], bool]:
+        # Functions cannot be pickled; the source is compiled again on load
+        return self.source, self.linear, self.uses_value2
+
+    def __setstate__(self, state: Tuple[str, Optional[Tuple[float, float]], bool]):
+        self.__init__(*state)
+
+    def __repr__(self) -> str:
+        return f"CompiledFormula({self.source})"
+
+
+class _Code:
+    """Generated source of a subexpression; constant subtrees carry their folded value"""
+
+    __slots__ = ('source', 'is_const', 'value')
+
+    def __init__(self, source: str, is_const: bool = False, value: Any = None):
+        self.source = source
+        self.is_const = is_const
+        self.value = value
+
+    @classmethod
+    def const(cls, value: Any) -> '_Code':
+        if isinstance(value, float) and not math.isfinite(value):
+            # repr gives inf/nan, which are not Python literals
+            return cls(f"float('{value!r}')", True, value)
+        return cls(repr(value), True, value)
+
+
+def _fold(node: Any, evaluate_constant: Callable[[], Any]) -> _Code:
+    """Evaluate a constant expression at compile time (errors are reported as FormulaError)"""
+    try:
+        return _Code.const(evaluate_constant())
+    except FormulaError:
+        raise
+    except (ArithmeticError, LookupError, TypeError, ValueError) as e:
+        raise FormulaError(f"Cannot evaluate constant expression {formula_key(node)}: {e}") from e
+
+
+def _is_neutral(part: _Code, neutral: int) -> bool:
+    """Integer 0/1 operands can be dropped without changing value or type of the result"""
+    return part.is_const and type(part.value) is int and part.value == neutral
+
+
+def _generate(node: Any) -> _Code:
+    """
+    Generate Python source for a JSON-logic node
+
+    Constant subtrees are evaluated at compile time. Neutral operands
+    (+ 0, * 1, - 0) are dropped, which is exact in floating point, so the
+    compiled function returns bit-identical results to the interpreter.
+    """
+    if not isinstance(node, dict):
+        return _Code.const(node)
+
+    op, args = _args(node)
+    if op == 'var':
+        return _Code(_var_name(args))
+    if op not in OPERATORS:
+        raise FormulaError(f"Unsupported operator '{op}'")
+
+    parts = [_generate(arg) for arg in args]
+    # An "if" without else branch depends on the value unless a condition always matches
+    if all(part.is_const for part in parts) and not (op == 'if' and len(parts) % 2 == 0):
+        # Constant folding: evaluate the whole subtree once
+        return _fold(node, lambda: _evaluate_node(node, {}))
+
+    if op in ('+', '*'):
+        neutral = 0 if op == '+' else 1
+        # Only a leading run of constants can be merged without changing evaluation order
+        folded = []
+        for part in parts:
+            if part.is_const and len(folded) == 1 and folded[0].is_const:
+                left = folded[-1].value
+                folded[-1] = _fold(node, lambda: left + part.value if op == '+' else left * part.value)
+            else:
+                folded.append(part)
+        folded = [part for part in folded if not _is_neutral(part, neutral)]
+        if not folded:
+            return _Code.const(neutral)
+        if len(folded) == 1:
+            return folded[0]
+        return _Code('(' + f' {op} '.join(part.source for part in folded) + ')')
+    if op == '-':
+        if len(parts) == 1:
+            return _Code(f"(-{parts[0].source})")
+        if _is_neutral(parts[1], 0):
+            return parts[0]
+        return _Code(f"({parts[0].source} - {parts[1].source})")
+    if op == '/':
+        return _Code(f"({parts[0].source} / {parts[1].source})")
+    if op == 'if':
+        source = parts[-1].source if len(parts) % 2 else 'v'
+        for index in range(len(parts) - 2 - len(parts) % 2, -1, -2):
+            source = f"({parts[index + 1].source} if {parts[index].source} else {source})"
+        return _Code(source)
+    if op in ('or', 'and'):
+        return _Code('(' + f' {op} '.join(part.source for part in parts) + ')')
+    if op == '!':
+        return _Code(f"(0 if {parts[0].source} else 1)")
+
+    # Comparisons
+    python_op = COMPARISON_SOURCE[op]
+    if op in ('<', '<=') and len(parts) == 3:
+        chain = f"{parts[0].source} {python_op} {parts[1].source} {python_op} {parts[2].source}"
+    else:
+        chain = f"{parts[0].source} {python_op} {parts[1].source}"
+    return _Code(f"(1 if {chain} else 0)")
+
+
+def _linear(node: Any) -> Optional[Tuple[float, float]]:
+    """
+    Detect formulas of the form scale * value + offset
+
+    Returns:
+        (scale, offset) or None if the formula is not linear in value
+    """
+    if not isinstance(node, dict):
+        if isinstance(node, (int, float)) and not isinstance(node, bool):
+            return 0, node
+        return None
+
+    try:
+        op, args = _args(node)
+    except FormulaError:
+        return None
+    if op == 'var':
+        return (1, 0) if args and args[0] == 'value' else None
+
+    terms = [_linear(arg) for arg in args]
+    if not terms or any(term is None for term in terms):
+        return None
+
+    if op == '+':
+        return sum(term[0] for term in terms), sum(term[1] for term in terms)
+    if op == '-':
+        if len(terms) == 1:
+            return -terms[0][0], -terms[0][1]
+        return terms[0][0] - terms[1][0], terms[0][1] - terms[1][1]
+    if op == '*':
+        factor = 1
+        variable = None
+        for term in terms:
+            if term[0]:
+                if variable is not None:
+                    return None  # value * value
+                variable = term
+            else:
+                factor *= term[1]
+        if variable is None:
+            return 0, factor
+        return variable[0] * factor, variable[1] * factor
+    if op == '/' and len(terms) == 2 and not terms[1][0] and terms[1][1]:
+        return terms[0][0] / terms[1][1], terms[0][1] / terms[1][1]
+    return None
+
+
+_cache: Dict[str, CompiledFormula] = {}
+_cache_hits = 0
+
+# Fields up to this size are checked value by value before using the scale/offset form
+LINEAR_CHECK_MAX_BITS = 12
+
+# (formula source, bitsize, decimals) -> formula used to decode fields of that size
+_linear_cache: Dict[Tuple[str, int, Optional[int]], CompiledFormula] = {}
+
+
+def formula_key(formula: Any) -> str:
+    """Canonical key: identical formulas from different profiles share one compiled function"""
+    return json.dumps(formula, sort_keys=True, separators=(',', ':'))
+
+
+def compile_formula(formula: Any) -> Optional[CompiledFormula]:
+    """
+    Compile a datafield formula (cached)
+
+    Args:
+        formula: Formula definition from the datafield "value" key
+
+    Returns:
+        CompiledFormula, or None for non-dict formulas (value is used unchanged)
+
+    Raises:
+        FormulaError: If the formula uses an unsupported operator or variable
+    """
+    global _cache_hits
+
+    if not isinstance(formula, dict):
+        return None
+
+    key = formula_key(formula)
+    compiled = _cache.get(key)
+    if compiled is not None:
+        _cache_hits += 1
+        return compiled
+
+    code = _generate(formula)
+    linear = _linear(formula)
+    if linear is not None and not linear[0]:
+        linear = None  # Constant, not a scale
+    compiled = CompiledFormula(code.source, linear, '"value2"' in key)
+    _cache[key] = compiled
+    return compiled
+
+
+def _linear_source(scale: float, offset: float) -> str:
+    """Python source of scale * value + offset"""
+    if isinstance(scale, float) and isinstance(offset, float) and offset.is_integer():
+        offset = int(offset)  # Same float result, matches the source of already linear formulas
+    source = 'v' if scale == 1 and type(scale) is int else f"(v * {scale!r})"
+    if offset:
+        source = f"({source} + {offset!r})"
+    return source
+
+
+def specialize(compiled: CompiledFormula, bitsize: int, decimals: Optional[int] = None) -> CompiledFormula:
+    """
+    Use the scale/offset form of a linear formula for a datafield (cached)
+
+    The generic source keeps the evaluation order of the profile (e.g.
+    (v - 1) * 0.1 + 0.1), which rounds differently than v * scale + offset
+    in the last bits. The scale/offset form is only used if it publishes
+    identical values (after rounding to the field's decimals) for every
+    raw value the field can carry.
+
+    Args:
+        compiled: Compiled datafield formula
+        bitsize: Size of the datafield in bits
+        decimals: Decimals the field's values are rounded to (optional)
+
+    Returns:
+        Formula computing scale * value + offset, or the formula itself
+    """
+    if compiled.linear is None or compiled.uses_value2 or bitsize > LINEAR_CHECK_MAX_BITS:
+        return compiled
+
+    key = (compiled.source, bitsize, decimals)
+    specialized = _linear_cache.get(key)
+    if specialized is not None:
+        return specialized
+
+    specialized = compiled
+    scale, offset = compiled.linear
+    source = _linear_source(scale, offset)
+    if source != compiled.source and math.isfinite(scale) and math.isfinite(offset):
+        candidate = CompiledFormula(source, compiled.linear, False)
+        published = (lambda value: value) if decimals is None else (lambda value: round(value, decimals))
+        try:
+            # repr also tells int from float and 0.0 from -0.0
+            exact = all(repr(fast) == repr(slow)
+                        for fast, slow in ((published(candidate.func(v)), published(compiled.func(v)))
+                                           for v in range(1 << bitsize)))
+        except ArithmeticError:
+            exact = False
+        if exact:
+            specialized = candidate
+    _linear_cache[key] = specialized
+    return specialized
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Get formula cache statistics
+
+    Returns:
+        Dictionary with number of distinct compiled formulas, cache hits and
+        formulas decoded in scale/offset form (per field size)
+    """
+    return {
+        'compiled': len(_cache),
+        'hits': _cache_hits,
+        'linear': sum(1 for key, specialized in _linear_cache.items() if specialized.source != key[0])
+    }
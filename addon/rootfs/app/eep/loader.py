@@ -4,8 +4,16 @@ Loads and manages EnOcean Equipment Profiles from JSON files
 """
 import json
 import logging
+import os
+import pickle
+import re
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Any, Iterable, Set, Tuple
+from .decoder import ProfileDecoder
+from .encoder import ProfileEncoder
+from .formula import get_cache_stats as get_formula_cache_stats
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +33,28 @@ class EEPProfile:
         self.bidirectional = data.get('bidirectional', False)
         self.objects = data.get('objects', {})
         self.case = data.get('case', [])
+        # Seconds between periodic telegrams (None = learned from traffic, 0 = event driven, never offline)
+        self.expected_interval = data.get('expected_interval')
+        # Per-field publish deadbands ("deadband": 0.2 or "2%" on an object)
+        self.deadbands = {
+            shortcut: obj['deadband'] for shortcut, obj in self.objects.items()
+            if isinstance(obj, dict) and 'deadband' in obj
+        }
         
         # Parse RORG as integer
         if isinstance(self.rorg_number, str):
             self.rorg = int(self.rorg_number, 16)
         else:
             self.rorg = self.rorg_number
+        
+        # Rocker switches only send when pressed
+        if self.expected_interval is None and self.rorg == 0xF6:
+            self.expected_interval = 0
+        
+        # Compile receive cases once so decoding needs no string/bit conversions
+        self.decoder = ProfileDecoder(self.case, self.eep)
+        # Compile send cases into bit-packing encoders for commands
+        self.encoder = ProfileEncoder(self.case, self.eep)
     
     def get_datafields(self) -> List[dict]:
         """Get datafield definitions from first case"""
@@ -58,73 +82,401 @@ class EEPProfile:
         return f"EEPProfile({self.eep}: {self.type_title})"
 
 
+def _parse_number(number: Any) -> Optional[int]:
+    """Parse a FUNC/TYPE number ('0x02' or 2), None if it is not a number"""
+    if isinstance(number, str):
+        try:
+            return int(number, 16)
+        except ValueError:
+            return None
+    return number if isinstance(number, int) else None
+
+
+class ProfileInfo:
+    """
+    Index entry of an EEP profile
+    Carries the metadata needed for listing and matching, so the full
+    definition only needs to be parsed when the profile is actually used
+    """
+
+    __slots__ = ('eep', 'path', 'rorg', 'func', 'type', 'rorg_number', 'func_number', 'type_number',
+                 'type_title', 'manufacturer', 'description', 'custom')
+
+    def __init__(self, data: dict, path: Path, custom: bool = False):
+        """Initialize index entry from (header) JSON data"""
+        self.eep = data.get('eep', '')
+        self.path = path
+        self.rorg_number = data.get('rorg_number', '')
+        self.func_number = data.get('func_number', '')
+        self.type_number = data.get('type_number', '')
+        self.type_title = data.get('type_title', '')
+        self.manufacturer = data.get('manufacturer', 'EnOcean')
+        self.description = data.get('description', '')
+        self.custom = custom
+
+        if isinstance(self.rorg_number, str):
+            self.rorg = int(self.rorg_number, 16)
+        else:
+            self.rorg = self.rorg_number
+        self.func = _parse_number(self.func_number)
+        self.type = _parse_number(self.type_number)
+
+    def __repr__(self) -> str:
+        return f"ProfileInfo({self.eep}: {self.type_title})"
+
+
+# Keys after which a definition file only contains entity and case definitions
+BODY_KEYS = frozenset(['objects', 'case', 'commands'])
+HEADER_READ_SIZE = 4096
+
+_json_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'\s*')
+
+
+def read_header(path: Path) -> Optional[dict]:
+    """
+    Read the top-level scalar keys of a definition file without parsing its body
+
+    The bundled definitions list eep, rorg_number, func_number, type_number,
+    type_title etc. before the (large) objects and case sections, so only
+    the first few hundred bytes need to be decoded.
+
+    Args:
+        path: Path to the JSON definition
+
+    Returns:
+        Dictionary with the header keys, or None if the header could not be
+        read this way (the caller then falls back to a full parse)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read(HEADER_READ_SIZE)
+
+    header = {}
+    try:
+        pos = _WHITESPACE.match(text, 0).end()
+        if text[pos] != '{':
+            return None
+        pos += 1
+        while True:
+            pos = _WHITESPACE.match(text, pos).end()
+            key, pos = _json_decoder.raw_decode(text, pos)
+            pos = _WHITESPACE.match(text, pos).end()
+            if not isinstance(key, str) or text[pos] != ':':
+                return None
+            pos = _WHITESPACE.match(text, pos + 1).end()
+            if key in BODY_KEYS or text[pos] in '{[':
+                break
+            header[key], pos = _json_decoder.raw_decode(text, pos)
+            pos = _WHITESPACE.match(text, pos).end()
+            if text[pos] != ',':
+                break
+            pos += 1
+    except (ValueError, IndexError):
+        return None  # Header longer than the read size or not well-formed
+
+    return header if header.get('eep') and header.get('rorg_number') else None
+
+
+CACHE_VERSION = 1
+# Modules whose classes end up in the cache file - changing them invalidates it
+CACHED_MODULES = ('loader.py', 'decoder.py', 'encoder.py', 'formula.py')
+
+
 class EEPLoader:
-    """Load and manage EEP profiles"""
+    """
+    Load and manage EEP profiles
+
+    Startup only builds an index (eep -> file and metadata). The full
+    definition of a profile is parsed and compiled on its first get_profile()
+    call, so a site only pays for the handful of EEPs its devices use.
+
+    Index and compiled profiles are kept in a cache file. As long as no
+    definition file (built-in or custom) and no decoder module changed,
+    the next start restores them from there instead of reading any JSON.
+    """
+    
+    SAVE_DELAY = 5.0  # Seconds lazy loads are collected before the cache file is rewritten
     
-    def __init__(self, definitions_path: str, custom_path: str = '/config/enocean_custom_profiles'):
+    def __init__(self, definitions_path: str, custom_path: str = '/config/enocean_custom_profiles',
+                 cache_file: Optional[str] = '/data/eep_profile_cache.pickle'):
         """
         Initialize EEP loader
         
         Args:
             definitions_path: Path to built-in EEP definitions directory
             custom_path: Path to custom/override EEP profiles directory
+            cache_file: Path of the compiled profile cache (None to disable)
         """
         self.definitions_path = Path(definitions_path)
         self.custom_path = Path(custom_path)
-        self.profiles: Dict[str, EEPProfile] = {}
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.index: Dict[str, ProfileInfo] = {}
+        self.profiles: Dict[str, EEPProfile] = {}  # Profiles loaded so far
+        # Lookup indexes derived from the index: rorg -> entries, (rorg, func, type) -> entries
+        self._by_rorg: Dict[int, List[ProfileInfo]] = {}
+        self._by_telegram: Dict[Tuple[int, Optional[int], Optional[int]], List[ProfileInfo]] = {}
+        self.index_time_ms = 0.0
+        self.from_cache = False
+        self._sources: List[Tuple[str, int, int]] = []
+        self._failed = set()  # EEPs whose definition could not be loaded (not retried)
+        self._load_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
         self.load_all_profiles()
     
+    def _index_file(self, json_file: Path, custom: bool) -> ProfileInfo:
+        """Create the index entry of a definition file (full parse only if the header scan fails)"""
+        header = None if custom else read_header(json_file)
+        if header is None:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+        return ProfileInfo(header, json_file, custom)
+    
     def load_all_profiles(self):
-        """Load all EEP profiles from JSON files (built-in + custom overrides)"""
+        """Index all EEP profiles from JSON files (built-in + custom overrides)"""
         if not self.definitions_path.exists():
             logger.error(f"EEP definitions path does not exist: {self.definitions_path}")
             return
         
-        # Load built-in profiles first
+        started = time.perf_counter()
+        self._sources = self._source_fingerprint()
+        
+        if self._load_cache():
+            self._build_lookup()
+            self.from_cache = True
+            self.index_time_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"⏱️  EEP profiles restored from cache in {self.index_time_ms:.1f} ms "
+                        f"({len(self.index)} profiles, {len(self.profiles)} compiled)")
+            return
+        
+        self.index = self._build_index()
+        self._build_lookup()
+        self.index_time_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"⏱️  EEP profile index built in {self.index_time_ms:.1f} ms ({len(self.index)} profiles, loaded on first use)")
+        self.save_cache()
+    
+    def _build_index(self, previous: Optional[Dict[str, ProfileInfo]] = None) -> Dict[str, ProfileInfo]:
+        """
+        Index built-in and custom definition files
+        
+        Args:
+            previous: Index to take entries from for custom files that cannot
+                      be read (e.g. saved half-way by an editor) during a reload
+            
+        Returns:
+            New index (custom entries replace built-in ones of the same EEP)
+        """
+        index: Dict[str, ProfileInfo] = {}
+        log = logger.info if previous is None else logger.debug
+        
+        # Index built-in profiles first
         count = 0
         for json_file in self.definitions_path.rglob('*.json'):
             try:
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    profile = EEPProfile(data)
-                    self.profiles[profile.eep] = profile
-                    count += 1
-                    logger.debug(f"Loaded EEP profile: {profile.eep} - {profile.type_title}")
+                info = self._index_file(json_file, custom=False)
+                index[info.eep] = info
+                count += 1
             except Exception as e:
-                logger.error(f"Failed to load EEP profile from {json_file}: {e}")
+                logger.error(f"Failed to index EEP profile {json_file}: {e}")
         
-        logger.info(f"Loaded {count} built-in EEP profiles")
+        log(f"Indexed {count} built-in EEP profiles")
         
-        # Load custom/override profiles
+        # Index custom/override profiles
         if self.custom_path.exists():
             custom_count = 0
             override_count = 0
             for json_file in self.custom_path.rglob('*.json'):
                 try:
-                    with open(json_file, 'r') as f:
-                        data = json.load(f)
-                        profile = EEPProfile(data)
-                        
-                        if profile.eep in self.profiles:
-                            logger.info(f"🔄 Overriding EEP profile: {profile.eep} with custom version")
-                            override_count += 1
-                        else:
-                            logger.info(f"➕ Adding custom EEP profile: {profile.eep}")
-                        
-                        self.profiles[profile.eep] = profile
-                        custom_count += 1
+                    info = self._index_file(json_file, custom=True)
                 except Exception as e:
                     logger.error(f"Failed to load custom EEP profile from {json_file}: {e}")
+                    if previous is not None:
+                        # Keep the last good version of this file
+                        for eep, old in previous.items():
+                            if old.path == json_file:
+                                logger.warning(f"⚠️  Keeping previous version of EEP profile {eep}")
+                                index[eep] = old
+                    continue
+                
+                if info.eep in index:
+                    log(f"🔄 Overriding EEP profile: {info.eep} with custom version")
+                    override_count += 1
+                else:
+                    log(f"➕ Adding custom EEP profile: {info.eep}")
+                
+                index[info.eep] = info
+                custom_count += 1
             
             if custom_count > 0:
-                logger.info(f"Loaded {custom_count} custom profiles ({override_count} overrides, {custom_count - override_count} new)")
-        else:
+                log(f"Loaded {custom_count} custom profiles ({override_count} overrides, {custom_count - override_count} new)")
+        elif previous is None:
             logger.info(f"Custom profiles directory not found: {self.custom_path}")
             logger.info(f"To add custom EEP profiles, create JSON files in: {self.custom_path}")
+        
+        return index
+    
+    def reload_custom_profiles(self) -> Set[str]:
+        """
+        Re-index after definition files changed and swap in the result
+        
+        Only profiles whose definition file changed are compiled again;
+        compiled profiles of unchanged EEPs are kept. Index, lookups and
+        compiled profiles are replaced as a whole, so concurrent readers see
+        either the old or the new set.
+        
+        Returns:
+            EEP codes whose definition changed (added, modified, removed or no longer overridden)
+        """
+        sources = self._source_fingerprint()
+        if sources == self._sources:
+            return set()
+        
+        old_stamps = {path: (mtime, size) for path, mtime, size in self._sources}
+        new_stamps = {path: (mtime, size) for path, mtime, size in sources}
+        index = self._build_index(previous=self.index)
+        
+        changed = set()
+        for eep in set(self.index) | set(index):
+            old, new = self.index.get(eep), index.get(eep)
+            if old is new:
+                continue  # Kept previous version of an unreadable file
+            if (old is None or new is None or old.path != new.path or
+                    old_stamps.get(str(old.path)) != new_stamps.get(str(new.path))):
+                changed.add(eep)
+        
+        self._failed -= changed
+        profiles = {eep: profile for eep, profile in self.profiles.items() if eep not in changed}
+        for eep in changed:
+            if eep in self.profiles and eep in index:
+                profile = self._load_profile(index[eep])
+                if profile is not None:
+                    profiles[eep] = profile
+        
+        with self._load_lock:
+            self.index = index
+            self.profiles = profiles
+            self._sources = sources
+            self._build_lookup()
+        
+        if changed:
+            logger.info(f"🔄 Reloaded EEP profiles: {', '.join(sorted(changed))}")
+        self.save_cache()
+        return changed
+    
+    def _build_lookup(self):
+        """
+        Rebuild the rorg and (rorg, func, type) lookup indexes from the index
+        
+        Must be called whenever the index changes; since custom profiles
+        replace built-in index entries of the same EEP, overridden entries
+        never appear in the lookups.
+        """
+        by_rorg: Dict[int, List[ProfileInfo]] = {}
+        by_telegram: Dict[Tuple[int, Optional[int], Optional[int]], List[ProfileInfo]] = {}
+        for info in self.index.values():
+            by_rorg.setdefault(info.rorg, []).append(info)
+            by_telegram.setdefault((info.rorg, info.func, info.type), []).append(info)
+        # Swap in complete dictionaries so concurrent readers never see a partial index
+        self._by_rorg = by_rorg
+        self._by_telegram = by_telegram
+    
+    def _source_fingerprint(self) -> List[Tuple[str, int, int]]:
+        """
+        Stat all definition files and decoder modules
+        
+        Returns:
+            Sorted list of (path, mtime_ns, size) - any edit, addition or removal changes it
+        """
+        paths = list(self.definitions_path.rglob('*.json'))
+        if self.custom_path.exists():
+            paths.extend(self.custom_path.rglob('*.json'))
+        package = Path(__file__).parent
+        paths.extend(package / name for name in CACHED_MODULES)
+        
+        sources = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            sources.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return sorted(sources)
+    
+    def _load_cache(self) -> bool:
+        """
+        Restore index and compiled profiles from the cache file
+        
+        Returns:
+            True if the cache was valid for the current sources
+        """
+        if self.cache_file is None or not self.cache_file.exists():
+            return False
+        
+        try:
+            with open(self.cache_file, 'rb') as f:
+                bundle = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read EEP profile cache {self.cache_file}: {e}")
+            return False
+        
+        if bundle.get('version') != CACHE_VERSION or bundle.get('sources') != self._sources:
+            logger.info("EEP definitions changed since last start, rebuilding profile cache")
+            return False
+        
+        self.index = bundle['index']
+        self.profiles = bundle['profiles']
+        for profile in self.profiles.values():
+            self._report_formula_errors(profile)
+        return True
+    
+    def save_cache(self):
+        """Write index and compiled profiles to the cache file"""
+        if self.cache_file is None:
+            return
+        
+        with self._load_lock:
+            bundle = {
+                'version': CACHE_VERSION,
+                'sources': self._sources,
+                'index': dict(self.index),
+                'profiles': dict(self.profiles)
+            }
+        
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.cache_file.with_suffix('.tmp')
+            with open(temp_file, 'wb') as f:
+                pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.cache_file)
+            logger.debug(f"Saved EEP profile cache ({len(bundle['profiles'])} compiled profiles) to {self.cache_file}")
+        except Exception as e:
+            logger.warning(f"Could not write EEP profile cache {self.cache_file}: {e}")
+    
+    def _load_profile(self, info: ProfileInfo) -> Optional[EEPProfile]:
+        """Parse and compile the full definition of an indexed profile"""
+        started = time.perf_counter()
+        try:
+            with open(info.path, 'r', encoding='utf-8') as f:
+                profile = EEPProfile(json.load(f))
+        except Exception as e:
+            logger.error(f"Failed to load EEP profile {info.eep} from {info.path}: {e}")
+            self._failed.add(info.eep)
+            return None
+        
+        self._report_formula_errors(profile)
+        logger.debug(f"Loaded EEP profile: {profile.eep} - {profile.type_title} "
+                     f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+        return profile
+    
+    def _report_formula_errors(self, profile: EEPProfile):
+        """Log datafield formulas that could not be compiled (they decode to the raw value)"""
+        for shortcut, error in profile.decoder.formula_errors + profile.encoder.formula_errors:
+            logger.warning(f"⚠️  {profile.eep} field {shortcut}: {error} - publishing raw value")
+        stats = get_formula_cache_stats()
+        logger.debug(f"Formula cache: {stats['compiled']} distinct formulas ({stats['linear']} fields in scale/offset form), {stats['hits']} shared")
     
     def get_profile(self, eep: str) -> Optional[EEPProfile]:
         """
-        Get EEP profile by code
+        Get EEP profile by code (loaded on first use)
         
         Args:
             eep: EEP code (e.g., 'MV-01-01', 'A5-30-03')
@@ -132,9 +484,84 @@ class EEPLoader:
         Returns:
             EEPProfile if found, None otherwise
         """
-        return self.profiles.get(eep)
+        profile = self.profiles.get(eep)
+        if profile is None and self._load(eep):
+            # Called on the telegram path - the cache file is written later in the background
+            self._schedule_save()
+            profile = self.profiles.get(eep)
+        return profile
+    
+    def _schedule_save(self):
+        """Write the cache file from a timer thread once lazy loads settle (one write per burst)"""
+        if self.cache_file is None:
+            return
+        with self._load_lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self._deferred_save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def _deferred_save(self):
+        """Timer thread side of _schedule_save()"""
+        with self._load_lock:
+            self._save_timer = None
+        self.save_cache()
+    
+    def _load(self, eep: str) -> bool:
+        """
+        Load an indexed profile that is not loaded yet
+        
+        Returns:
+            True if the profile was newly loaded
+        """
+        info = self.index.get(eep)
+        if info is None or eep in self._failed:
+            return False
+        
+        with self._load_lock:
+            if eep in self.profiles:
+                return False
+            profile = self._load_profile(info)
+            if profile is None:
+                return False
+            self.profiles[eep] = profile
+            return True
+    
+    def preload(self, eeps: Iterable[str]):
+        """
+        Load several profiles up front (e.g. those of configured devices)
+        
+        The cache file is written once afterwards instead of once per profile.
+        
+        Args:
+            eeps: EEP codes
+        """
+        loaded = [eep for eep in set(eeps) if eep and eep not in self.profiles and self._load(eep)]
+        if loaded:
+            logger.info(f"Compiled {len(loaded)} EEP profiles in use: {', '.join(sorted(loaded))}")
+            self.save_cache()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get loader statistics
+        
+        Returns:
+            Dictionary with number of indexed and loaded profiles, startup time,
+            whether the profiles were restored from the cache file and decode
+            memo hits/misses
+        """
+        decoders = [profile.decoder for profile in list(self.profiles.values())]
+        return {
+            'indexed': len(self.index),
+            'loaded': len(self.profiles),
+            'index_time_ms': round(self.index_time_ms, 1),
+            'from_cache': self.from_cache,
+            'decode_memo_hits': sum(decoder.memo_hits for decoder in decoders),
+            'decode_memo_misses': sum(decoder.memo_misses for decoder in decoders)
+        }
     
-    def get_profile_by_rorg(self, rorg: int) -> List[EEPProfile]:
+    def get_profile_by_rorg(self, rorg: int) -> List[ProfileInfo]:
         """
         Get all profiles matching RORG
         
@@ -142,11 +569,11 @@ class EEPLoader:
             rorg: RORG value (e.g., 0xA5)
             
         Returns:
-            List of matching profiles
+            List of matching index entries (use get_profile() for the full profile)
         """
-        return [p for p in self.profiles.values() if p.rorg == rorg]
+        return list(self._by_rorg.get(rorg, ()))
     
-    def find_profiles_by_telegram(self, rorg: int, func: Optional[int] = None, type_val: Optional[int] = None) -> List[EEPProfile]:
+    def find_profiles_by_telegram(self, rorg: int, func: Optional[int] = None, type_val: Optional[int] = None) -> List[ProfileInfo]:
         """
         Find EEP profiles matching telegram parameters
         
@@ -156,30 +583,11 @@ class EEPLoader:
             type_val: TYPE number (optional, for precise matching)
             
         Returns:
-            List of matching profiles (exact match if func/type provided, all RORG matches otherwise)
+            List of matching index entries (exact match if func/type provided, all RORG matches otherwise)
         """
-        matches = []
-        
-        for profile in self.profiles.values():
-            # Match RORG
-            if profile.rorg != rorg:
-                continue
-            
-            # If func and type specified, do exact match
-            if func is not None and type_val is not None:
-                try:
-                    profile_func = int(profile.func_number, 16) if isinstance(profile.func_number, str) else profile.func_number
-                    profile_type = int(profile.type_number, 16) if isinstance(profile.type_number, str) else profile.type_number
-                    
-                    if profile_func == func and profile_type == type_val:
-                        matches.append(profile)
-                except (ValueError, AttributeError):
-                    continue
-            else:
-                # Just RORG match
-                matches.append(profile)
-        
-        return matches
+        if func is not None and type_val is not None:
+            return list(self._by_telegram.get((rorg, func, type_val), ()))
+        return list(self._by_rorg.get(rorg, ()))
     
     def list_profiles(self) -> List[dict]:
         """
@@ -195,7 +603,7 @@ class EEPLoader:
                 'manufacturer': p.manufacturer,
                 'description': p.description
             }
-            for p in sorted(self.profiles.values(), key=lambda x: x.eep)
+            for p in sorted(self.index.values(), key=lambda x: x.eep)
         ]
     
     def search_profiles(self, query: str) -> List[dict]:
@@ -211,7 +619,7 @@ class EEPLoader:
         query_lower = query.lower()
         results = []
         
-        for profile in self.profiles.values():
+        for profile in self.index.values():
             if (query_lower in profile.eep.lower() or
                 query_lower in profile.type_title.lower() or
                 query_lower in profile.manufacturer.lower()):
@@ -3,8 +3,10 @@ EEP Parser
 Parses EnOcean telegrams using EEP profile definitions
 """
 import logging
-from typing import Dict, Any, Optional
+from typing import Any, Mapping, Optional
 from .loader import EEPProfile
+from .formula import evaluate as formula_evaluate
+from core.esp3_protocol import radio_payload
 
 logger = logging.getLogger(__name__)
 
@@ -25,16 +27,12 @@ class EEPParser:
         Returns:
             Extracted value as integer
         """
-        # Convert bytes to bit string
-        bit_string = ''.join(format(byte, '08b') for byte in data)
-        
-        # Extract bits
-        extracted_bits = bit_string[bitoffs:bitoffs + bitsize]
-        
-        # Convert to integer
-        if extracted_bits:
-            return int(extracted_bits, 2)
-        return 0
+        # Bits past the end of data are not there - keep only the ones that exist
+        total_bits = len(data) * 8
+        size = max(0, min(bitsize, total_bits - bitoffs))
+        if not size:
+            return 0
+        return (int.from_bytes(data, 'big') >> (total_bits - bitoffs - size)) & ((1 << size) - 1)
     
     @staticmethod
     def apply_formula(value: int, formula: Any) -> Any:
@@ -48,138 +46,38 @@ class EEPParser:
         Returns:
             Transformed value
         """
-        # Handle simple equality check
-        if isinstance(formula, dict):
-            if '==' in formula:
-                # Equality check: {"==": [{"var": "value"}, 1]}
-                operands = formula['==']
-                if len(operands) == 2:
-                    left = operands[0]
-                    right = operands[1]
-                    if isinstance(left, dict) and 'var' in left:
-                        return 1 if value == right else 0
-            
-            # Handle arithmetic operations
-            if '+' in formula:
-                # Addition
-                result = 0
-                for operand in formula['+']:
-                    if isinstance(operand, dict):
-                        result += EEPParser.apply_formula(value, operand)
-                    else:
-                        result += operand
-                return result
-            
-            if '*' in formula:
-                # Multiplication
-                result = 1
-                for operand in formula['*']:
-                    if isinstance(operand, dict):
-                        result *= EEPParser.apply_formula(value, operand)
-                    else:
-                        result *= operand
-                return result
-            
-            if '-' in formula:
-                # Subtraction
-                operands = formula['-']
-                if len(operands) == 2:
-                    left = operands[0]
-                    right = operands[1]
-                    if isinstance(left, dict) and 'var' in left:
-                        return value - right
-                    return left - right
-            
-            if 'var' in formula:
-                # Variable reference
-                return value
-        
-        return value
+        return formula_evaluate(value, formula)
     
-    def parse_telegram(self, data_bytes: bytes, profile: EEPProfile) -> Dict[str, Any]:
+    def parse_telegram(self, data_bytes: bytes, profile: EEPProfile, status: Optional[int] = None) -> Mapping[str, Any]:
         """
         Parse telegram data using EEP profile
         
+        Only the receive cases whose condition matches the telegram are decoded.
+        Results of recently seen identical payloads are reused.
+        
         Args:
             data_bytes: Data bytes from telegram (without sender ID and status)
             profile: EEP profile to use for parsing
+            status: Status byte of the telegram (for status dependent cases, e.g. F6 rockers)
             
         Returns:
-            Dictionary with parsed values
+            Read-only mapping with parsed values (shared between calls - copy before modifying)
         """
-        result = {}
-        
-        try:
-            datafields = profile.get_datafields()
-            
-            for datafield in datafields:
-                shortcut = datafield.get('shortcut')
-                bitoffs = datafield.get('bitoffs')
-                bitsize = datafield.get('bitsize')
-                
-                if shortcut is None or bitoffs is None or bitsize is None:
-                    continue
-                
-                # Convert bitoffs and bitsize to integers if they're strings
-                try:
-                    bitoffs = int(bitoffs)
-                    bitsize = int(bitsize)
-                except (ValueError, TypeError) as e:
-                    logger.error(f"Invalid bitoffs/bitsize for {shortcut}: bitoffs={bitoffs}, bitsize={bitsize}")
-                    continue
-                
-                # Extract raw value
-                raw_value = self.extract_bits(data_bytes, bitoffs, bitsize)
-                
-                # Apply inversion if specified
-                if datafield.get('invert'):
-                    raw_value = 1 - raw_value
-                
-                # Apply formula if specified
-                if 'value' in datafield:
-                    value = self.apply_formula(raw_value, datafield['value'])
-                else:
-                    value = raw_value
-                
-                # Apply decimals if specified
-                if 'decimals' in datafield and isinstance(value, (int, float)):
-                    decimals = datafield['decimals']
-                    value = round(value, decimals)
-                
-                result[shortcut] = value
-                logger.debug(f"Parsed {shortcut}: {value} (raw: {raw_value})")
-            
-        except Exception as e:
-            logger.error(f"Error parsing telegram with profile {profile.eep}: {e}")
-        
-        return result
+        return profile.decoder.decode_cached(data_bytes, status)
     
-    def parse_telegram_with_full_data(self, full_data: bytes, profile: EEPProfile) -> Dict[str, Any]:
+    def parse_telegram_with_full_data(self, full_data: bytes, profile: EEPProfile) -> Mapping[str, Any]:
         """
         Parse telegram with full data including RORG, sender ID, and status
         
         Args:
-            full_data: Full telegram data from ESP3 packet
+            full_data: Full ERP1 data from ESP3 packet ([RORG] [Payload] [Sender ID] [Status])
             profile: EEP profile to use for parsing
             
         Returns:
-            Dictionary with parsed values
+            Read-only mapping with parsed values (shared between calls - copy before modifying)
         """
-        # For 4BS telegrams (RORG 0xA5), data structure is:
-        # [RORG, DB3, DB2, DB1, DB0, Sender ID (4 bytes), Status]
-        # We need bytes 1-4 (DB3, DB2, DB1, DB0)
-        
-        logger.info(f"📊 Parsing telegram with profile {profile.eep}")
-        logger.info(f"Full data length: {len(full_data)} bytes")
-        logger.info(f"Full data hex: {' '.join(f'{b:02x}' for b in full_data)}")
-        
-        if len(full_data) >= 5:
-            # Extract DB3, DB2, DB1, DB0 (bytes 1-4)
-            data_bytes = full_data[1:5]
-            logger.info(f"Data bytes (DB3-DB0): {' '.join(f'{b:02x}' for b in data_bytes)}")
-            result = self.parse_telegram(data_bytes, profile)
-            logger.info(f"Parsed result: {result}")
-            return result
-        else:
+        payload = radio_payload(full_data)
+        if not payload:
             logger.warning(f"Telegram data too short: {len(full_data)} bytes")
             return {}
+        return self.parse_telegram(payload, profile, full_data[-1])
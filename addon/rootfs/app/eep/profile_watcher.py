@@ -0,0 +1,206 @@
+"""
+EEP Profile Watcher
+Notices changes to the custom profile directory, using inotify where the
+C library provides it and a cheap mtime poll otherwise
+"""
+import asyncio
+import ctypes
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify constants (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+
+def _load_inotify():
+    """Get the C library if it provides inotify (None on other platforms)"""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+class ProfileWatcher:
+    """
+    Watch a directory tree of profile JSON files
+
+    The callback runs once per burst of changes (editors often write a file
+    in several steps), after the tree has been quiet for the debounce time.
+    It decides itself what changed, so events only serve as a trigger.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 5.0, debounce: float = 1.0):
+        """
+        Initialize watcher
+
+        Args:
+            path: Directory to watch (may not exist yet)
+            poll_interval: Seconds between scans when inotify is not available
+            debounce: Quiet time in seconds before the callback runs
+        """
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.mode: Optional[str] = None  # 'inotify' or 'poll' once running
+        self.reloads = 0
+        self._running = False
+        self._fd: Optional[int] = None
+        self._libc = None
+        self._changed: Optional[asyncio.Event] = None
+
+    def _fingerprint(self) -> List[Tuple[str, int, int]]:
+        """Stat all JSON files below the watched directory"""
+        if not self.path.exists():
+            return []
+        sources = []
+        for path in self.path.rglob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            sources.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return sorted(sources)
+
+    def _start_inotify(self) -> bool:
+        """Set up inotify for the directory tree (False if unavailable)"""
+        if not self.path.is_dir():
+            return False
+        self._libc = _load_inotify()
+        if self._libc is None:
+            return False
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.debug(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return False
+        self._fd = fd
+        if not self._add_watches():
+            os.close(fd)
+            self._fd = None
+            return False
+        return True
+
+    def _add_watches(self) -> bool:
+        """Watch the directory and all its subdirectories (re-adding a watch is a no-op)"""
+        directories = [self.path] + [path for path in self.path.rglob('*') if path.is_dir()]
+        for directory in directories:
+            if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+                logger.debug(f"inotify_add_watch({directory}) failed: {os.strerror(ctypes.get_errno())}")
+                return False
+        return True
+
+    def _on_inotify_readable(self):
+        """Drain pending inotify events; their content is not needed"""
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            logger.debug(f"Error reading inotify events: {e}")
+        self._changed.set()
+
+    async def _wait_inotify(self):
+        """Wait for a burst of inotify events to settle"""
+        await self._changed.wait()
+        while True:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.debounce)
+            except asyncio.TimeoutError:
+                return
+
+    async def _wait_poll(self, last: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+        """Poll until the tree changed and then stayed unchanged for the debounce time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._running:
+                return last
+            current = await loop.run_in_executor(None, self._fingerprint)
+            if current != last:
+                break
+        while True:
+            await asyncio.sleep(self.debounce)
+            settled = await loop.run_in_executor(None, self._fingerprint)
+            if settled == current:
+                return current
+            current = settled
+
+    async def run(self, callback: Callable[[], Awaitable[None]]):
+        """
+        Watch until stop() is called
+
+        Args:
+            callback: Coroutine function called after each burst of changes
+        """
+        loop = asyncio.get_running_loop()
+        self._running = True
+        self._changed = asyncio.Event()
+
+        if self._start_inotify():
+            self.mode = 'inotify'
+            loop.add_reader(self._fd, self._on_inotify_readable)
+        else:
+            self.mode = 'poll'
+            fingerprint = self._fingerprint()
+        logger.info(f"👀 Watching custom EEP profiles in {self.path} ({self.mode})")
+
+        try:
+            while self._running:
+                if self.mode == 'inotify':
+                    await self._wait_inotify()
+                else:
+                    fingerprint = await self._wait_poll(fingerprint)
+                if not self._running:
+                    break
+
+                self.reloads += 1
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error(f"Error reloading custom EEP profiles: {e}", exc_info=True)
+
+                if self.mode == 'inotify':
+                    self._add_watches()  # Pick up new subdirectories
+        finally:
+            if self._fd is not None:
+                loop.remove_reader(self._fd)
+                os.close(self._fd)
+                self._fd = None
+
+    def stop(self):
+        """Stop watching"""
+        self._running = False
+        if self._changed is not None:
+            self._changed.set()
+
+    def get_stats(self) -> dict:
+        """
+        Get watcher statistics
+
+        Returns:
+            Dictionary with watch mode and number of reloads
+        """
+        return {
+            'path': str(self.path),
+            'mode': self.mode,
+            'reloads': self.reloads
+        }
@@ -5,6 +5,7 @@ import asyncio
 import logging
 import os
 import sys
+import time
 from datetime import datetime
 
 from core.serial_handler import SerialHandler
@@ -14,8 +15,17 @@ from core.device_manager import DeviceManager
 from core.state_persistence import StatePersistence
 from core.command_translator import CommandTranslator
 from core.command_tracker import CommandTracker
+from core.telegram_dedup import TelegramDeduplicator
+from core.state_coalescer import StateCoalescer
+from core.state_filter import StateFilter
+from core.discovery_cache import DiscoveryCache, discovery_digest
+from core.availability import AvailabilityTracker
+from core.gateway_pool import GatewayPool
+from core.capture import CaptureWriter, CaptureReplay
+from core.telegram_trace import TelegramTrace
 from eep.loader import EEPLoader
 from eep.parser import EEPParser
+from eep.profile_watcher import ProfileWatcher
 from service_state import service_state
 import uvicorn
 # Import web app after service_state to ensure proper initialization
@@ -40,6 +50,7 @@ class EnOceanMQTTService:
     
     def __init__(self):
         self.serial_handler = None
+        self.gateway_pool = GatewayPool()
         self.mqtt_handler = None
         self.device_manager = None
         self.state_persistence = None
@@ -47,16 +58,42 @@ class EnOceanMQTTService:
         self.eep_parser = None
         self.command_translator = None
         self.command_tracker = None
+        self.telegram_dedup = None
+        self.state_coalescer = None
+        self.state_filter = None
+        self.discovery_cache = None
+        self.availability = None
+        self.capture_writer = None
+        self.telegram_trace = None
+        self._reported_unknown = set()
+        self.replay = None
+        self.profile_watcher = None
         self.running = False
         
         # Configuration from environment
         self.serial_port = os.getenv('SERIAL_PORT', '')
+        self.additional_serial_ports = [
+            port.strip() for port in os.getenv('ADDITIONAL_SERIAL_PORTS', '').split(',') if port.strip()
+        ]
+        self.serial_writer_thread = os.getenv('SERIAL_WRITER_THREAD', 'false').lower() == 'true'
         self.mqtt_host = os.getenv('MQTT_HOST', 'localhost')
         self.mqtt_port = int(os.getenv('MQTT_PORT', 1883))
         self.mqtt_user = os.getenv('MQTT_USER', '')
         self.mqtt_password = os.getenv('MQTT_PASSWORD', '')
         self.restore_state = os.getenv('RESTORE_STATE', 'true').lower() == 'true'
         self.restore_delay = int(os.getenv('RESTORE_DELAY', 5))
+        self.dedup_window_ms = int(os.getenv('DEDUP_WINDOW_MS', 100))
+        self.capture_file = os.getenv('CAPTURE_FILE', '')
+        self.replay_file = os.getenv('REPLAY_FILE', '')
+        self.replay_speed = float(os.getenv('REPLAY_SPEED', 1.0))
+        self.trace_size = int(os.getenv('TRACE_SIZE', 500))
+        self.profile_reload_interval = float(os.getenv('PROFILE_RELOAD_INTERVAL', 5))
+        self.publish_delay_ms = int(os.getenv('PUBLISH_DELAY_MS', 100))
+        self.publish_min_interval_ms = int(os.getenv('PUBLISH_MIN_INTERVAL_MS', 0))
+        self.publish_changes_only = os.getenv('PUBLISH_CHANGES_ONLY', 'true').lower() == 'true'
+        self.publish_heartbeat_minutes = int(os.getenv('PUBLISH_HEARTBEAT_MINUTES', 60))
+        self.discovery_mode = os.getenv('DISCOVERY_MODE', 'entity').lower()
+        self.availability_timeout_factor = float(os.getenv('AVAILABILITY_TIMEOUT_FACTOR', 3))
     
     async def initialize(self):
         """Initialize all components"""
@@ -69,11 +106,11 @@ class EnOceanMQTTService:
         self.eep_loader = EEPLoader('/app/eep/definitions')
         self.eep_parser = EEPParser()
         
-        if len(self.eep_loader.profiles) == 0:
+        if len(self.eep_loader.index) == 0:
             logger.error("No EEP profiles loaded! Check definitions directory.")
             return False
         
-        logger.info(f"✓ Loaded {len(self.eep_loader.profiles)} EEP profiles")
+        logger.info(f"✓ Indexed {len(self.eep_loader.index)} EEP profiles")
         
         # List some profiles
         profiles = self.eep_loader.list_profiles()
@@ -83,40 +120,65 @@ class EnOceanMQTTService:
         if len(profiles) > 5:
             logger.info(f"  ... and {len(profiles) - 5} more")
         
-        # Initialize serial port if configured
-        if self.serial_port:
-            logger.info(f"Opening serial port: {self.serial_port}")
-            self.serial_handler = SerialHandler(self.serial_port)
+        # Raw frame capture (shared by all gateways)
+        if self.capture_file:
+            try:
+                self.capture_writer = CaptureWriter(self.capture_file)
+            except OSError as e:
+                logger.error(f"Cannot open capture file {self.capture_file}: {e}")
+        
+        # Initialize serial ports (primary + additional gateways)
+        self.gateway_pool = GatewayPool()
+        serial_ports = [self.serial_port] if self.serial_port else []
+        serial_ports += [port for port in self.additional_serial_ports if port not in serial_ports]
+        
+        for port in serial_ports:
+            logger.info(f"Opening serial port: {port}")
+            gateway = SerialHandler(port, writer_thread=self.serial_writer_thread, capture=self.capture_writer)
             
-            if not self.serial_handler.open():
-                logger.error(f"Failed to open serial port: {self.serial_port}")
-                logger.warning("Continuing without serial port (web UI only mode)")
-                self.serial_handler = None
-            else:
-                logger.info("✓ Serial port opened successfully")
+            if not await gateway.open():
+                if not gateway.retries_connect:
+                    logger.error(f"Failed to open serial port: {port}")
+                    continue
+                # Network gateways often boot after Home Assistant - keep retrying in the background
+                logger.warning(f"Network gateway {port} not reachable yet, retrying in the background")
+                self.gateway_pool.add(gateway)
+                continue
+            
+            logger.info("✓ Serial port opened successfully")
+            self.gateway_pool.add(gateway)
+            
+            # Query gateway info
+            try:
+                base_id = await gateway.get_base_id()
+                if base_id:
+                    logger.info(f"✓ Gateway Base ID: {base_id}")
                 
-                # Query gateway info
-                try:
-                    base_id = await self.serial_handler.get_base_id()
-                    if base_id:
-                        logger.info(f"✓ Gateway Base ID: {base_id}")
-                    
-                    version_info = await self.serial_handler.get_version_info()
-                    if version_info:
-                        logger.info(f"✓ Gateway Version: {version_info['app_version']}")
-                        logger.info(f"  Chip ID: {version_info['chip_id']}")
-                        logger.info(f"  Description: {version_info['app_description']}")
-                except Exception as e:
-                    logger.error(f"Error querying gateway info: {e}")
-        else:
+                version_info = await gateway.get_version_info()
+                if version_info:
+                    logger.info(f"✓ Gateway Version: {version_info['app_version']}")
+                    logger.info(f"  Chip ID: {version_info['chip_id']}")
+                    logger.info(f"  Description: {version_info['app_description']}")
+            except Exception as e:
+                logger.error(f"Error querying gateway info: {e}")
+        
+        self.serial_handler = self.gateway_pool.primary
+        if not serial_ports:
             logger.warning("No serial port configured")
             logger.info("Running in web UI only mode")
+        elif not self.serial_handler:
+            logger.warning("Continuing without serial port (web UI only mode)")
+        elif len(self.gateway_pool) > 1:
+            logger.info(f"✓ {len(self.gateway_pool)} gateways active, primary: {self.serial_handler.port}")
         
         # Initialize device manager
         logger.info("Initializing device manager...")
         self.device_manager = DeviceManager()
         logger.info(f"✓ Loaded {len(self.device_manager.list_devices())} configured devices")
         
+        # Compile the profiles of configured devices now (stored in the profile cache for the next start)
+        self.eep_loader.preload(device.get('eep') for device in self.device_manager.list_devices())
+        
         # Initialize state persistence
         logger.info("Initializing state persistence...")
         self.state_persistence = StatePersistence()
@@ -138,6 +200,40 @@ class EnOceanMQTTService:
         self.command_tracker.start()
         logger.info("✓ Command tracker initialized")
         
+        # Initialize telegram trace (per-telegram details for /api/trace)
+        self.telegram_trace = TelegramTrace(self.trace_size)
+        
+        # Initialize duplicate telegram suppression
+        if self.dedup_window_ms > 0:
+            self.telegram_dedup = TelegramDeduplicator(self.dedup_window_ms / 1000.0)
+            logger.info(f"✓ Duplicate telegram suppression enabled ({self.dedup_window_ms} ms window)")
+        else:
+            logger.info("Duplicate telegram suppression disabled")
+        
+        # Initialize state publish coalescing
+        if self.publish_delay_ms > 0 or self.publish_min_interval_ms > 0:
+            self.state_coalescer = StateCoalescer(
+                self.publish_device_state,
+                self.publish_delay_ms / 1000.0,
+                self.publish_min_interval_ms / 1000.0
+            )
+            logger.info(f"✓ State publish coalescing enabled ({self.publish_delay_ms} ms delay, "
+                        f"{self.publish_min_interval_ms} ms minimum interval)")
+        else:
+            logger.info("State publish coalescing disabled")
+        
+        # Initialize availability tracking
+        self.availability = AvailabilityTracker(self.availability_timeout_factor)
+        if self.availability_timeout_factor > 0:
+            logger.info(f"✓ Devices are marked offline after {self.availability_timeout_factor:g} missed telegram intervals")
+        else:
+            logger.info("Offline detection disabled")
+        
+        # Initialize change-only state publishing
+        if self.publish_changes_only:
+            self.state_filter = StateFilter(self.publish_heartbeat_minutes * 60.0)
+            logger.info(f"✓ Change-only state publishing enabled (heartbeat: {self.publish_heartbeat_minutes} min)")
+        
         # Initialize MQTT
         logger.info(f"Connecting to MQTT broker: {self.mqtt_host}:{self.mqtt_port}")
         if self.mqtt_user:
@@ -149,6 +245,7 @@ class EnOceanMQTTService:
             self.mqtt_user,
             self.mqtt_password
         )
+        self.discovery_cache = DiscoveryCache(f"{self.mqtt_host}:{self.mqtt_port}")
         
         if self.mqtt_handler.connect():
             # Wait a moment for connection
@@ -160,15 +257,22 @@ class EnOceanMQTTService:
                 # Set the event loop for MQTT command callbacks
                 self.mqtt_handler.event_loop = asyncio.get_event_loop()
                 
+                # Republish discovery when Home Assistant restarts or the broker lost our session
+                self.mqtt_handler.discovery_lost_callback = self.republish_discovery
+                
                 if self.mqtt_handler.subscribe_commands(self.handle_command):
                     logger.info("✓ Subscribed to MQTT command topics")
                 else:
                     logger.warning("Failed to subscribe to MQTT command topics")
                 
-                # Publish discovery for all configured devices
+                # Publish discovery for all configured devices (unchanged configs are skipped)
+                logger.info(f"Discovery mode: {'one config per device' if self.discovery_mode == 'device' else 'one config per entity'}")
+                published, skipped = self.discovery_cache.published, self.discovery_cache.skipped
                 for device in self.device_manager.list_devices():
                     if device.get('enabled'):
                         await self.publish_device_discovery(device)
+                logger.info(f"✓ Discovery: {self.discovery_cache.published - published} devices published, "
+                            f"{self.discovery_cache.skipped - skipped} unchanged")
             else:
                 logger.warning("MQTT connection pending...")
         else:
@@ -206,7 +310,7 @@ class EnOceanMQTTService:
         logger.warning(f"   ⚠️  Command timeout - device may not have responded")
     
     async def publish_device_discovery(self, device: dict):
-        """Publish MQTT discovery for a device"""
+        """Publish MQTT discovery for a device (skipped if the configs are unchanged since the last publish)"""
         try:
             # Get EEP profile
             profile = self.eep_loader.get_profile(device['eep'])
@@ -214,23 +318,17 @@ class EnOceanMQTTService:
                 logger.warning(f"EEP profile {device['eep']} not found for device {device['id']}")
                 return
             
+            if not (self.mqtt_handler and self.mqtt_handler.connected):
+                logger.warning(f"Not connected to MQTT broker, discovery for {device['id']} not published")
+                return
+            
             # Check if device is controllable
             is_controllable = self.command_translator.is_controllable(device['eep'])
-            
-            # IMPORTANT: Clear old retained state messages BEFORE publishing discovery
-            # This prevents Home Assistant from seeing stale state before config
             device_id = device['id']
-            if self.mqtt_handler and self.mqtt_handler.connected:
-                # Clear old state topic (publish empty retained message)
-                self.mqtt_handler.client.publish(f"enocean/{device_id}/state", "", qos=1, retain=True)
-                self.mqtt_handler.client.publish(f"enocean/{device_id}/availability", "", qos=1, retain=True)
-                logger.debug(f"Cleared old retained messages for {device_id}")
-                # Small delay to ensure order
-                await asyncio.sleep(0.1)
-            
-            # Publish discovery for each entity
-            entities = profile.get_entities()
-            for entity in entities:
+            
+            # Determine controllability of each entity
+            entities = []
+            for entity in profile.get_entities():
                 # Determine if this specific entity is controllable
                 # For now, mark all entities of controllable devices as controllable
                 # In future, could be more granular (e.g., only switches, not sensors)
@@ -241,10 +339,50 @@ class EnOceanMQTTService:
                 if component in ['sensor', 'binary_sensor']:
                     entity_controllable = False
                 
-                self.mqtt_handler.publish_discovery(device, entity, entity_controllable)
+                entities.append((entity, entity_controllable))
+            
+            # Render discovery: one config per device (HA 2024.11+) or one per entity
+            if self.discovery_mode == 'device' and entities:
+                messages = [self.mqtt_handler.build_device_discovery(device, entities)]
+            else:
+                messages = [self.mqtt_handler.build_discovery(device, entity, controllable)
+                            for entity, controllable in entities]
+            
+            # Retained configs from the last publish are still on the broker
+            digest = discovery_digest(messages)
+            if self.discovery_cache and self.discovery_cache.is_current(device_id, digest):
+                self.discovery_cache.skip()
+                logger.debug(f"Discovery for {device_id} unchanged, not republished")
+                return
+            
+            # IMPORTANT: Clear old retained state messages BEFORE publishing discovery
+            # This prevents Home Assistant from seeing stale state before config.
+            # Messages with the same QoS on one connection are delivered in order,
+            # so clear -> configs -> availability needs no delays in between.
+            self.mqtt_handler.client.publish(f"enocean/{device_id}/state", "", qos=1, retain=True)
+            self.mqtt_handler.client.publish(f"enocean/{device_id}/availability", "", qos=1, retain=True)
+            logger.debug(f"Cleared old retained messages for {device_id}")
+            # The next state must be published again even if unchanged
+            if self.state_filter:
+                self.state_filter.forget(device_id)
+            
+            # Remove configs of entities the profile no longer has, or of the other discovery mode
+            # (before the new configs, so HA never sees an entity configured twice)
+            topics = [topic for topic, _ in messages]
+            previous = self.discovery_cache.get_topics(device_id) if self.discovery_cache else []
+            if not previous:
+                previous = self.mqtt_handler.discovery_topics(device, [entity for entity, _ in entities])
+            for topic in sorted(set(previous) - set(topics)):
+                self.mqtt_handler.publish_config(topic, "")
+            
+            published = all([self.mqtt_handler.publish_config(topic, payload) for topic, payload in messages])
             
-            # Publish initial availability
-            self.mqtt_handler.publish_availability(device['id'], True)
+            # Publish availability (devices not heard yet are online until their expected telegram is missed)
+            self.availability.restore(device_id, profile.expected_interval)
+            self.mqtt_handler.publish_availability(device_id, self.availability.is_online(device_id))
+            
+            if self.discovery_cache and published:
+                self.discovery_cache.store(device_id, digest, topics)
             
             if is_controllable:
                 logger.info(f"Published discovery for device {device['id']} ({device['name']}) - CONTROLLABLE ✅")
@@ -254,31 +392,134 @@ class EnOceanMQTTService:
         except Exception as e:
             logger.error(f"Error publishing device discovery: {e}")
     
-    async def process_telegram(self, packet: ESP3Packet):
-        """Process received EnOcean telegram"""
+    async def republish_discovery(self, reason: str):
+        """
+        Republish discovery and last known states of all devices
+        
+        Args:
+            reason: Why the retained configs may be gone (logged)
+        """
+        logger.info(f"🔁 {reason}, republishing discovery")
+        if self.discovery_cache:
+            self.discovery_cache.invalidate()
+        for device in self.device_manager.list_devices():
+            if not device.get('enabled'):
+                continue
+            await self.publish_device_discovery(device)
+            # Discovery clears the retained state, restore the last known one
+            state = self.state_persistence.get_state(device['id']) if self.state_persistence else None
+            if state:
+                self.publish_device_state(device['id'], state)
+    
+    def get_deadbands(self, device_id: str) -> dict:
+        """
+        Get publish deadbands of a device (device settings override the profile's)
+        
+        Args:
+            device_id: Device ID
+            
+        Returns:
+            Deadband specification per field
+        """
+        device = self.device_manager.get_device(device_id) if self.device_manager else None
+        if not device:
+            return {}
+        profile = self.eep_loader.get_profile(device['eep'])
+        deadbands = dict(profile.deadbands) if profile else {}
+        deadbands.update(device.get('deadbands') or {})
+        return deadbands
+    
+    def publish_device_state(self, device_id: str, state: dict):
+        """
+        Publish retained state of a device
+        
+        Args:
+            device_id: Device ID
+            state: State data to publish
+        """
+        if not (self.mqtt_handler and self.mqtt_handler.connected):
+            return
+        if self.state_filter and not self.state_filter.should_publish(device_id, state, self.get_deadbands(device_id)):
+            return
+        self.mqtt_handler.publish_state(device_id, state, retain=True)
+    
+    def on_device_offline(self, device_id: str, silent: float):
+        """
+        Callback when a device missed its expected telegrams
+        
+        Args:
+            device_id: Device ID
+            silent: Seconds since the last telegram
+        """
+        logger.info(f"📴 Device {device_id} offline (no telegram for {silent / 60:.0f} min)")
+        if self.mqtt_handler and self.mqtt_handler.connected:
+            self.mqtt_handler.publish_availability(device_id, False)
+    
+    async def handle_packet(self, packet: ESP3Packet, gateway: SerialHandler = None):
+        """
+        Entry point for received radio telegrams - drops repeated copies before processing
+        
+        Args:
+            packet: Received packet
+            gateway: Gateway that received the packet (None for replayed captures)
+        """
+        started = time.perf_counter()
+        port = gateway.port if gateway else None
+        record = self.telegram_trace.start(packet, port)
+        
+        if gateway is not None and packet.sender_id:
+            # Every copy counts for routing, including the ones dedup drops below
+            self.gateway_pool.record_link(packet.sender_id, gateway, packet.rssi)
+        
+        if self.telegram_dedup and not self.telegram_dedup.check(packet, gateway=port, record=record):
+            record.outcome = 'duplicate'
+            if packet.rssi is not None and self.telegram_dedup.best_rssi(packet) == packet.rssi \
+                    and self.telegram_dedup.best_gateway(packet) == port:
+                self.on_stronger_copy(packet)
+        else:
+            await self.process_telegram(packet, record, gateway)
+        
+        self.telegram_trace.finish(record, started)
+        self.telegram_trace.log_summary_if_due()
+    
+    def on_stronger_copy(self, packet: ESP3Packet):
+        """
+        Callback when a repeated copy of an already processed telegram has the best RSSI so far
+        
+        Args:
+            packet: Received copy
+        """
+        device = self.device_manager.get_device(packet.sender_id) if self.device_manager else None
+        if not device or not device.get('enabled'):
+            return
+        self.device_manager.update_last_seen(packet.sender_id, packet.rssi)
+        # Published with the telegram's state if it is still waiting in the coalescer
+        if self.state_coalescer:
+            self.state_coalescer.amend(packet.sender_id, {'rssi': packet.rssi})
+    
+    async def process_telegram(self, packet: ESP3Packet, record, gateway: SerialHandler = None):
+        """
+        Process received EnOcean telegram
+        
+        Per-telegram details go into the trace record (see /api/trace) instead of the log.
+        
+        Args:
+            packet: Received radio telegram
+            record: TraceRecord to fill with outcome and decode result
+            gateway: Gateway that received the packet (None for replayed captures)
+        """
         try:
             sender_id = packet.get_sender_id()
             rorg = packet.get_rorg()
             rssi = packet.get_rssi()
             
-            # Log raw data for debugging
-            data_hex = ' '.join(f'{b:02x}' for b in packet.data)
-            
-            logger.info("=" * 80)
-            logger.info(f"📡 TELEGRAM RECEIVED")
-            logger.info(f"   Sender ID: {sender_id}")
-            logger.info(f"   RORG: {hex(rorg) if rorg else 'N/A'}")
-            logger.info(f"   RSSI: {rssi} dBm")
-            logger.info(f"   Data: {data_hex}")
-            
-            # Sender ID is now correctly extracted by get_sender_id() in esp3_protocol.py
-            # No workaround needed!
-            
             # Check if device is already configured - if so, treat as data even if LRN=0
             device = self.device_manager.get_device(sender_id)
             
             # Check if it's a teach-in telegram (but not for already configured devices)
             if packet.is_teach_in() and not device:
+                record.outcome = 'teach_in'
+                data_hex = ' '.join(f'{b:02x}' for b in packet.data)
                 logger.warning("=" * 80)
                 logger.warning("🎓 TEACH-IN TELEGRAM DETECTED!")
                 logger.warning(f"   Device ID: {sender_id}")
@@ -401,8 +642,9 @@ class EnOceanMQTTService:
                                 
                                 # Create and send teach-in response
                                 response = ESP3Packet.create_teach_in_response(sender_id, func, type_val)
-                                if self.serial_handler:
-                                    await self.serial_handler.write_packet(response)
+                                send_gateway = self.gateway_pool.select(sender_id, existing_device.get('gateway'))
+                                if send_gateway:
+                                    await send_gateway.write_packet(response)
                                     logger.warning(f"   ✅ Teach-in response sent! Device should exit learn mode.")
                         except Exception as e:
                             logger.error(f"   ❌ Failed to send teach-in response: {e}")
@@ -418,12 +660,14 @@ class EnOceanMQTTService:
                     logger.warning(f"   Name: {device_name}")
                     logger.warning(f"   EEP: {detected_eep}")
                     
-                    # Add device
+                    # Add device, pinned to the gateway that heard the teach-in
+                    # (actuators only accept the base ID they were taught with)
                     success = self.device_manager.add_device(
                         sender_id,
                         device_name,
                         detected_eep,
-                        "EnOcean"
+                        "EnOcean",
+                        gateway.base_id if gateway else None
                     )
                     
                     if success:
@@ -447,8 +691,9 @@ class EnOceanMQTTService:
                                     
                                     # Create and send teach-in response
                                     response = ESP3Packet.create_teach_in_response(sender_id, func, type_val)
-                                    if self.serial_handler:
-                                        await self.serial_handler.write_packet(response)
+                                    send_gateway = self.gateway_pool.select(sender_id, device.get('gateway') if device else None)
+                                    if send_gateway:
+                                        await send_gateway.write_packet(response)
                                         logger.warning(f"   ✅ Teach-in response sent! Device should exit learn mode.")
                             except Exception as e:
                                 logger.error(f"   ❌ Failed to send teach-in response: {e}")
@@ -473,6 +718,12 @@ class EnOceanMQTTService:
             # Look up device
             device = self.device_manager.get_device(sender_id)
             if not device:
+                record.outcome = 'unknown_device'
+                # Full hint only on first sighting - neighbours' devices would flood the log otherwise
+                if sender_id in self._reported_unknown:
+                    return
+                self._reported_unknown.add(sender_id)
+                data_hex = ' '.join(f'{b:02x}' for b in packet.data)
                 logger.warning("⚠️  UNKNOWN DEVICE (not configured)")
                 logger.warning(f"   Device ID: {sender_id}")
                 logger.warning(f"   RORG: {hex(rorg)}")
@@ -499,15 +750,13 @@ class EnOceanMQTTService:
                 if len(matching_profiles) > 0:
                     logger.warning(f"      5. Choose from the {len(matching_profiles)} profiles listed above")
                 logger.warning("")
-                logger.info("=" * 80)
                 return
             
             if not device.get('enabled'):
-                logger.info(f"   ⏸️  Device {sender_id} is DISABLED")
-                logger.info("=" * 80)
+                record.outcome = 'disabled'
                 return
             
-            logger.info(f"   ✅ Known Device: {device['name']} ({device['eep']})")
+            record.eep = device['eep']
             
             # Update last seen
             self.device_manager.update_last_seen(sender_id, rssi)
@@ -515,20 +764,27 @@ class EnOceanMQTTService:
             # Get EEP profile
             profile = self.eep_loader.get_profile(device['eep'])
             if not profile:
+                record.outcome = 'no_profile'
                 logger.warning(f"  EEP profile {device['eep']} not found")
                 return
             
             # Parse telegram
-            parsed_data = self.eep_parser.parse_telegram_with_full_data(packet.data, profile)
+            decode_started = time.perf_counter()
+            # Payload view sliced once by RORG when the packet was parsed
+            payload = packet.get_data_bytes()
+            decoded = self.eep_parser.parse_telegram(payload, profile, packet.status) if payload else {}
+            record.decode_ms = round((time.perf_counter() - decode_started) * 1000, 3)
 
-            if parsed_data:
+            if decoded:
+                record.outcome = 'decoded'
+                record.decoded = decoded
+                # Decoded values are shared with the decode memo - work on a copy
+                parsed_data = dict(decoded)
                 # Add RSSI and timestamp to parsed data
                 from datetime import datetime, timezone
                 parsed_data['rssi'] = rssi
                 parsed_data['last_seen'] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
 
-                logger.info(f"  Parsed data: {parsed_data}")
-                
                 # Check for command confirmation
                 if self.command_tracker:
                     await self.command_tracker.check_telegram(sender_id, parsed_data)
@@ -549,16 +805,22 @@ class EnOceanMQTTService:
                         device['discovery_published'] = True
                         self.device_manager.devices[sender_id] = device
                     
+                    # Availability only changes when the device was offline (or not seen since start)
+                    if self.availability.seen(sender_id, profile.expected_interval):
+                        self.mqtt_handler.publish_availability(sender_id, True)
+                    
                     # Now publish state data (discovery is guaranteed to exist)
-                    self.mqtt_handler.publish_state(sender_id, parsed_data, retain=True)
-                    self.mqtt_handler.publish_availability(sender_id, True)
-                    logger.info(f"  → Published to MQTT (retained)")
+                    if self.state_coalescer:
+                        self.state_coalescer.submit(sender_id, parsed_data)
+                    else:
+                        self.publish_device_state(sender_id, parsed_data)
                 else:
-                    logger.warning("  MQTT not connected, skipping publish")
+                    record.outcome = 'mqtt_offline'
             else:
-                logger.warning("  Failed to parse telegram data")
+                record.outcome = 'parse_failed'
             
         except Exception as e:
+            record.outcome = 'error'
             logger.error(f"Error processing telegram: {e}", exc_info=True)
     
     async def handle_command(self, device_id: str, entity: str, command: dict):
@@ -577,11 +839,6 @@ class EnOceanMQTTService:
             logger.info(f"   Entity: {entity}")
             logger.info(f"   Command: {command}")
             
-            # Check if serial handler available
-            if not self.serial_handler:
-                logger.error("   ❌ Serial handler not available, cannot send commands")
-                return
-            
             # Get device
             device = self.device_manager.get_device(device_id)
             if not device:
@@ -594,6 +851,13 @@ class EnOceanMQTTService:
             
             logger.info(f"   ✅ Device: {device['name']} ({device['eep']})")
             
+            # Route through the gateway with the best recent link among the ones
+            # sending with the base ID the device was taught with
+            gateway = self.gateway_pool.select(device_id, device.get('gateway'))
+            if not gateway:
+                logger.error("   ❌ Serial handler not available, cannot send commands")
+                return
+            
             # Translate command to EnOcean telegram
             result = self.command_translator.translate_command(device, entity, command)
             if not result:
@@ -607,12 +871,12 @@ class EnOceanMQTTService:
                 # RPS button press
                 button_code = rorg_or_button
                 logger.info(f"   📤 Sending RPS command: button={hex(button_code)}")
-                success = await self.serial_handler.send_rps_command(device_id, button_code)
+                success = await gateway.send_rps_command(device_id, button_code)
             elif command_type == 'telegram':
                 # Generic telegram
                 rorg = rorg_or_button
                 logger.info(f"   📤 Sending telegram: RORG={hex(rorg)}, data={data_bytes.hex()}")
-                success = await self.serial_handler.send_telegram(device_id, rorg, data_bytes)
+                success = await gateway.send_telegram(device_id, rorg, data_bytes)
             else:
                 logger.error(f"   ❌ Unknown command type: {command_type}")
                 return
@@ -658,7 +922,13 @@ class EnOceanMQTTService:
                         logger.info(f"   🎨 RGB color: {rgb}")
                     
                     if state_update:
+                        # A coalesced state still pending holds pre-command values and would overwrite this one
+                        if self.state_coalescer:
+                            self.state_coalescer.discard(device_id)
                         self.mqtt_handler.publish_state(device_id, state_update, retain=True)
+                        # The device's confirmation must be published even if it equals the state before the command
+                        if self.state_filter:
+                            self.state_filter.forget(device_id)
                         logger.info(f"   ✅ Published optimistic state: {state_update}")
             else:
                 logger.error(f"   ❌ Failed to send command")
@@ -673,10 +943,34 @@ class EnOceanMQTTService:
         if self.serial_handler:
             logger.info("Listening for EnOcean telegrams...")
             try:
-                await self.serial_handler.start_reading(self.process_telegram)
+                await asyncio.gather(*self.gateway_pool.start_reading(self.handle_packet))
             except Exception as e:
                 logger.error(f"Error in serial reader: {e}")
     
+    async def run_replay(self):
+        """Run capture replay task"""
+        self.replay = CaptureReplay(self.replay_file, self.replay_speed)
+        try:
+            await self.replay.run(self.handle_packet)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error replaying capture {self.replay_file}: {e}")
+    
+    async def reload_custom_profiles(self):
+        """Reload changed EEP profiles and republish discovery for the devices using them"""
+        loop = asyncio.get_running_loop()
+        changed = await loop.run_in_executor(None, self.eep_loader.reload_custom_profiles)
+        if not changed:
+            return
+        
+        devices = [
+            device for device in self.device_manager.list_devices()
+            if device.get('enabled') and device.get('eep') in changed
+        ]
+        if devices and self.mqtt_handler and self.mqtt_handler.connected:
+            for device in devices:
+                await self.publish_device_discovery(device)
+            logger.info(f"✓ Republished discovery for {len(devices)} device(s) using changed profiles")
+    
     async def run_web_server(self):
         """Run web server task"""
         logger.info("Starting web UI on port 8099...")
@@ -704,7 +998,7 @@ class EnOceanMQTTService:
         logger.info("✓ Service registered with state manager")
         
         # Store gateway info if available
-        if self.serial_handler:
+        if self.serial_handler and self.serial_handler.is_open():
             try:
                 base_id = await self.serial_handler.get_base_id()
                 version_info = await self.serial_handler.get_version_info()
@@ -736,9 +1030,11 @@ class EnOceanMQTTService:
                 device = self.device_manager.get_device(device_id)
                 if device and device.get('enabled') and state_data:
                     try:
-                        # Republish last known state
-                        self.mqtt_handler.publish_state(device_id, state_data, retain=True)
-                        self.mqtt_handler.publish_availability(device_id, True)
+                        # Republish last known state (also the reference for change-only publishing)
+                        self.publish_device_state(device_id, state_data)
+                        profile = self.eep_loader.get_profile(device['eep'])
+                        self.availability.restore(device_id, profile.expected_interval if profile else None)
+                        self.mqtt_handler.publish_availability(device_id, self.availability.is_online(device_id))
                         logger.info(f"  ✓ Restored state for {device['name']} ({device_id})")
                         restored_count += 1
                     except Exception as e:
@@ -763,6 +1059,16 @@ class EnOceanMQTTService:
         if self.serial_handler:
             tasks.append(asyncio.create_task(self.run_serial_reader()))
         
+        if self.replay_file:
+            tasks.append(asyncio.create_task(self.run_replay()))
+        
+        if self.availability_timeout_factor > 0:
+            tasks.append(asyncio.create_task(self.availability.run(self.on_device_offline)))
+        
+        if self.profile_reload_interval > 0:
+            self.profile_watcher = ProfileWatcher(str(self.eep_loader.custom_path), self.profile_reload_interval)
+            tasks.append(asyncio.create_task(self.profile_watcher.run(self.reload_custom_profiles)))
+        
         try:
             await asyncio.gather(*tasks)
         except KeyboardInterrupt:
@@ -780,9 +1086,19 @@ class EnOceanMQTTService:
         if self.command_tracker:
             self.command_tracker.stop()
         
-        if self.serial_handler:
-            self.serial_handler.stop_reading()
-            self.serial_handler.close()
+        if self.state_coalescer:
+            self.state_coalescer.flush_all()
+        
+        if self.availability:
+            self.availability.stop()
+        
+        self.gateway_pool.close()
+        
+        if self.capture_writer:
+            self.capture_writer.close()
+        
+        if self.profile_watcher:
+            self.profile_watcher.stop()
         
         logger.info("Shutdown complete")
 
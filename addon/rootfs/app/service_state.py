@@ -46,10 +46,23 @@ class ServiceState:
         
         return {
             "status": "running" if self.service.running else "stopped",
-            "eep_profiles": len(self.service.eep_loader.profiles) if self.service.eep_loader else 0,
+            "eep_profiles": len(self.service.eep_loader.index) if self.service.eep_loader else 0,
             "devices": len(self.service.device_manager.list_devices()) if self.service.device_manager else 0,
             "gateway_connected": self.service.serial_handler is not None and self.service.serial_handler.is_open if self.service.serial_handler else False,
-            "mqtt_connected": self.service.mqtt_handler.connected if self.service.mqtt_handler else False
+            "mqtt_connected": self.service.mqtt_handler.connected if self.service.mqtt_handler else False,
+            "serial_stats": self.service.serial_handler.get_stats() if self.service.serial_handler else {},
+            "dedup_stats": self.service.telegram_dedup.get_stats() if self.service.telegram_dedup else {},
+            "publish_stats": self.service.state_coalescer.get_stats() if self.service.state_coalescer else {},
+            "change_filter_stats": self.service.state_filter.get_stats() if self.service.state_filter else {},
+            "discovery_stats": self.service.discovery_cache.get_stats() if self.service.discovery_cache else {},
+            "availability_stats": self.service.availability.get_stats() if self.service.availability else {},
+            "gateways": self.service.gateway_pool.get_stats(
+                {device['id']: device.get('gateway') for device in self.service.device_manager.list_devices()}
+                if self.service.device_manager else None),
+            "replay_stats": self.service.replay.get_stats() if self.service.replay else {},
+            "trace_stats": self.service.telegram_trace.get_stats() if self.service.telegram_trace else {},
+            "eep_stats": self.service.eep_loader.get_stats() if self.service.eep_loader else {},
+            "profile_watcher": self.service.profile_watcher.get_stats() if self.service.profile_watcher else {}
         }
     
     def get_gateway_info(self) -> Dict[str, Any]:
@@ -84,6 +97,12 @@ class ServiceState:
             return self.service.state_persistence
         return None
     
+    def get_telegram_trace(self):
+        """Get telegram trace instance"""
+        if self.service and self.service.telegram_trace:
+            return self.service.telegram_trace
+        return None
+    
     def set_detected_profiles(self, device_id: str, profile_eeps: list):
         """Cache detected profiles for a device"""
         self.detected_profiles[device_id] = profile_eeps
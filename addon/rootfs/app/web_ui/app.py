@@ -8,7 +8,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Optional
 import sys
 sys.path.append('/app')
 
@@ -38,6 +38,8 @@ class DeviceUpdate(BaseModel):
     eep: Optional[str] = None
     manufacturer: Optional[str] = None
     enabled: Optional[bool] = None
+    deadbands: Optional[Dict[str, Any]] = None
+    gateway: Optional[str] = None
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -104,6 +106,19 @@ async def get_gateway_info():
         }
 
 
+@app.get("/api/trace")
+async def get_trace(limit: int = 100, sender_id: Optional[str] = None):
+    """Get the most recent received telegrams (newest first)"""
+    trace = service_state.get_telegram_trace()
+    if not trace:
+        raise HTTPException(status_code=503, detail="Telegram trace not available")
+
+    return {
+        "stats": trace.get_stats(),
+        "records": trace.get_records(max(1, min(limit, 1000)), sender_id.lower() if sender_id else None)
+    }
+
+
 @app.get("/api/eep-profiles")
 async def get_eep_profiles():
     """Get list of available EEP profiles"""
@@ -268,6 +283,15 @@ async def update_device(device_id: str, update: DeviceUpdate):
         device['manufacturer'] = update.manufacturer
     if update.enabled is not None:
         device_manager.enable_device(device_id, update.enabled)
+    if update.deadbands is not None:
+        # Per-field publish deadbands, e.g. {"TMP": 0.2, "HUM": "2%"} (empty to use the profile's)
+        device['deadbands'] = update.deadbands
+    if update.gateway is not None:
+        # Base ID of the gateway the device was taught with (empty for the primary gateway)
+        if update.gateway:
+            device['gateway'] = device_manager.normalize_device_id(update.gateway)
+        else:
+            device.pop('gateway', None)
     
     device_manager.devices[device_id] = device
     device_manager.save_devices()
@@ -295,6 +319,16 @@ async def delete_device(device_id: str):
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     
+    # Drop a state publish still waiting in the coalescer, it would recreate the retained topic
+    if service_state.service and service_state.service.state_coalescer:
+        service_state.service.state_coalescer.discard(device_id)
+    if service_state.service and service_state.service.state_filter:
+        service_state.service.state_filter.forget(device_id)
+    if service_state.service and service_state.service.discovery_cache:
+        service_state.service.discovery_cache.remove(device_id)
+    if service_state.service and service_state.service.availability:
+        service_state.service.availability.forget(device_id)
+    
     # Remove from MQTT/HA
     mqtt_handler = service_state.get_mqtt_handler()
     eep_loader = service_state.get_eep_loader()
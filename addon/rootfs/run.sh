@@ -2,11 +2,39 @@
 
 # Get configuration
 SERIAL_PORT=$(bashio::config 'serial_port')
+ADDITIONAL_SERIAL_PORTS=$(bashio::config 'additional_serial_ports')
 LOG_LEVEL=$(bashio::config 'log_level')
+SERIAL_WRITER_THREAD=$(bashio::config 'serial_writer_thread')
+DEDUP_WINDOW_MS=$(bashio::config 'dedup_window_ms')
+CAPTURE_FILE=$(bashio::config 'capture_file')
+REPLAY_FILE=$(bashio::config 'replay_file')
+REPLAY_SPEED=$(bashio::config 'replay_speed')
+TRACE_SIZE=$(bashio::config 'trace_size')
+PROFILE_RELOAD_INTERVAL=$(bashio::config 'profile_reload_interval')
+PUBLISH_DELAY_MS=$(bashio::config 'publish_delay_ms')
+PUBLISH_MIN_INTERVAL_MS=$(bashio::config 'publish_min_interval_ms')
+PUBLISH_CHANGES_ONLY=$(bashio::config 'publish_changes_only')
+PUBLISH_HEARTBEAT_MINUTES=$(bashio::config 'publish_heartbeat_minutes')
+DISCOVERY_MODE=$(bashio::config 'discovery_mode')
+AVAILABILITY_TIMEOUT_FACTOR=$(bashio::config 'availability_timeout_factor')
 
 # Export environment variables
 export SERIAL_PORT="${SERIAL_PORT}"
+export ADDITIONAL_SERIAL_PORTS="${ADDITIONAL_SERIAL_PORTS}"
 export LOG_LEVEL="${LOG_LEVEL}"
+export SERIAL_WRITER_THREAD="${SERIAL_WRITER_THREAD}"
+export DEDUP_WINDOW_MS="${DEDUP_WINDOW_MS}"
+export CAPTURE_FILE="${CAPTURE_FILE}"
+export REPLAY_FILE="${REPLAY_FILE}"
+export REPLAY_SPEED="${REPLAY_SPEED}"
+export TRACE_SIZE="${TRACE_SIZE}"
+export PROFILE_RELOAD_INTERVAL="${PROFILE_RELOAD_INTERVAL}"
+export PUBLISH_DELAY_MS="${PUBLISH_DELAY_MS}"
+export PUBLISH_MIN_INTERVAL_MS="${PUBLISH_MIN_INTERVAL_MS}"
+export PUBLISH_CHANGES_ONLY="${PUBLISH_CHANGES_ONLY}"
+export PUBLISH_HEARTBEAT_MINUTES="${PUBLISH_HEARTBEAT_MINUTES}"
+export DISCOVERY_MODE="${DISCOVERY_MODE}"
+export AVAILABILITY_TIMEOUT_FACTOR="${AVAILABILITY_TIMEOUT_FACTOR}"
 export MQTT_HOST=$(bashio::services mqtt "host")
 export MQTT_PORT=$(bashio::services mqtt "port")
 export MQTT_USER=$(bashio::services mqtt "username")
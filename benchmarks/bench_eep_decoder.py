@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+EEP decoder benchmark
+Compares the compiled decoders (case decision table, shift/mask extraction,
+compiled formulas) against a reference that evaluates case conditions and
+walks the JSON-logic formulas per telegram, across all bundled EEP profiles,
+and checks that both produce identical output. A second run measures the
+decode memo on sensors repeating a few distinct payloads.
+
+Usage: python3 benchmarks/bench_eep_decoder.py [telegrams per profile]
+"""
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / 'addon' / 'rootfs' / 'app'
+sys.path.insert(0, str(APP_DIR))
+
+from eep.loader import EEPLoader  # noqa: E402
+from eep.parser import EEPParser  # noqa: E402
+from eep import formula  # noqa: E402
+from eep.decoder import _parse_tests  # noqa: E402
+
+
+def legacy_extract_bits(data: bytes, bitoffs: int, bitsize: int) -> int:
+    """Previous bit-string extraction"""
+    bit_string = ''.join(format(byte, '08b') for byte in data)
+    extracted_bits = bit_string[bitoffs:bitoffs + bitsize]
+    if extracted_bits:
+        return int(extracted_bits, 2)
+    return 0
+
+
+def legacy_parse(data_bytes: bytes, datafields: list, result: dict) -> dict:
+    """Per-telegram interpretation of the datafield list (reference semantics)"""
+    try:
+        for datafield in datafields:
+            shortcut = datafield.get('shortcut')
+            bitoffs = datafield.get('bitoffs')
+            bitsize = datafield.get('bitsize')
+            if shortcut is None or bitoffs is None or bitsize is None:
+                continue
+            try:
+                bitoffs = int(bitoffs)
+                bitsize = int(bitsize)
+            except (ValueError, TypeError):
+                continue
+            raw_value = legacy_extract_bits(data_bytes, bitoffs, bitsize)
+            second = datafield.get('secondArgument')
+            value2 = None
+            if second:
+                value2 = legacy_extract_bits(data_bytes, int(second['bitoffs']), int(second['bitsize']))
+            if isinstance(datafield.get('condition'), dict) and not formula.evaluate(raw_value, datafield['condition'], value2):
+                continue
+            if datafield.get('invert'):
+                raw_value = 1 - raw_value
+            if 'value' in datafield:
+                value = formula.evaluate(raw_value, datafield['value'], value2)
+            else:
+                value = raw_value
+            if 'decimals' in datafield and isinstance(value, (int, float)):
+                value = round(value, datafield['decimals'])
+            result[shortcut] = value
+    except Exception:
+        pass
+    return result
+
+
+def legacy_case_matches(condition, data_bytes: bytes, status: int) -> bool:
+    """Evaluate a case condition by walking it per telegram"""
+    if condition is None:
+        return True
+    tests = _parse_tests(condition)
+    if tests is None:
+        return False
+    for is_status, bitoffs, bitsize, expected in tests:
+        value = legacy_extract_bits(bytes([status]) if is_status else data_bytes, bitoffs, bitsize)
+        if isinstance(expected, dict):
+            if not formula.evaluate(value, expected):
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+def legacy_decode(data_bytes: bytes, profile, status: int) -> dict:
+    """Reference decoding: select receive cases and interpret their datafields"""
+    result = {}
+    for case in profile.case:
+        if not case.get('send') and legacy_case_matches(case.get('condition'), data_bytes, status):
+            legacy_parse(data_bytes, case.get('datafield', []), result)
+    return result
+
+
+def main():
+    per_profile = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    logging.basicConfig(level=logging.WARNING)
+
+    loader = EEPLoader(str(APP_DIR / 'eep' / 'definitions'), custom_path='/nonexistent', cache_file=None)
+    parser = EEPParser()
+    profiles = [loader.get_profile(eep) for eep in sorted(loader.index)]
+
+    rng = random.Random(42)
+    payloads = [bytes(rng.getrandbits(8) for _ in range(4)) for _ in range(per_profile)]
+    statuses = [rng.getrandbits(8) for _ in range(per_profile)]
+
+    # Equivalence check: every profile, every payload, plus short/long payloads
+    mismatches = 0
+    for profile in profiles:
+        for payload, status in zip(payloads[:200] + [b'', b'\x12', b'\x12\x34\x56\x78\x9a\xbc'], statuses):
+            if parser.parse_telegram(payload, profile, status) != legacy_decode(payload, profile, status):
+                mismatches += 1
+                print(f"Mismatch in {profile.eep} for payload {payload.hex()}")
+    print(f"Equivalence: {len(profiles)} profiles, {mismatches} mismatches")
+
+    def run(decode):
+        started = time.perf_counter()
+        for profile in profiles:
+            for payload, status in zip(payloads, statuses):
+                decode(payload, profile, status)
+        return time.perf_counter() - started
+
+    total = len(profiles) * len(payloads)
+    legacy = run(legacy_decode)
+    compiled = run(lambda payload, profile, status: profile.decoder.decode(payload, status))
+
+    print(f"Decoding {total} telegrams across {len(profiles)} profiles:")
+    print(f"  interpreted:      {legacy:.3f}s ({total / legacy:,.0f} telegrams/s)")
+    print(f"  compiled decoder: {compiled:.3f}s ({total / compiled:,.0f} telegrams/s)")
+    print(f"  speedup: {legacy / compiled:.1f}x")
+
+    # Repeating sensors: 8 distinct payloads per profile, result copied like the pipeline does
+    distinct = payloads[:8]
+    repeated = [distinct[i % len(distinct)] for i in range(per_profile)]
+
+    def run_repeated(decode):
+        started = time.perf_counter()
+        for profile in profiles:
+            for payload, status in zip(repeated, statuses):
+                dict(decode(payload, profile, status))
+        return time.perf_counter() - started
+
+    uncached = run_repeated(lambda payload, profile, status: profile.decoder.decode(payload, status))
+    memoized = run_repeated(parser.parse_telegram)
+    stats = loader.get_stats()
+    print(f"Decoding {total} telegrams repeating {len(distinct)} payloads per profile:")
+    print(f"  compiled decoder: {uncached:.3f}s ({total / uncached:,.0f} telegrams/s)")
+    print(f"  with decode memo: {memoized:.3f}s ({total / memoized:,.0f} telegrams/s)")
+    print(f"  speedup: {uncached / memoized:.1f}x "
+          f"(memo hits {stats['decode_memo_hits']}, misses {stats['decode_memo_misses']})")
+
+
+if __name__ == '__main__':
+    main()
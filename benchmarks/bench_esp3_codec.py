@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+ESP3 codec microbenchmark
+Compares the table-driven CRC8 / slotted ESP3Packet against the previous
+bit-loop CRC and per-call field slicing
+
+Usage: python3 benchmarks/bench_esp3_codec.py [iterations]
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'addon' / 'rootfs' / 'app'))
+
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+
+
+def legacy_crc8(data: bytes) -> int:
+    """Previous bit-loop CRC8 implementation"""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x80:
+                crc = (crc << 1) ^ 0x07
+            else:
+                crc = crc << 1
+            crc &= 0xFF
+    return crc
+
+
+class LegacyPacket:
+    """Previous parse path: concatenating CRC check, fields re-sliced on every call"""
+
+    def __init__(self, raw_data: bytes):
+        self.data_length = int.from_bytes(raw_data[1:3], 'big')
+        self.optional_length = raw_data[3]
+        self.packet_type = raw_data[4]
+        if raw_data[5] != legacy_crc8(raw_data[1:5]):
+            raise ValueError("Header CRC mismatch")
+        data_end = 6 + self.data_length
+        optional_end = data_end + self.optional_length
+        self.data = raw_data[6:data_end]
+        self.optional_data = raw_data[data_end:optional_end]
+        if raw_data[optional_end] != legacy_crc8(self.data + self.optional_data):
+            raise ValueError("Data CRC mismatch")
+
+    def get_sender_id(self):
+        if self.packet_type == 0x01 and len(self.data) >= 6:
+            return self.data[-5:-1].hex()
+        return None
+
+    def get_rorg(self):
+        if self.packet_type == 0x01 and len(self.data) >= 1:
+            return self.data[0]
+        return None
+
+    def get_rssi(self):
+        if len(self.optional_data) >= 6:
+            return -self.optional_data[5]
+        return None
+
+
+def build_sample_frames():
+    """Typical received frames: 4BS, RPS and a 14 byte VLD telegram with RSSI"""
+    frames = []
+    for rorg, payload in ((0xA5, bytes([0x00, 0x00, 0x7F, 0x08])),
+                          (0xF6, bytes([0x30])),
+                          (0xD2, bytes(range(14)))):
+        packet = ESP3Packet.create_radio_packet('0581a2b3', 'ffffffff', rorg, payload, 0x30)
+        packet.optional_data = bytes([0x03, 0xFF, 0xFF, 0xFF, 0xFF, 0x4A, 0x00])
+        packet.optional_length = len(packet.optional_data)
+        frames.append(packet.build())
+    return frames
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    frames = build_sample_frames()
+
+    # Sanity check: both implementations agree
+    for frame in frames:
+        new, old = ESP3Packet(frame), LegacyPacket(frame)
+        assert (new.get_sender_id(), new.get_rorg(), new.get_rssi()) == \
+            (old.get_sender_id(), old.get_rorg(), old.get_rssi())
+        assert ESP3Packet.calculate_crc8(frame) == legacy_crc8(frame)
+
+    def run_new():
+        for frame in frames:
+            packet = ESP3Packet(frame)
+            packet.get_sender_id()
+            packet.get_rorg()
+            packet.get_rssi()
+
+    def run_legacy():
+        for frame in frames:
+            packet = LegacyPacket(frame)
+            packet.get_sender_id()
+            packet.get_rorg()
+            packet.get_rssi()
+
+    crc_input = frames[-1]
+    results = [
+        ('crc8 (bit loop)', timeit.timeit(lambda: legacy_crc8(crc_input), number=iterations)),
+        ('crc8 (table)', timeit.timeit(lambda: ESP3Packet.calculate_crc8(crc_input), number=iterations)),
+        ('parse+fields (legacy)', timeit.timeit(run_legacy, number=iterations)),
+        ('parse+fields (slotted)', timeit.timeit(run_new, number=iterations)),
+    ]
+
+    print(f"{iterations} iterations, {len(frames)} frames per parse iteration")
+    for name, seconds in results:
+        print(f"  {name:<24} {seconds * 1e6 / iterations:8.2f} us/iter")
+    print(f"  crc8 speedup:  {results[0][1] / results[1][1]:.1f}x")
+    print(f"  parse speedup: {results[2][1] / results[3][1]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
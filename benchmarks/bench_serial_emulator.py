@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Serial layer throughput/latency benchmark against the virtual gateway emulator
+Runs SerialHandler on a pty pair at 57600-baud timing without hardware
+
+Usage: python3 benchmarks/bench_serial_emulator.py [devices] [rate] [seconds]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'addon' / 'rootfs' / 'app'))
+
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+from core.serial_handler import SerialHandler  # noqa: E402
+from gateway_emulator import GatewayEmulator  # noqa: E402
+
+
+async def run(devices: int, rate: float, seconds: float):
+    emulator = GatewayEmulator(devices=devices, rate=rate)
+    port = emulator.start()
+
+    handler = SerialHandler(port)
+    if not await handler.open():
+        print(f"Failed to open {port}")
+        emulator.stop()
+        return
+
+    received = 0
+
+    async def on_packet(packet):
+        nonlocal received
+        received += 1
+
+    reader = asyncio.create_task(handler.start_reading(on_packet))
+
+    base_id = await handler.get_base_id()
+    version = await handler.get_version_info()
+    print(f"Base ID: {base_id}, version: {version and version['app_description']}")
+
+    # Command round trips while telegrams keep arriving
+    latencies = []
+    started = time.monotonic()
+    while time.monotonic() - started < seconds:
+        command = ESP3Packet.create_read_base_id()
+        sent_at = time.perf_counter()
+        response = await handler.send_command_and_wait_response(command)
+        if response is not None:
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+        await handler.send_rps_command('01a00000', 0x30)
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - started
+
+    handler.stop_reading()
+    reader.cancel()
+    handler.close()
+    emulator.stop()
+
+    stats = emulator.get_stats()
+    print(f"Telegrams: {stats['telegrams_sent']} sent, {received} received "
+          f"({received / elapsed:.1f}/s over {elapsed:.1f}s)")
+    print(f"Radio packets accepted by emulator: {stats['radio_received']}")
+    if latencies:
+        latencies.sort()
+        print(f"Command round trip: n={len(latencies)} median={statistics.median(latencies):.2f} ms "
+              f"p95={latencies[int(len(latencies) * 0.95) - 1]:.2f} ms max={latencies[-1]:.2f} ms")
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 50.0
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    asyncio.run(run(devices, rate, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Network gateway reconnect check against the virtual gateway emulator in TCP mode
+Runs SerialHandler on a socket:// URL whose gateway comes up only after the
+start, drops the connection several times and takes the gateway down for a
+while, checking keepalive, reconnect with backoff and that command responses
+stay matched to their commands
+
+Usage: python3 benchmarks/bench_tcp_reconnect.py [drops] [rate] [outage seconds]
+"""
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'addon' / 'rootfs' / 'app'))
+
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+from core.serial_handler import SerialHandler  # noqa: E402
+from gateway_emulator import GatewayEmulator  # noqa: E402
+from core.transport import TcpTransport  # noqa: E402
+
+
+async def wait_for(condition, timeout: float) -> bool:
+    """Poll a condition until it holds or the timeout passes"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def check_commands(handler: SerialHandler, rounds: int = 5) -> bool:
+    """Interleave base ID and version queries and check each gets its own response"""
+    for _ in range(rounds):
+        base_id, version = await asyncio.gather(
+            handler.send_command_and_wait_response(ESP3Packet.create_read_base_id()),
+            handler.send_command_and_wait_response(ESP3Packet.create_read_version()))
+        # Base ID response: return code + 4 byte ID, version response: return code + 32 bytes
+        if base_id is None or version is None or len(base_id.data) != 5 or len(version.data) != 33:
+            return False
+    return True
+
+
+def free_port() -> int:
+    """Pick a local TCP port nothing listens on"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def run(drops: int, rate: float, outage: float) -> bool:
+    # Gateway not reachable at start: the handler keeps trying in the background
+    tcp_port = free_port()
+    handler = SerialHandler(f"socket://127.0.0.1:{tcp_port}")
+    if await handler.open() or not handler.retries_connect:
+        print("Expected the first connect to fail and to be retried")
+        return False
+
+    received = 0
+
+    async def on_packet(packet):
+        nonlocal received
+        received += 1
+
+    reader = asyncio.create_task(handler.start_reading(on_packet))
+    ok = True
+
+    await asyncio.sleep(1.5)
+    emulator = GatewayEmulator(devices=20, rate=rate, baudrate=0, tcp_port=tcp_port)
+    port = emulator.start()
+    started_at = time.monotonic()
+    if await wait_for(lambda: handler.base_id is not None, TcpTransport.RECONNECT_MAX_DELAY):
+        print(f"Gateway came up after start: connected and base ID {handler.base_id} read "
+              f"{time.monotonic() - started_at:.2f}s later")
+    else:
+        print("Gateway came up after start: never connected")
+        reader.cancel()
+        handler.close()
+        emulator.stop()
+        return False
+
+    sock = handler.transport._writer.get_extra_info('socket')
+    keepalive = sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+    print(f"Connected to {port}, keepalive {'on' if keepalive else 'OFF'}")
+    ok &= bool(keepalive)
+
+    if not await check_commands(handler):
+        print("Command responses not correlated before the first drop")
+        ok = False
+
+    reconnect_times = []
+    for drop in range(drops):
+        before = received
+        await wait_for(lambda: received > before, 2.0)
+        connections = emulator.connections
+        emulator.drop()
+        dropped_at = time.monotonic()
+        if not await wait_for(lambda: emulator.connections > connections and handler.is_open(), 10.0):
+            print(f"Drop {drop + 1}: no reconnect within 10s")
+            ok = False
+            break
+        reconnect_times.append(time.monotonic() - dropped_at)
+
+        before = received
+        if not await wait_for(lambda: received > before, 5.0):
+            print(f"Drop {drop + 1}: no telegrams after reconnect")
+            ok = False
+        if not await check_commands(handler):
+            print(f"Drop {drop + 1}: command responses not correlated after reconnect")
+            ok = False
+
+    stats = emulator.get_stats()
+    print(f"Telegrams: {stats['telegrams_sent']} sent, {received} received, "
+          f"{stats['connections']} connections, {handler.transport.reconnects} reconnects")
+    if reconnect_times:
+        print(f"Reconnect time: min={min(reconnect_times):.2f}s max={max(reconnect_times):.2f}s")
+
+    # Gateway down for a while: attempts back off (1s, 2s, ...) until it is back
+    emulator.stop()
+    await asyncio.sleep(outage)
+    emulator = GatewayEmulator(devices=20, rate=rate, baudrate=0, tcp_port=tcp_port)
+    emulator.start()
+    restarted_at = time.monotonic()
+    if await wait_for(lambda: handler.is_open(), TcpTransport.RECONNECT_MAX_DELAY):
+        print(f"Gateway down {outage:.0f}s: reconnected {time.monotonic() - restarted_at:.2f}s after it came back")
+        if not await check_commands(handler):
+            print("Command responses not correlated after the outage")
+            ok = False
+    else:
+        print(f"Gateway down {outage:.0f}s: no reconnect")
+        ok = False
+
+    handler.stop_reading()
+    reader.cancel()
+    handler.close()
+    emulator.stop()
+    print("OK" if ok else "FAILED")
+    return ok
+
+
+def main():
+    drops = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    outage = float(sys.argv[3]) if len(sys.argv) > 3 else 4.0
+    sys.exit(0 if asyncio.run(run(drops, rate, outage)) else 1)
+
+
+if __name__ == '__main__':
+    main()
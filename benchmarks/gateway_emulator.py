@@ -0,0 +1,336 @@
+"""
+Virtual TCM310 Gateway Emulator
+Emulates an EnOcean USB gateway on a pseudo-terminal for hardware-free testing
+
+The emulator opens a pty pair, answers common commands on the master side and
+emits synthetic ERP1 telegrams for a configurable device population. The slave
+side (e.g., /dev/pts/5) can be used as serial_port by SerialHandler.
+
+In TCP mode it listens like a ser2net/esp-link network gateway instead and
+returns a socket://host:port URL; drop() cuts the current connection to
+exercise reconnects.
+
+Usage: python3 benchmarks/gateway_emulator.py --devices 50 --rate 20 [--tcp 3333]
+"""
+import argparse
+import logging
+import os
+import random
+import select
+import socket
+import sys
+import threading
+import time
+import tty
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'addon' / 'rootfs' / 'app'))
+
+from core.esp3_framer import ESP3Framer  # noqa: E402
+from core.esp3_protocol import ESP3Packet  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+RET_OK = 0x00
+RET_NOT_SUPPORTED = 0x02
+
+# Synthetic device kinds: (RORG, payload generator)
+DEVICE_KINDS: Tuple[Tuple[int, Any], ...] = (
+    # F6-02-01 rocker switch: button pressed / released
+    (0xF6, lambda: bytes([random.choice((0x10, 0x30, 0x50, 0x70, 0x00))])),
+    # A5-02-05 temperature sensor: DB1 temperature, LRN bit set (data telegram)
+    (0xA5, lambda: bytes([0x00, 0x00, random.randint(0, 255), 0x08])),
+    # D5-00-01 contact: LRN bit set, random contact state
+    (0xD5, lambda: bytes([0x08 | random.randint(0, 1)])),
+)
+
+
+class GatewayEmulator:
+    """Emulated TCM310 gateway attached to the master side of a pty pair"""
+
+    APP_DESCRIPTION = b'GATEWAY EMULATOR'
+
+    def __init__(self, devices: int = 10, rate: float = 1.0, base_id: str = 'ff800000',
+                 baudrate: int = 57600, first_device_id: int = 0x01A00000, tcp_port: Optional[int] = None):
+        """
+        Initialize emulator
+
+        Args:
+            devices: Number of simulated devices
+            rate: Total telegrams per second across all devices (0 = no telegrams)
+            base_id: Base ID reported to CO_RD_IDBASE
+            baudrate: Emulated UART speed used to pace the output (0 = unpaced)
+            first_device_id: Sender ID of the first simulated device
+            tcp_port: Listen as network gateway on this local TCP port (0 = any free port)
+                      instead of using a pty
+        """
+        self.rate = rate
+        self.base_id = bytes.fromhex(base_id)
+        self.baudrate = baudrate
+        self.devices: List[Tuple[bytes, int, Any]] = []
+        for index in range(devices):
+            rorg, payload = DEVICE_KINDS[index % len(DEVICE_KINDS)]
+            self.devices.append(((first_device_id + index).to_bytes(4, 'big'), rorg, payload))
+
+        self.port = None
+        self.tcp_port = tcp_port
+        self._master_fd = None
+        self._slave_fd = None
+        self._listener: Optional[socket.socket] = None
+        self._client: Optional[socket.socket] = None
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        self._write_lock = threading.Lock()
+        self._framer = ESP3Framer()
+
+        # Statistics
+        self.telegrams_sent = 0
+        self.commands_received = 0
+        self.radio_received = 0
+        self.bytes_sent = 0
+        self.connections = 0
+        self.received_packets: List[ESP3Packet] = []
+
+    def start(self) -> str:
+        """
+        Open the pty pair (or TCP listener) and start the emulator threads
+
+        Returns:
+            Path of the slave device, or socket:// URL in TCP mode, to open as serial port
+        """
+        if self.tcp_port is not None:
+            self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._listener.bind(('127.0.0.1', self.tcp_port))
+            self._listener.listen(1)
+            self.port = f"socket://127.0.0.1:{self._listener.getsockname()[1]}"
+        else:
+            self._master_fd, self._slave_fd = os.openpty()
+            tty.setraw(self._master_fd)
+            tty.setraw(self._slave_fd)
+            self.port = os.ttyname(self._slave_fd)
+        self._running = True
+
+        targets = [self._tcp_loop if self._listener else self._command_loop]
+        if self.rate > 0 and self.devices:
+            targets.append(self._telegram_loop)
+        for target in targets:
+            thread = threading.Thread(target=target, name=f"emulator-{target.__name__}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"Gateway emulator on {self.port}: {len(self.devices)} devices, "
+                    f"{self.rate} telegrams/s, {self.baudrate or 'unpaced'} baud")
+        return self.port
+
+    def stop(self):
+        """Stop emulator threads and close the pty pair"""
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        self.drop()
+        if self._listener:
+            self._listener.close()
+            self._listener = None
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master_fd = self._slave_fd = None
+
+    def _write(self, packet: ESP3Packet):
+        """
+        Write packet to the host, paced like a UART at the configured baud rate
+
+        Args:
+            packet: Packet to send
+        """
+        raw = packet.build()
+        with self._write_lock:
+            if self._listener:
+                if self._client is None:
+                    return  # No host connected, the telegram is lost like on air
+                try:
+                    self._client.sendall(raw)
+                except OSError:
+                    return
+            else:
+                os.write(self._master_fd, raw)
+            self.bytes_sent += len(raw)
+            if self.baudrate:
+                # 8N1: 10 bit times per byte
+                time.sleep(len(raw) * 10 / self.baudrate)
+
+    def _response(self, return_code: int, data: bytes = b'', optional_data: bytes = b'') -> ESP3Packet:
+        """Build a RESPONSE packet"""
+        return ESP3Packet.create_packet(ESP3Packet.PACKET_TYPE_RESPONSE, bytes([return_code]) + data, optional_data)
+
+    def handle_packet(self, packet: ESP3Packet) -> ESP3Packet:
+        """
+        Answer one packet received from the host
+
+        Args:
+            packet: Packet written by the host
+
+        Returns:
+            RESPONSE packet to send back
+        """
+        if packet.packet_type == ESP3Packet.PACKET_TYPE_COMMON_COMMAND and packet.data:
+            self.commands_received += 1
+            command = packet.data[0]
+            if command == ESP3Packet.CO_RD_IDBASE:
+                # Base ID + remaining write cycles
+                return self._response(RET_OK, self.base_id, bytes([0x0A]))
+            if command == ESP3Packet.CO_RD_VERSION:
+                return self._response(RET_OK, bytes([2, 11, 1, 0]) + bytes([2, 6, 3, 0]) +
+                                      bytes.fromhex('0181a1b2') + bytes([0x45, 0x4F, 0x03, 0x01]) +
+                                      self.APP_DESCRIPTION.ljust(16, b'\x00'))
+            return self._response(RET_NOT_SUPPORTED)
+
+        if packet.packet_type == ESP3Packet.PACKET_TYPE_RADIO_ERP1:
+            self.radio_received += 1
+            self.received_packets.append(packet)
+            if len(self.received_packets) > 1000:
+                del self.received_packets[:500]
+            return self._response(RET_OK)
+
+        return self._response(RET_NOT_SUPPORTED)
+
+    def _command_loop(self):
+        """Read host packets from the master side and answer them"""
+        while self._running:
+            try:
+                readable, _, _ = select.select([self._master_fd], [], [], 0.2)
+                if not readable:
+                    continue
+                chunk = os.read(self._master_fd, 4096)
+            except OSError:
+                break
+            for packet in self._framer.feed(chunk):
+                self._write(self.handle_packet(packet))
+
+    def _tcp_loop(self):
+        """Accept host connections (a new one replaces the current) and answer their packets"""
+        while self._running:
+            client = self._client
+            sockets = [self._listener] + ([client] if client else [])
+            try:
+                readable, _, _ = select.select(sockets, [], [], 0.2)
+            except (OSError, ValueError):
+                continue  # Connection dropped while waiting
+            if self._listener in readable:
+                try:
+                    connection, _ = self._listener.accept()
+                except OSError:
+                    break
+                self.drop()
+                with self._write_lock:
+                    self._client = connection
+                    self._framer.reset()
+                self.connections += 1
+                logger.info(f"Gateway emulator: host connected ({self.connections} connections)")
+                continue
+            if client is None or client not in readable:
+                continue
+            try:
+                chunk = client.recv(4096)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                self.drop()
+                continue
+            for packet in self._framer.feed(chunk):
+                self._write(self.handle_packet(packet))
+
+    def drop(self):
+        """Close the current TCP connection (the host has to reconnect)"""
+        with self._write_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+
+    def make_telegram(self, device: Tuple[bytes, int, Any]) -> ESP3Packet:
+        """
+        Build a synthetic ERP1 telegram for one device
+
+        Args:
+            device: (sender ID, RORG, payload generator) tuple
+
+        Returns:
+            ERP1 packet as the gateway would forward it
+        """
+        sender_id, rorg, payload = device
+        status = 0x30 if rorg == 0xF6 else 0x00
+        data = bytes([rorg]) + payload() + sender_id + bytes([status])
+        # SubTelNum + broadcast destination + dBm + security level
+        optional_data = bytes([0x01, 0xFF, 0xFF, 0xFF, 0xFF, random.randint(40, 95), 0x00])
+        return ESP3Packet.create_packet(ESP3Packet.PACKET_TYPE_RADIO_ERP1, data, optional_data)
+
+    def _telegram_loop(self):
+        """Emit telegrams with exponentially distributed gaps (Poisson arrivals)"""
+        next_at = time.monotonic()
+        while self._running:
+            next_at += random.expovariate(self.rate)
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self._write(self.make_telegram(random.choice(self.devices)))
+            except OSError:
+                break
+            self.telegrams_sent += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get emulator statistics
+
+        Returns:
+            Dictionary with sent/received counters
+        """
+        return {
+            'port': self.port,
+            'devices': len(self.devices),
+            'telegrams_sent': self.telegrams_sent,
+            'commands_received': self.commands_received,
+            'radio_received': self.radio_received,
+            'bytes_sent': self.bytes_sent,
+            'connections': self.connections
+        }
+
+
+def main():
+    """Run the emulator until interrupted"""
+    parser = argparse.ArgumentParser(description="Virtual EnOcean TCM310 gateway on a pty or TCP port")
+    parser.add_argument('--devices', type=int, default=10, help="number of simulated devices")
+    parser.add_argument('--rate', type=float, default=1.0, help="telegrams per second (all devices)")
+    parser.add_argument('--base-id', default='ff800000', help="base ID reported to the host")
+    parser.add_argument('--baudrate', type=int, default=57600, help="emulated baud rate (0 = unpaced)")
+    parser.add_argument('--tcp', type=int, default=None, metavar='PORT',
+                        help="listen as network gateway on this local TCP port instead of a pty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    emulator = GatewayEmulator(args.devices, args.rate, args.base_id, args.baudrate, tcp_port=args.tcp)
+    port = emulator.start()
+    print(f"Serial port: {port}", flush=True)
+
+    try:
+        while True:
+            time.sleep(10)
+            logger.info(f"Emulator stats: {emulator.get_stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()